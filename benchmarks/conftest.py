@@ -0,0 +1,73 @@
+"""Fixtures for the benchmark suite.
+
+The app runs on Qt's offscreen platform against a generated data folder. Pick the
+dataset size with EMR_BENCH_SCALE=small (default) or EMR_BENCH_SCALE=large.
+"""
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest  # noqa: E402
+
+from generate_data import generate  # noqa: E402
+
+SCALES = {
+    "small": {"patients": 100, "questions": 50, "years": 5, "weeks_per_patient": 26},
+    "large": {"patients": 10000, "questions": 50, "years": 5, "weeks_per_patient": 4},
+}
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """Generate the data files into a throwaway home folder the app reads from."""
+    home = tmp_path_factory.mktemp("home")
+    saved = {name: os.environ.get(name) for name in ("HOME", "LOCALAPPDATA")}
+    os.environ["HOME"] = os.environ["LOCALAPPDATA"] = str(home)
+
+    import emr_app
+
+    scale = os.environ.get("EMR_BENCH_SCALE", "small")
+    patients, questions, patient_data = generate(os.path.dirname(emr_app.get_user_data_path("patients.json")),
+                                                 **SCALES[scale])
+    yield {"patients": patients, "questions": questions, "patient_data": patient_data}
+
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def window(dataset, qapp):
+    import emr_app
+
+    window = emr_app.EMRManager()
+    yield window
+    window.patient_data_store.close()
+
+
+@pytest.fixture
+def data_screen(window, dataset):
+    """Open the first patient's data screen at their most recent week."""
+    import emr_app
+    from PyQt5.QtCore import QDate
+
+    patient_uuid = next(iter(dataset["patients"]))
+    screen = emr_app.DataScreen(patient_uuid, window.questions, window.patients, window.patient_data_store,
+                                window.chart_cache)
+    week_start = emr_app.week_start_from_key(max(dataset["patient_data"][patient_uuid]))
+    screen.go_to_week(QDate(week_start.year, week_start.month, week_start.day))
+    yield screen
+    screen.close()
+    screen.deleteLater()
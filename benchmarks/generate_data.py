@@ -0,0 +1,112 @@
+"""Generate synthetic patients.json, questions.json and patient_data.json for testing at scale.
+
+Usage:
+    python benchmarks/generate_data.py OUTPUT_DIR --patients 10000 --questions 50 --years 5
+
+Point OUTPUT_DIR at the CaseManager user data folder to open the data in the app.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import uuid
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+FIRST_NAMES = ["Anna", "Ben", "Carla", "David", "Ewa", "Farid", "Grace", "Henrik", "Iris", "Jakub",
+               "Kasia", "Liam", "Maya", "Noah", "Olga", "Pavel", "Quinn", "Rosa", "Sam", "Tomasz"]
+LAST_NAMES = ["Kowalski", "Nowak", "Smith", "Garcia", "Müller", "Rossi", "Dubois", "Jensen", "Silva",
+              "Tanaka", "Brown", "Lee", "Novak", "Wilson", "Ahmed", "Kim", "Olsen", "Moreau"]
+NOTE_WORDS = ["slept", "poorly", "well", "reported", "headache", "nausea", "improved", "calm", "anxious",
+              "walked", "ate", "breakfast", "skipped", "session", "visited", "family", "mood", "stable",
+              "tired", "energetic", "pain", "in", "the", "morning", "evening", "after", "medication"]
+
+
+def week_keys(years, today=None):
+    """Return the Monday-to-Friday week keys of the last given number of years, oldest first."""
+    today = today or datetime.date.today()
+    monday = today - datetime.timedelta(days=today.weekday())
+    weeks = int(years * 52)
+    keys = []
+    for offset in range(weeks - 1, -1, -1):
+        start = monday - datetime.timedelta(weeks=offset)
+        keys.append(f"{start.isoformat()}_to_{(start + datetime.timedelta(days=4)).isoformat()}")
+    return keys
+
+
+def generate(output_dir, patients=100, questions=50, years=5, weeks_per_patient=None, fill_rate=0.8,
+             qualitative_share=0.3, seed=0):
+    """Write the three data files to output_dir and return (patients, questions, patient_data).
+
+    Each patient is followed for a contiguous stretch of weeks_per_patient weeks
+    (every week of the span when None), and each weekday answer is filled in
+    with probability fill_rate.
+    """
+    rng = random.Random(seed)
+    all_weeks = week_keys(years)
+    weeks_per_patient = min(weeks_per_patient or len(all_weeks), len(all_weeks))
+
+    question_list = [
+        {"text": f"Question {number}",
+         "type": "Qualitative" if rng.random() < qualitative_share else "Quantitative"}
+        for number in range(1, questions + 1)
+    ]
+
+    patient_records = {}
+    patient_data = {}
+    for _ in range(patients):
+        patient_uuid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        patient_records[patient_uuid] = {
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "age": rng.randint(18, 90),
+            "records": {},
+        }
+        first_week = rng.randint(0, len(all_weeks) - weeks_per_patient)
+        weekly = {}
+        for week_key in all_weeks[first_week:first_week + weeks_per_patient]:
+            week_data = {}
+            for question in question_list:
+                answers = {}
+                for day in DAYS_OF_WEEK:
+                    if rng.random() >= fill_rate:
+                        continue
+                    if question["type"] == "Quantitative":
+                        answers[day] = str(rng.randint(0, 10))
+                    else:
+                        answers[day] = " ".join(rng.choices(NOTE_WORDS, k=rng.randint(3, 12)))
+                if answers:
+                    week_data[question["text"]] = answers
+            weekly[week_key] = week_data
+        patient_data[patient_uuid] = weekly
+
+    os.makedirs(output_dir, exist_ok=True)
+    for filename, content in (("patients.json", patient_records), ("questions.json", question_list),
+                              ("patient_data.json", patient_data)):
+        with open(os.path.join(output_dir, filename), "w") as file:
+            json.dump(content, file)
+    return patient_records, question_list, patient_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic data files for the EMR app.")
+    parser.add_argument("output_dir", help="Folder to write patients.json, questions.json and patient_data.json to")
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--weeks-per-patient", type=int, default=None,
+                        help="Weeks of data per patient (default: every week of the span)")
+    parser.add_argument("--fill-rate", type=float, default=0.8, help="Share of weekday answers filled in")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    patients, _, patient_data = generate(
+        args.output_dir, args.patients, args.questions, args.years, args.weeks_per_patient, args.fill_rate,
+        seed=args.seed,
+    )
+    answers = sum(len(day_answers) for weekly in patient_data.values() for week_data in weekly.values()
+                  for day_answers in week_data.values())
+    print(f"Wrote {len(patients)} patients and {answers} answers to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
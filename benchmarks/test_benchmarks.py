@@ -0,0 +1,111 @@
+"""Benchmarks for the app's hot paths.
+
+Run with:
+    python -m pytest benchmarks --benchmark-autosave
+and compare a later run against the saved results with --benchmark-compare.
+"""
+import itertools
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import emr_app  # noqa: E402
+
+
+def test_load_patients(benchmark, window):
+    benchmark(window.load_patients)
+
+
+def test_populate_table(benchmark, window):
+    benchmark(window.populate_table)
+
+
+def test_data_screen_init(benchmark, window, dataset):
+    patient_uuid = next(iter(dataset["patients"]))
+
+    def open_screen():
+        screen = emr_app.DataScreen(patient_uuid, window.questions, window.patients, window.patient_data_store,
+                                    window.chart_cache)
+        screen.close()
+        screen.deleteLater()
+
+    benchmark(open_screen)
+
+
+def test_handle_table_edit_and_save(benchmark, window, data_screen):
+    row = next(row for row, question in enumerate(data_screen.questions) if question["type"] == "Quantitative")
+    values = itertools.cycle(str(value) for value in range(11))
+
+    def edit_and_save():
+        # Setting the text fires cellChanged -> handle_table_edit, then wait for the autosave.
+        data_screen.data_table.item(row, 1).setText(next(values))
+        window.patient_data_store.flush()
+
+    benchmark(edit_and_save)
+
+
+def test_update_chart(benchmark, data_screen):
+    benchmark(data_screen.update_chart)
+
+
+@pytest.fixture
+def export_path(tmp_path, monkeypatch):
+    """Answer the save dialog with a temporary path and fail the benchmark on export errors."""
+    def fail(parent, title, message):
+        raise AssertionError(message)
+
+    def save_path(parent, caption, file_name, file_filter):
+        return str(tmp_path / file_name), file_filter
+
+    monkeypatch.setattr(emr_app.QFileDialog, "getSaveFileName", save_path)
+    monkeypatch.setattr(emr_app.QMessageBox, "information", lambda *args: None)
+    monkeypatch.setattr(emr_app.QMessageBox, "critical", fail)
+    return tmp_path
+
+
+def test_export_to_excel(benchmark, data_screen, export_path):
+    pytest.importorskip("openpyxl")
+    benchmark(data_screen.export_to_excel)
+
+
+def test_export_to_pdf(benchmark, data_screen, export_path):
+    pytest.importorskip("fpdf")
+    benchmark(data_screen.export_to_pdf)
+
+
+SERIALIZER_OPTIONS = [
+    ("json", "none"),  # The format the app has always written
+    ("compact", "none"),
+    ("compact", "gzip"),
+    ("compact", "zstd"),
+    ("msgpack", "none"),
+    ("msgpack", "zstd"),
+]
+
+
+def make_serializer(data_format, compression):
+    if data_format == "msgpack":
+        pytest.importorskip("msgpack")
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    return emr_app.DataSerializer(data_format, compression)
+
+
+@pytest.mark.parametrize("data_format,compression", SERIALIZER_OPTIONS)
+def test_save_patient_data(benchmark, dataset, tmp_path, data_format, compression):
+    serializer = make_serializer(data_format, compression)
+    path = str(tmp_path / "patient_data.json")
+    benchmark.group = "save patient_data"
+    benchmark(emr_app.write_json_atomic, path, dataset["patient_data"], serializer=serializer)
+    benchmark.extra_info["file_size"] = (tmp_path / "patient_data.json").stat().st_size
+
+
+@pytest.mark.parametrize("data_format,compression", SERIALIZER_OPTIONS)
+def test_load_patient_data(benchmark, dataset, tmp_path, data_format, compression):
+    serializer = make_serializer(data_format, compression)
+    path = str(tmp_path / "patient_data.json")
+    emr_app.write_json_atomic(path, dataset["patient_data"], serializer=serializer)
+    benchmark.group = "load patient_data"
+    benchmark.extra_info["file_size"] = (tmp_path / "patient_data.json").stat().st_size
+    assert benchmark(emr_app.DataSerializer.read, path) == dataset["patient_data"]
@@ -1,28 +1,102 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # Start of the "imports" phase for --profile-startup
 import sys
 import subprocess
-import requests
-import zipfile
+import platform
 import json
 import uuid
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget,
-    QTableWidget, QTableWidgetItem, QMessageBox, QHBoxLayout, QCheckBox, QAction
+    QTableWidget, QTableWidgetItem, QMessageBox, QHBoxLayout, QCheckBox, QAction,
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate, QStyleOptionButton, QStyle, QLineEdit,
+    QComboBox, QInputDialog, QProgressDialog
 )
-from PyQt5.QtChart import QChart, QChartView, QLineSeries
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtGui import QPainter, QImage, QKeySequence
+from PyQt5.QtCore import Qt, QDate, QDateTime, QPointF, QBuffer, QIODevice, QThread, pyqtSignal, QAbstractTableModel, QModelIndex, QEvent, QSortFilterProxyModel, QObject, QTimer, QFileSystemWatcher
 import os
 from PyQt5.QtWidgets import QFileDialog, QLabel
-from openpyxl import Workbook
-from openpyxl.drawing.image import Image
 import tempfile
 import logging
+import logging.handlers
+import queue
+import atexit
+import contextlib
 import os
-from fpdf import FPDF  # Import the FPDF library for PDF creation
-import tarfile
 import stat
+import threading
+import sqlite3
+import copy
+import bisect
+import datetime
+import io
+import re
+import argparse
+import csv
+import hashlib
+import heapq
+import math
+from urllib.parse import urlparse
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from array import array
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
 VERSION = "v1.0.25"
+UPDATE_CHECK_URL = "https://api.github.com/repos/marcinknara/minimal-emr/releases/latest"
+UPDATE_CHECK_TIMEOUT = (5, 15)  # Seconds to connect / to wait for the response
+UPDATE_DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk while downloading an update
+JOURNAL_COMPACT_THRESHOLD = 500  # Journal records before folding them into patient_data.json
+HISTORY_RANGES = [  # (label, days back from the current week; 0 means all time)
+    ("Last 3 months", 91),
+    ("Last 6 months", 182),
+    ("Last 12 months", 365),
+    ("All time", 0),
+]
+PREPARED_WEEKS = 8  # Weeks of table text and chart values a DataScreen keeps ready for navigation
+HISTORY_MAX_POINTS = 500  # Points per series drawn in the history chart after downsampling
+EXPORT_CHART_SIZE = (800, 500)  # Pixel size of charts rendered for exports
+EXPORT_CHART_DPI = 96  # Resolution stamped on rendered chart images
+CHART_CACHE_MEMORY_ENTRIES = 64  # Rendered charts kept in memory
+CHART_CACHE_DISK_ENTRIES = 500  # Rendered charts kept in the chart_cache folder
+IMPORT_COLUMNS = {  # Accepted header names, after lowercasing and replacing spaces with "_"
+    "patient_uuid": ("patient_uuid", "uuid", "patient_id"),
+    "patient": ("patient", "patient_name", "name"),
+    "age": ("age", "patient_age"),
+    "date": ("date",),
+    "question": ("question",),
+    "value": ("value", "answer"),
+}
+DEFAULT_PATIENT_AGE = 30  # Placeholder age of patients added without one; editable in the patient table
+IMPORT_MAX_ERRORS = 100  # Validation errors listed in an import report; the rest are only counted
+BATCH_EXPORT_MODES = [  # (label, formats, combined)
+    ("Excel, one file per patient", ("xlsx",), False),
+    ("PDF, one file per patient", ("pdf",), False),
+    ("Excel and PDF, one file per patient", ("xlsx", "pdf"), False),
+    ("Excel, one combined workbook", ("xlsx",), True),
+    ("PDF, one combined document", ("pdf",), True),
+]
+LOG_MAX_BYTES = 5 * 1024 * 1024  # app.log and timings.jsonl are rotated at this size
+LOG_BACKUP_COUNT = 3  # Rotated log files kept next to the current one
+TIMING_SAMPLES = 1000  # Most recent durations kept per operation for the Performance panel
+AUTOSAVE_DELAY = 0.25  # Seconds to coalesce edits before writing them
+AUTOSAVE_MAX_BATCH = 50  # Write immediately once this many edits are pending
+AUTOSAVE_RETRY_DELAY = 5.0  # Seconds before retrying a batch that failed to save
+SEARCH_DEBOUNCE_MS = 150  # Wait for typing to pause before searching
+EXTERNAL_RELOAD_DELAY_MS = 300  # Let another instance finish a burst of writes before reading them
+DEFAULT_QUESTIONS = [
+    {"text": "Question 1", "type": "Quantitative"},
+    {"text": "Question 2", "type": "Qualitative"},
+]
+DEFAULT_SETTINGS = {
+    "storage_backend": "json",  # "json", "sharded" or "sqlite"
+    "shard_by_year": False,  # With the sharded backend, split each patient's data into one file per year
+    "data_format": "json",  # "json" (indented), "compact" or "msgpack"; files in any format still load
+    "compression": "none",  # "none", "gzip" or "zstd"
+    "check_updates_on_startup": False,  # Silently check for a new release when the app starts
+    "update_url": UPDATE_CHECK_URL,  # Releases API endpoint, can point at a local server for testing
+}
 
 
 def get_user_data_path(filename):
@@ -43,6 +117,570 @@ def get_user_data_path(filename):
     return os.path.join(app_folder, filename)
 
 
+def load_settings():
+    """Load settings.json from the user data folder, falling back to defaults."""
+    settings = dict(DEFAULT_SETTINGS)
+    path = get_user_data_path("settings.json")
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                settings.update(json.load(file))
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"Failed to load settings, using defaults: {e}")
+    return settings
+
+
+class UnsupportedDataFormat(ValueError):
+    """A data file is intact but written in a format whose decoder is not installed."""
+
+
+class DataSerializer:
+    """Turn the data files into bytes and back in the format chosen in settings.json.
+
+    "json" is the indented JSON the app has always written, "compact" is JSON
+    without whitespace (written with orjson when it is installed) and "msgpack"
+    is binary MessagePack. Any of them can be compressed with gzip or zstd.
+    Loading looks at the bytes themselves, so files written in an older or a
+    different format keep opening after the setting changes.
+    """
+
+    FORMATS = ("json", "compact", "msgpack")
+    COMPRESSIONS = ("none", "gzip", "zstd")
+    GZIP_MAGIC = b"\x1f\x8b"
+    ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+    MSGPACK_CONTAINERS = set(range(0x80, 0xa0)) | {0xdc, 0xdd, 0xde, 0xdf}  # First byte of a map or array
+
+    def __init__(self, data_format="json", compression="none"):
+        if data_format not in self.FORMATS:
+            logging.warning(f"Unknown data format '{data_format}', falling back to JSON.")
+            data_format = "json"
+        if compression not in self.COMPRESSIONS:
+            logging.warning(f"Unknown compression '{compression}', writing uncompressed files.")
+            compression = "none"
+        if data_format == "msgpack" and not self.module_available("msgpack"):
+            logging.warning("msgpack is not installed, writing compact JSON instead.")
+            data_format = "compact"
+        if compression == "zstd" and not self.module_available("zstandard"):
+            logging.warning("zstandard is not installed, using gzip compression instead.")
+            compression = "gzip"
+        self.data_format = data_format
+        self.compression = compression
+
+    @staticmethod
+    def module_available(name):
+        try:
+            __import__(name)
+            return True
+        except ImportError:
+            return False
+
+    def dumps(self, data):
+        if self.data_format == "msgpack":
+            import msgpack
+
+            raw = msgpack.packb(data, use_bin_type=True)
+        elif self.data_format == "compact":
+            try:
+                import orjson
+
+                raw = orjson.dumps(data)
+            except ImportError:
+                raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        else:
+            raw = json.dumps(data, indent=4).encode("utf-8")
+
+        if self.compression == "gzip":
+            import gzip
+
+            # mtime=0 keeps the output identical for identical data.
+            return gzip.compress(raw, compresslevel=1, mtime=0)
+        if self.compression == "zstd":
+            import zstandard
+
+            return zstandard.ZstdCompressor().compress(raw)
+        return raw
+
+    @classmethod
+    def loads(cls, raw):
+        """Decode bytes written in any supported format.
+
+        Raises UnsupportedDataFormat when the bytes are in a format whose decoder
+        is not installed, and ValueError when they are damaged.
+        """
+        if raw.startswith(cls.ZSTD_MAGIC) and not cls.module_available("zstandard"):
+            raise UnsupportedDataFormat("File is zstd-compressed, but zstandard is not installed.")
+        try:
+            return cls.decode(raw)
+        except ValueError:
+            raise
+        except Exception as e:  # gzip, zstandard and msgpack each raise their own errors
+            raise ValueError(f"File cannot be decoded: {e}") from e
+
+    @classmethod
+    def decode(cls, raw):
+        if raw.startswith(cls.GZIP_MAGIC):
+            import gzip
+
+            raw = gzip.decompress(raw)
+        elif raw.startswith(cls.ZSTD_MAGIC):
+            import zstandard
+
+            raw = zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+
+        if raw.lstrip()[:1] in (b"{", b"["):
+            try:
+                import orjson
+
+                return orjson.loads(raw)
+            except ImportError:
+                return json.loads(raw)
+        if not raw or raw[0] not in cls.MSGPACK_CONTAINERS:
+            raise ValueError("File is neither JSON nor MessagePack.")
+        try:
+            import msgpack
+        except ImportError:
+            raise UnsupportedDataFormat("File is MessagePack, but msgpack is not installed to read it.")
+        return msgpack.unpackb(raw, raw=False)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as file:
+            return cls.loads(file.read())
+
+    @classmethod
+    def looks_readable(cls, path):
+        """Cheaply check, from its first and last bytes, that a file is complete and decodable here.
+
+        Only JSON can be torn this way (by older versions that truncated files in
+        place); compressed and MessagePack files are only ever written whole by
+        write_json_atomic, so for those just the decoder is checked.
+        """
+        with open(path, "rb") as file:
+            head = file.read(16)
+            file.seek(max(os.fstat(file.fileno()).st_size - 16, 0))
+            tail = file.read()
+        if head.startswith(cls.GZIP_MAGIC):
+            return True
+        if head.startswith(cls.ZSTD_MAGIC):
+            return cls.module_available("zstandard")
+        first = head.lstrip()[:1]
+        if first in (b"{", b"["):
+            return tail.rstrip().endswith(b"}" if first == b"{" else b"]")
+        return bool(head) and head[0] in cls.MSGPACK_CONTAINERS and cls.module_available("msgpack")
+
+
+def create_serializer(settings):
+    return DataSerializer(settings.get("data_format", "json"), settings.get("compression", "none"))
+
+
+class DataFileLock:
+    """Advisory lock on the data folder, shared by every CaseManager instance that uses it.
+
+    Writers hold it while they read, merge and replace data files, so two
+    instances never interleave a read-modify-write. It is re-entrant within a
+    process: threads take turns, and nested use only locks the file once.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_user_data_path("casemanager.lock")
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.file = open(self.path, "a+")
+                self.lock_file()
+            except BaseException:
+                if self.file:
+                    self.file.close()
+                    self.file = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if self.depth == 0:
+            self.unlock_file()
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+        return False
+
+    def lock_file(self):
+        if os.name == "nt":
+            import msvcrt
+
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)  # Retries for about 10 seconds
+                    return
+                except OSError:
+                    logging.warning(f"Still waiting for another instance to release {self.path}")
+        else:
+            import fcntl
+
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def unlock_file(self):
+        if os.name == "nt":
+            import msvcrt
+
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+
+def file_signature(path):
+    """Return (inode, mtime, size) of a file, or None if it does not exist, to tell whether it was rewritten."""
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+
+def patient_hash(patient):
+    """Content hash of a patient record, used to find the records another instance changed."""
+    return hashlib.sha1(json.dumps(patient, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def flatten_patient_data(all_data):
+    """Turn nested patient -> week -> question -> day data into {(patient_uuid, week_key, question, day): value}."""
+    return {
+        (patient_uuid, week_key, question, day): value
+        for patient_uuid, weeks in all_data.items()
+        for week_key, week_data in weeks.items()
+        if isinstance(week_data, dict)
+        for question, question_data in week_data.items()
+        if isinstance(question_data, dict)
+        for day, value in question_data.items()
+    }
+
+
+def copy_week_data(patient_data):
+    """Copy one patient's week -> question -> day answers, sharing only the (immutable) values.
+
+    Much cheaper than copy.deepcopy for the fixed nesting of the data files.
+    """
+    return {
+        week_key: {question: dict(question_data) if isinstance(question_data, dict) else question_data
+                   for question, question_data in week_data.items()}
+        if isinstance(week_data, dict) else week_data
+        for week_key, week_data in patient_data.items()
+    }
+
+
+def fsync_directory(directory):
+    """Flush a folder's entries to disk so a rename inside it survives a power cut (no-op on Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path, data, indent=4, keep_backup=False, serializer=None):
+    """Write JSON so that path always holds either the complete old or the complete new content.
+
+    The data goes to a temporary file in the same folder, which is fsynced and
+    then swapped in with os.replace; the folder is fsynced as well. With
+    keep_backup, the previous version stays available as path + ".bak" for
+    recover_data_files to roll back to. A DataSerializer, when given, decides
+    the file format instead of indent.
+    """
+    directory = os.path.dirname(path) or "."
+    if serializer:
+        content = serializer.dumps(data)
+    else:
+        content = json.dumps(data, indent=indent).encode("utf-8")
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if keep_backup and os.path.exists(path):
+            backup_path = path + ".bak"
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            try:
+                os.link(path, backup_path)  # The old file stays in place until the replace below
+            except OSError:
+                import shutil
+
+                shutil.copyfile(path, backup_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    fsync_directory(directory)
+
+
+def recover_data_files(data_dir=None, serializer=None):
+    """Clean up after a crash: drop unfinished temp files and roll back JSON files that do not parse.
+
+    Files are only decoded in full when an unfinished temp file of theirs was
+    left behind or DataSerializer.looks_readable finds them suspect, so startup
+    does not parse the whole dataset. A file that is torn (e.g. written by an
+    older version that truncated files in place) is moved aside as
+    <name>.torn-<timestamp> and replaced with its .bak copy when that one is
+    readable; for patient_data.json, the journal segment folded into it since
+    (patient_data.journal.previous) is replayed on top, written with
+    serializer. A file in a format this installation cannot decode
+    (UnsupportedDataFormat) is left alone. Returns a message for every file that
+    was rolled back, set aside or left unread.
+    """
+    data_dir = data_dir or get_user_data_path("")
+    messages = []
+    interrupted = set()  # Paths whose unfinished temp files were found
+    names = ["patients.json", "questions.json", "patient_data.json"]
+    folders = [data_dir]
+    # Sharded storage: manifest.json and one shard per patient, or per patient and year in a subfolder.
+    for folder, _, file_names in os.walk(os.path.join(data_dir, "patient_data")):
+        folders.append(folder)
+        names.extend(os.path.relpath(os.path.join(folder, file_name), data_dir)
+                     for file_name in sorted(file_names) if file_name.endswith(".json"))
+    for folder in folders:
+        for entry in os.scandir(folder):
+            if entry.name.endswith(".tmp") and entry.is_file():
+                # Never swapped in, so the file it was meant to replace should still be intact; check it fully.
+                logging.warning(f"Removing unfinished write {entry.path}")
+                os.remove(entry.path)
+                interrupted.add(os.path.normpath(os.path.join(folder, entry.name.rsplit(".", 2)[0])))
+
+    for name in names:
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            if os.path.normpath(path) not in interrupted and DataSerializer.looks_readable(path):
+                continue
+        except OSError:
+            pass
+        try:
+            DataSerializer.read(path)
+            continue
+        except UnsupportedDataFormat as e:
+            # Healthy as far as we can tell: rolling it back would lose data that opens elsewhere.
+            messages.append(f"{name} cannot be read by this installation and was left unchanged: {e}")
+            logging.error(messages[-1])
+            continue
+        except (OSError, ValueError):
+            pass
+        torn_path = f"{path}.torn-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        os.replace(path, torn_path)
+        backup_path = path + ".bak"
+        journal = PatientDataJournal(path, os.path.join(data_dir, "patient_data.journal"))
+        if os.path.exists(backup_path) and is_readable_data_file(backup_path):
+            if name == "patient_data.json" and os.path.exists(journal.previous_path):
+                # The backup predates the last compaction; bring back the edits folded in since.
+                all_data = DataSerializer.read(backup_path)
+                replayed = journal.replay(all_data, journal.previous_path)
+                write_json_atomic(path, all_data, serializer=serializer)
+                rolled_back = f"its previous copy plus {replayed} edit(s) saved after it"
+            else:
+                import shutil
+
+                shutil.copyfile(backup_path, path)
+                rolled_back = "its previous copy"
+            messages.append(f"{name} was damaged and has been rolled back to {rolled_back}. "
+                            f"The damaged file was kept as {os.path.basename(torn_path)}.")
+        else:
+            messages.append(f"{name} was damaged and no backup was available. "
+                            f"The damaged file was kept as {os.path.basename(torn_path)}.")
+        logging.error(messages[-1])
+    return messages
+
+
+def is_readable_data_file(path):
+    try:
+        DataSerializer.read(path)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def parse_quantitative(value):
+    """Parse a quantitative answer for charting, treating blanks, NaN and invalid input as 0."""
+    try:
+        number = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+def to_quantitative(value):
+    """Validate a quantitative answer, returning a float, or NaN when it is blank.
+
+    Raises ValueError when the value is not a finite number.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return math.nan
+    if isinstance(value, float) and math.isnan(value):
+        return value
+    try:
+        number = float(value)
+    except TypeError:
+        raise ValueError(f"{value!r} is not a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+def format_quantitative(number):
+    """Display text of a stored number: "" for NaN and no trailing ".0" on whole numbers."""
+    number = float(number)
+    if math.isnan(number):
+        return ""
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def quantitative_array(answers):
+    """Pack a question's {day: value} answers into an array('d') of weekday values, NaN when unanswered.
+
+    Text that is not a number (written before answers were validated) is treated
+    as unanswered.
+    """
+    values = array("d", [math.nan]) * len(DAYS_OF_WEEK)
+    for day_index, day in enumerate(DAYS_OF_WEEK):
+        try:
+            values[day_index] = to_quantitative(answers.get(day))
+        except ValueError:
+            pass
+    return values
+
+
+def quantitative_answers(values):
+    """Unpack an array('d') of weekday values into {day: text}, leaving out unanswered days."""
+    return {day: format_quantitative(value) for day, value in zip(DAYS_OF_WEEK, values) if not math.isnan(value)}
+
+
+def compact_patient_data(patient_data, quantitative):
+    """Return a copy of a patient's weeks with the answers to the quantitative questions packed into arrays."""
+    compact = {}
+    for week_key, week_data in patient_data.items():
+        if not isinstance(week_data, dict):
+            compact[week_key] = week_data
+            continue
+        compact[week_key] = {
+            question: quantitative_array(answers) if question in quantitative and isinstance(answers, dict)
+            else answers
+            for question, answers in week_data.items()
+        }
+    return compact
+
+
+def answer_value(question_data, day_index):
+    """Return one day's stored answer, or None if unanswered.
+
+    question_data is either a compact array('d') of a quantitative question or a
+    {day: value} dict as stored on disk.
+    """
+    if isinstance(question_data, array):
+        value = question_data[day_index]
+        return None if math.isnan(value) else value
+    return question_data.get(DAYS_OF_WEEK[day_index])
+
+
+def answer_text(question_data, day_index):
+    """Return one day's answer as display text."""
+    value = answer_value(question_data, day_index)
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else format_quantitative(value)
+
+
+def chart_values(question_data):
+    """Return the weekday values of a quantitative question for charting, with blanks as 0."""
+    if isinstance(question_data, array):
+        return [0.0 if math.isnan(value) else value for value in question_data]
+    return [parse_quantitative(question_data.get(day)) for day in DAYS_OF_WEEK]
+
+
+def week_start_from_key(week_key):
+    """Return the Monday of a "yyyy-MM-dd_to_yyyy-MM-dd" week key as a date, or None if malformed."""
+    try:
+        return datetime.date.fromisoformat(week_key.split("_to_")[0])
+    except ValueError:
+        return None
+
+
+def collect_history_points(patient_data, question_text, first_day=None, last_day=None, week_keys=None):
+    """Return sorted (msecs since epoch, value) points for one question across all weeks.
+
+    Days without an answer are left out rather than plotted as 0. Pass week_keys
+    (e.g. from a WeekIndex range query) to only visit those weeks.
+    """
+    points = []
+    for week_key in patient_data if week_keys is None else week_keys:
+        week_data = patient_data.get(week_key)
+        week_start = week_start_from_key(week_key)
+        if week_start is None or not isinstance(week_data, dict):
+            continue
+        question_data = week_data.get(question_text, {})
+        for day_index in range(len(DAYS_OF_WEEK)):
+            value = answer_value(question_data, day_index)
+            if value in (None, ""):
+                continue
+            date = week_start + datetime.timedelta(days=day_index)
+            if (first_day and date < first_day) or (last_day and date > last_day):
+                continue
+            msecs = datetime.datetime.combine(date, datetime.time()).timestamp() * 1000
+            points.append((msecs, parse_quantitative(value)))
+    points.sort()
+    return points
+
+
+def downsample_lttb(points, threshold):
+    """Downsample sorted (x, y) points with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each bucket in between, the point
+    forming the largest triangle with its neighbours, which preserves the visual
+    shape of the line (peaks and dips) with far fewer points.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle.
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_points = points[next_start:next_end]
+        average_x = sum(x for x, _ in next_points) / len(next_points)
+        average_y = sum(y for _, y in next_points) / len(next_points)
+
+        previous_x, previous_y = points[previous]
+        best_area = -1
+        best_index = previous + 1
+        for index in range(int(bucket * bucket_size) + 1, int((bucket + 1) * bucket_size) + 1):
+            x, y = points[index]
+            area = abs((previous_x - average_x) * (y - previous_y) - (previous_x - x) * (average_y - previous_y))
+            if area > best_area:
+                best_area = area
+                best_index = index
+        sampled.append(points[best_index])
+        previous = best_index
+
+    sampled.append(points[-1])
+    return sampled
+
+
 def is_new_version_on_platform2(name):
     platform_name = platform.system()
     is_version_to_update = False
@@ -55,24 +693,2311 @@ def is_new_version_on_platform2(name):
     return is_version_to_update
 
 
+def parse_version(version):
+    """Turn a tag such as "v1.0.25" into a comparable tuple such as (1, 0, 25).
+
+    Pre-release tags ("v1.1.0-beta") sort before the final release.
+    """
+    version = str(version).strip().lstrip("vV")
+    release, _, pre_release = version.partition("-")
+    numbers = []
+    for part in release.split("."):
+        digits = re.match(r"\d*", part).group()
+        numbers.append(int(digits) if digits else 0)
+    while len(numbers) < 3:
+        numbers.append(0)
+    return tuple(numbers) + ((1,) if not pre_release else (0, pre_release))
+
+
+def fetch_latest_release(url=UPDATE_CHECK_URL, cache_path=None, timeout=UPDATE_CHECK_TIMEOUT):
+    """Fetch the latest release JSON, reusing the cached copy when the server answers 304.
+
+    The last response and its ETag are kept in update_cache.json and sent back as
+    If-None-Match, so repeated checks cost a tiny request and do not count
+    against GitHub's rate limit. Raises requests.RequestException on failure.
+    """
+    import requests
+
+    cache_path = cache_path or get_user_data_path("update_cache.json")
+    cache = {}
+    try:
+        with open(cache_path, "r") as file:
+            cache = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if cache.get("url") == url and cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and "release" in cache:
+        logging.info("Release information not modified, using cached response.")
+        return cache["release"]
+    response.raise_for_status()
+    release_data = response.json()
+
+    try:
+        write_json_atomic(cache_path, {"url": url, "etag": response.headers.get("ETag"), "release": release_data},
+                          indent=None)
+    except OSError as e:
+        logging.warning(f"Failed to cache release information: {e}")
+    return release_data
+
+
+def find_update(release_data, current_version):
+    """Return (latest_version, download_url, checksum_url) if the release is newer and has an asset for this platform.
+
+    checksum_url points at "<asset>.sha256" or a SHA256SUMS file in the release, or is None.
+    """
+    download_url = None
+    asset_name = None
+    latest_version = release_data["tag_name"]
+    assets = release_data.get("assets", [])
+    for release in assets:
+        if is_new_version_on_platform2(release['name']):
+            download_url = release["browser_download_url"] if release["browser_download_url"] else None
+            asset_name = release['name']
+
+    if not download_url or parse_version(latest_version) <= parse_version(current_version):
+        return None
+
+    checksum_url = None
+    for release in assets:
+        if release['name'] in (f"{asset_name}.sha256", "SHA256SUMS", "SHA256SUMS.txt"):
+            checksum_url = release["browser_download_url"]
+            if release['name'].endswith(".sha256"):
+                break  # Prefer the asset's own checksum file
+    return latest_version, download_url, checksum_url
+
+
+def fetch_expected_sha256(checksum_url, asset_name, timeout=UPDATE_CHECK_TIMEOUT):
+    """Read the expected SHA-256 of asset_name from a "<hash>" or "<hash>  <file>" checksum file."""
+    import requests
+
+    response = requests.get(checksum_url, timeout=timeout)
+    response.raise_for_status()
+    for line in response.text.splitlines():
+        parts = line.split()
+        if len(parts) == 1 or (len(parts) >= 2 and parts[-1].lstrip("*") == asset_name):
+            return parts[0].lower()
+    raise ValueError(f"No checksum for {asset_name} in {checksum_url}")
+
+
+def download_with_resume(url, part_path, progress=None, is_cancelled=None,
+                         chunk_size=UPDATE_DOWNLOAD_CHUNK_SIZE, timeout=UPDATE_CHECK_TIMEOUT):
+    """Download url into part_path, resuming a previous partial download with an HTTP Range request.
+
+    The ETag (or Last-Modified) of the first response is kept next to the
+    partial file and sent as If-Range when resuming, so the server sends the
+    whole file again (200) instead of the rest of a different one if the asset
+    changed in between. Without a stored validator the download starts over.
+
+    progress(received, total) is called after every chunk; total is 0 when unknown.
+    Returns the SHA-256 hex digest of the complete file, or None if cancelled (the
+    partial file is kept so the next attempt can resume).
+    """
+    import requests
+
+    validator_path = part_path + ".validator"
+    validator = None
+    if os.path.exists(validator_path):
+        with open(validator_path, "r") as file:
+            validator = file.read().strip() or None
+    received = os.path.getsize(part_path) if os.path.exists(part_path) and validator else 0
+    headers = {"Range": f"bytes={received}-", "If-Range": validator} if received else {}
+
+    digest = hashlib.sha256()
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        already_complete = received and response.status_code == 416  # Nothing left to fetch
+        if not already_complete:
+            response.raise_for_status()
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code != 206 or not content_range.startswith(f"bytes {received}-"):
+                received = 0  # Server ignored the range or the file changed; start over
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                with open(validator_path, "w") as file:
+                    file.write(validator or "")
+        content_length = int(response.headers.get("Content-Length", 0))
+        total = received + content_length if content_length else 0
+
+        if received:
+            with open(part_path, "rb") as existing:
+                for block in iter(lambda: existing.read(chunk_size), b""):
+                    digest.update(block)
+        if already_complete:
+            return digest.hexdigest()
+
+        with open(part_path, "ab" if received else "wb") as update_file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if is_cancelled and is_cancelled():
+                    return None
+                if chunk:
+                    update_file.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+                    if progress:
+                        progress(received, total)
+    return digest.hexdigest()
+
+
+def extract_archive(archive_path, target_dir):
+    """Extract a .zip or .tar.gz update archive into target_dir in a single pass."""
+    import tarfile
+    import zipfile
+
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path, "r") as zip_ref:
+            zip_ref.extractall(target_dir)  # zipfile already strips absolute paths and ".."
+    else:
+        with tarfile.open(archive_path, "r:gz") as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(target_dir, filter="data")
+            else:
+                tar.extractall(target_dir, members=safe_tar_members(tar, target_dir))
+
+
+def safe_tar_members(tar, target_dir):
+    """Yield the archive's members, refusing any that would land outside target_dir (for Pythons without filter=)."""
+    root = os.path.realpath(target_dir)
+    for member in tar.getmembers():
+        path = os.path.realpath(os.path.join(root, member.name))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Update archive contains an unsafe path: {member.name}")
+        if member.issym() or member.islnk():
+            link_base = os.path.dirname(path) if member.issym() else root
+            link_target = os.path.realpath(os.path.join(link_base, member.linkname))
+            if os.path.commonpath([root, link_target]) != root:
+                raise ValueError(f"Update archive contains an unsafe link: {member.name}")
+        elif not (member.isfile() or member.isdir()):
+            raise ValueError(f"Update archive contains an unsupported member: {member.name}")
+        yield member
+
+
 def setup_logging():
+    """Send log records through a queue to rotating files written on a background thread.
+
+    app.log gets the regular log, timings.jsonl the structured timing events
+    from timed(). Callers only put records on the queue, so logging never does
+    disk I/O on the GUI thread. Returns the started QueueListener, which is
+    stopped (flushing the queue) when the process exits.
+    """
     log_dir = get_user_data_path("")  # Get the CaseManager directory
-    log_file = os.path.join(log_dir, "app.log")
-
-    # Configure logging
-    logging.basicConfig(
-        filename=log_file,
-        filemode="a",  # Append to the log file
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        level=logging.DEBUG,
+
+    app_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "app.log"), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    app_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    app_handler.addFilter(lambda record: record.name != timing_logger.name)
+
+    timing_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "timings.jsonl"), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8"
     )
+    timing_handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_handler.addFilter(lambda record: record.name == timing_logger.name)
+
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, app_handler, timing_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Drain the queue before the process exits
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(queue_handler)
+    timing_logger.addHandler(queue_handler)
     logging.debug("Logging setup complete.")
+    return listener
+
+
+class StartupProfiler:
+    """Record how long each startup phase takes when the app runs with --profile-startup."""
+
+    def __init__(self):
+        self.enabled = False
+        self.last_mark = IMPORT_STARTED
+        self.phases = []
+
+    def mark(self, phase):
+        """Close the current phase under the given name."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+    def report(self):
+        """Write the recorded phase timings to the log."""
+        if not self.enabled:
+            return
+        for phase, seconds in self.phases:
+            logging.info(f"Startup phase '{phase}': {seconds * 1000:.1f} ms")
+        logging.info(f"Startup total: {(self.last_mark - IMPORT_STARTED) * 1000:.1f} ms")
+
+
+startup_profiler = StartupProfiler()
+
+
+class PerformanceMonitor:
+    """Collect the durations of timed operations and summarize them per operation."""
+
+    def __init__(self, samples=TIMING_SAMPLES):
+        self.lock = threading.Lock()
+        self.samples = samples
+        self.durations = {}  # operation -> deque of recent durations in seconds
+        self.calls = {}  # operation -> total number of calls
+
+    def record(self, operation, seconds, ok=True, **fields):
+        """Store one duration and emit it as a JSON-lines timing event."""
+        with self.lock:
+            self.durations.setdefault(operation, deque(maxlen=self.samples)).append(seconds)
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if timing_logger.handlers:
+            event = {"ts": round(time.time(), 3), "operation": operation, "duration_ms": round(seconds * 1000, 3),
+                     "ok": ok, "thread": threading.current_thread().name}
+            event.update(fields)
+            timing_logger.info(json.dumps(event, default=str))
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """Nearest-rank percentile of an already sorted, non-empty list."""
+        return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+    def summary(self):
+        """Return (operation, calls, p50 ms, p95 ms, max ms) rows, slowest p95 first."""
+        with self.lock:
+            snapshot = {operation: sorted(durations) for operation, durations in self.durations.items()}
+            calls = dict(self.calls)
+        rows = [
+            (operation, calls[operation], self.percentile(values, 0.5) * 1000,
+             self.percentile(values, 0.95) * 1000, values[-1] * 1000)
+            for operation, values in snapshot.items()
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+timing_logger = logging.getLogger("emr.timing")
+timing_logger.setLevel(logging.INFO)
+timing_logger.propagate = False  # Timing events only go to timings.jsonl
+performance_monitor = PerformanceMonitor()
+
+
+@contextlib.contextmanager
+def timed(operation, **fields):
+    """Time a block, or every call when used as a decorator, and record it under the given operation name."""
+    started = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        performance_monitor.record(operation, time.perf_counter() - started, ok, **fields)
+
+
+class PatientDataJournal:
+    """Append-only edit journal on top of the patient_data.json snapshot.
+
+    Every cell edit is appended as one small JSON line to patient_data.journal
+    instead of rewriting the whole snapshot. Once enough records pile up, a
+    background thread folds them into patient_data.json. Loading replays the
+    snapshot plus any journal records, so a crash never loses a committed edit.
+
+    Each append is fsynced before it returns. The autosave writer hands over a
+    whole burst of edits at once, so they share one fsync (group commit).
+
+    Other instances append to the same journal. read_changes returns just the
+    records added since this instance last read it, by remembering how far into
+    the file it got. Compaction moves the journal aside before folding it and
+    keeps the folded segment as patient_data.journal.previous, so an instance
+    that had not read to its end yet finishes it there instead of reloading the
+    whole snapshot.
+    """
+
+    def __init__(self, snapshot_path=None, journal_path=None, compact_threshold=JOURNAL_COMPACT_THRESHOLD,
+                 serializer=None, file_lock=None):
+        self.snapshot_path = snapshot_path or get_user_data_path("patient_data.json")
+        self.serializer = serializer or DataSerializer()
+        self.file_lock = file_lock or DataFileLock()
+        self.read_offset = 0  # Bytes of the journal already applied
+        self.journal_inode = None  # Which journal file read_offset refers to; None before one exists
+        self.snapshot_signature = None  # The snapshot as last read or written by this instance
+        self.unseen_records = {}  # Other instances' records picked up while rotating the journal
+        self.journal_path = journal_path or get_user_data_path("patient_data.journal")
+        self.compacting_path = self.journal_path + ".compacting"
+        self.previous_path = self.journal_path + ".previous"  # Last segment folded into the snapshot
+        self.finished_segments = deque(maxlen=8)  # (inode, size) of rotated segments read to the end since load
+        self.compact_threshold = compact_threshold
+        self.pending_records = 0
+        self.compaction_thread = None
+        self.lock = threading.Lock()  # Guards the journal file
+        self.snapshot_lock = threading.Lock()  # Guards swapping in a new snapshot
+
+    def append(self, patient_uuid, week_key, question, day, value):
+        """Append a single cell change to the journal."""
+        record = {"patient": patient_uuid, "week": week_key, "question": question, "day": day, "value": value}
+        line = json.dumps(record) + "\n"
+        with self.file_lock, self.lock:
+            self.write_durably(line)
+            self.pending_records += 1
+            should_compact = self.pending_records >= self.compact_threshold
+        if should_compact:
+            self.start_compaction()
+
+    def append_many(self, answers):
+        """Append a batch of {(patient_uuid, week_key, question, day): value} changes in one write."""
+        lines = "".join(
+            json.dumps({"patient": patient_uuid, "week": week_key, "question": question, "day": day, "value": value})
+            + "\n"
+            for (patient_uuid, week_key, question, day), value in answers.items()
+        )
+        with self.file_lock, self.lock:
+            self.write_durably(lines)
+            self.pending_records += len(answers)
+            should_compact = self.pending_records >= self.compact_threshold
+        if should_compact:
+            self.start_compaction()
+
+    def write_durably(self, lines):
+        """Append lines to the journal and fsync them; callers hold self.file_lock and self.lock."""
+        with open(self.journal_path, "a") as file:
+            start = file.tell()
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+            inode = os.fstat(file.fileno()).st_ino
+            if start == self.read_offset and self.journal_inode in (None, inode):
+                # Nobody else appended since our last read, so there is nothing new to read back.
+                self.read_offset = file.tell()
+                self.journal_inode = inode
+
+    def load(self):
+        """Load the snapshot and replay the journal on top of it."""
+        with self.file_lock, self.snapshot_lock, self.lock:
+            all_data = self.read_snapshot()
+            self.snapshot_signature = file_signature(self.snapshot_path)
+            self.finished_segments.clear()
+            if self.replay(all_data, self.compacting_path):
+                # Another instance is folding this segment; its snapshot will hold nothing new.
+                compacting_signature = file_signature(self.compacting_path)
+                self.finished_segments.append((compacting_signature[0], compacting_signature[2]))
+            self.pending_records = self.replay(all_data, self.journal_path)
+            journal_signature = file_signature(self.journal_path)
+            self.journal_inode, self.read_offset = journal_signature[::2] if journal_signature else (None, 0)
+            self.unseen_records = {}
+            should_compact = self.pending_records >= self.compact_threshold
+        if should_compact:
+            self.start_compaction()
+        return all_data
+
+    def read_snapshot(self):
+        """Read patient_data.json, returning an empty dict if it does not exist yet."""
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        return self.serializer.read(self.snapshot_path)
+
+    def replay(self, all_data, path):
+        """Apply the journal records stored at path to all_data and return how many were applied."""
+        if not os.path.exists(path):
+            return 0
+        applied = 0
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line means the app died mid-append; the edit never completed.
+                    logging.warning(f"Skipping unreadable journal record in {path}")
+                    continue
+                self.apply_record(all_data, record)
+                applied += 1
+        return applied
+
+    def has_changes(self):
+        """Cheaply tell whether the files differ from what this instance last read or wrote itself."""
+        with self.lock:
+            if self.unseen_records or file_signature(self.snapshot_path) != self.snapshot_signature:
+                return True
+            journal_signature = file_signature(self.journal_path)
+            if journal_signature is None:
+                return self.journal_inode is not None
+            return journal_signature[0] != self.journal_inode or journal_signature[2] != self.read_offset
+
+    def read_changes(self):
+        """Return {(patient_uuid, week_key, question, day): value} appended since the last read.
+
+        After another instance compacted, only the unread end of the folded
+        segment and the new journal are parsed. Returns None when that segment
+        is gone or the snapshot holds records this instance never read; the
+        caller then has to load everything again.
+        """
+        with self.file_lock, self.lock:
+            if not self.read_rotated_segment():
+                return None
+            changes, self.unseen_records = self.unseen_records, {}
+            if not self.snapshot_is_known():
+                return None
+            self.snapshot_signature = file_signature(self.snapshot_path)
+            journal_signature = file_signature(self.journal_path)
+            if journal_signature is None:
+                return changes
+            if journal_signature[0] == self.journal_inode and journal_signature[2] < self.read_offset:
+                return None
+            changes.update(self.read_records_from_offset())
+            return changes
+
+    def snapshot_is_known(self):
+        """Whether the snapshot is the one last read or written here, or was folded from segments read here."""
+        if file_signature(self.snapshot_path) == self.snapshot_signature:
+            return True
+        previous_signature = file_signature(self.previous_path)
+        return previous_signature is not None and (
+            previous_signature[0], previous_signature[2]) in self.finished_segments
+
+    def read_rotated_segment(self):
+        """If another instance moved the journal aside, read the rest of it from its new name.
+
+        The records go to unseen_records. Returns False when the segment cannot
+        be found any more. Callers hold both locks.
+        """
+        journal_signature = file_signature(self.journal_path)
+        if self.journal_inode is None or (journal_signature and journal_signature[0] == self.journal_inode):
+            return True
+        for path in (self.compacting_path, self.previous_path):
+            signature = file_signature(path)
+            if signature and signature[0] == self.journal_inode:
+                self.unseen_records.update(self.read_records_from_offset(path))
+                self.finished_segments.append((signature[0], self.read_offset))
+                self.journal_inode, self.read_offset = None, 0
+                return True
+        return False
+
+    def read_records_from_offset(self, path=None):
+        """Read the complete journal lines after read_offset and advance it; callers hold both locks."""
+        with open(path or self.journal_path, "rb") as file:
+            file.seek(self.read_offset)
+            data = file.read()
+            inode = os.fstat(file.fileno()).st_ino
+        data = data[:data.rfind(b"\n") + 1]  # Stop before a line that is still being written
+        records = {}
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping unreadable journal record in {self.journal_path}")
+                continue
+            records[(record["patient"], record["week"], record["question"], record["day"])] = record["value"]
+        self.read_offset += len(data)
+        self.journal_inode = inode
+        return records
+
+    @staticmethod
+    def apply_record(all_data, record):
+        """Apply one journal record to the nested patient -> week -> question -> day structure."""
+        patient_data = all_data.setdefault(record["patient"], {})
+        week_data = patient_data.setdefault(record["week"], {})
+        question_data = week_data.setdefault(record["question"], {})
+        question_data[record["day"]] = record["value"]
+
+    def start_compaction(self):
+        """Compact the journal on a background thread unless a compaction is already running."""
+        with self.lock:
+            if self.compaction_thread and self.compaction_thread.is_alive():
+                return
+            self.compaction_thread = threading.Thread(target=self.compact, name="JournalCompaction")
+            self.compaction_thread.start()
+
+    def compact(self):
+        """Fold the journal into a new patient_data.json snapshot."""
+        try:
+            # Rotate the live journal so new edits keep appending while we compact.
+            with self.file_lock, self.lock:
+                # Only a snapshot folded from records this instance has all seen may be taken as its own.
+                caught_up = self.read_rotated_segment() and self.snapshot_is_known()
+                if os.path.exists(self.journal_path):
+                    inode = os.stat(self.journal_path).st_ino
+                    if self.journal_inode in (None, inode):
+                        # Keep other instances' latest records; after the rotation they only live in the snapshot.
+                        self.unseen_records.update(self.read_records_from_offset())
+                        self.finished_segments.append((inode, self.read_offset))
+                    else:
+                        caught_up = False
+                    compacting_signature = file_signature(self.compacting_path)
+                    if compacting_signature:
+                        # A previous compaction was interrupted; merge both journals.
+                        if (compacting_signature[0], compacting_signature[2]) not in self.finished_segments:
+                            caught_up = False
+                        with open(self.journal_path, "r") as source, open(self.compacting_path, "a") as target:
+                            target.write(source.read())
+                        os.remove(self.journal_path)
+                    else:
+                        os.replace(self.journal_path, self.compacting_path)
+                self.pending_records = 0
+                self.read_offset = 0
+                self.journal_inode = None
+
+            with self.file_lock:
+                if not os.path.exists(self.compacting_path):
+                    return  # Nothing to fold, or another instance already folded it
+                # If another instance rewrote the snapshot, leave our signature stale so read_changes reloads.
+                snapshot_was_ours = caught_up and self.snapshot_is_known()
+                all_data = self.read_snapshot()
+                self.replay(all_data, self.compacting_path)
+                with self.snapshot_lock:
+                    write_json_atomic(self.snapshot_path, all_data, keep_backup=True, serializer=self.serializer)
+                    # Kept so instances that had not read to its end can finish it
+                    os.replace(self.compacting_path, self.previous_path)
+                    if snapshot_was_ours:
+                        self.snapshot_signature = file_signature(self.snapshot_path)
+            logging.info("Compacted patient data journal into snapshot.")
+        except Exception as e:
+            logging.error(f"Journal compaction failed: {e}")
+
+
+class Storage(ABC):
+    """Interface for persisting patients, questions and weekly answers.
+
+    Weekly answers are addressed as patient -> week -> question -> day, where the
+    week key has the form "yyyy-MM-dd_to_yyyy-MM-dd".
+    """
+
+    # True when load_patient_data can read one patient without parsing everyone else's data.
+    supports_partial_load = False
+
+    def __init__(self):
+        self.recovered_files = []  # Messages from recover_data_files, set by create_storage
+
+    @abstractmethod
+    def load_patients(self):
+        ...
+
+    @abstractmethod
+    def save_patients(self, patients):
+        ...
+
+    @abstractmethod
+    def save_patient(self, patient_uuid, patient):
+        ...
+
+    @abstractmethod
+    def delete_patient(self, patient_uuid):
+        ...
+
+    @abstractmethod
+    def load_questions(self):
+        ...
+
+    @abstractmethod
+    def save_questions(self, questions):
+        ...
+
+    @abstractmethod
+    def load_patient_data(self, patient_uuid):
+        ...
+
+    @abstractmethod
+    def load_all_patient_data(self):
+        ...
+
+    @abstractmethod
+    def save_answer(self, patient_uuid, week_key, question, day, value):
+        ...
+
+    def save_answers(self, answers):
+        """Save a batch of {(patient_uuid, week_key, question, day): value} answers."""
+        for (patient_uuid, week_key, question, day), value in answers.items():
+            self.save_answer(patient_uuid, week_key, question, day, value)
+
+    def save_patient_changes(self, changes):
+        """Save a batch of {patient_uuid: patient} changes, where None means the patient was deleted."""
+        for patient_uuid, patient in changes.items():
+            if patient is None:
+                self.delete_patient(patient_uuid)
+            else:
+                self.save_patient(patient_uuid, patient)
+
+    def import_patient_data(self, all_data):
+        """Save nested patient -> week -> question -> day answers, e.g. from a bulk import, in one batch."""
+        self.save_answers(flatten_patient_data(all_data))
+
+    def watched_paths(self):
+        """Files and folders to watch for writes by other instances."""
+        return []
 
+    def has_external_changes(self):
+        """Cheap check, from file signatures, whether reload_changes may find anything.
 
-setup_logging()
+        False when the watched files are exactly as this instance last read or
+        wrote them, e.g. when the watcher fired for one of its own saves.
+        """
+        return True
+
+    def reload_changes(self):
+        """Return (patient_changes, answer_changes) that other instances saved since the last read.
+
+        patient_changes is {patient_uuid: patient or None when deleted} and
+        answer_changes is {(patient_uuid, week_key, question, day): value}.
+        """
+        return {}, {}
+
+
+class JsonStorage(Storage):
+    """Storage backed by patients.json, questions.json and the journaled patient_data.json.
+
+    Writes happen under a DataFileLock. Before changing patients.json, records
+    another instance saved in the meantime are merged in rather than
+    overwritten; patient_hashes remembers which version of each record the app
+    was given, so reload_changes can hand over only the records that differ.
+    """
+
+    def __init__(self, serializer=None):
+        super().__init__()
+        self.serializer = serializer or DataSerializer()
+        self.file_lock = DataFileLock()
+        self.patients_path = get_user_data_path("patients.json")
+        self.questions_path = get_user_data_path("questions.json")
+        self.journal = PatientDataJournal(serializer=self.serializer, file_lock=self.file_lock)
+        self.patients = {}
+        self.patients_signature = None  # patients.json as last read or written here
+        self.patient_hashes = {}  # patient_uuid -> hash of the record the app last received
+        self.external_patients = False  # True once records saved by another instance were read in
+
+    def load_patients(self):
+        logging.info(f"Loading patients from: {self.patients_path}")  # Debugging information
+        with self.file_lock:
+            if not os.path.exists(self.patients_path):
+                write_json_atomic(self.patients_path, {}, serializer=self.serializer)
+                logging.info("Created new patients.json file.")  # Debugging information
+            self.patients = self.serializer.read(self.patients_path)
+            self.patients_signature = file_signature(self.patients_path)
+            self.patient_hashes = {
+                patient_uuid: patient_hash(patient) for patient_uuid, patient in self.patients.items()
+            }
+            # Keep a private copy so background saves never iterate the dict the UI is editing.
+            return copy.deepcopy(self.patients)
+
+    def save_patients(self, patients):
+        with self.file_lock:
+            self.patients = copy.deepcopy(patients)
+            self.write_patients()
+            self.patient_hashes = {
+                patient_uuid: patient_hash(patient) for patient_uuid, patient in self.patients.items()
+            }
+
+    def write_patients(self):
+        write_json_atomic(self.patients_path, self.patients, keep_backup=True, serializer=self.serializer)
+        self.patients_signature = file_signature(self.patients_path)
+
+    def read_external_patients(self):
+        """Re-read patients.json if another instance rewrote it; callers hold self.file_lock."""
+        if os.path.exists(self.patients_path) and file_signature(self.patients_path) != self.patients_signature:
+            self.patients = self.serializer.read(self.patients_path)
+            self.patients_signature = file_signature(self.patients_path)
+            self.external_patients = True
+
+    def save_patient(self, patient_uuid, patient):
+        self.save_patient_changes({patient_uuid: patient})
+
+    def delete_patient(self, patient_uuid):
+        self.save_patient_changes({patient_uuid: None})
+
+    def save_patient_changes(self, changes):
+        with self.file_lock:
+            self.read_external_patients()
+            for patient_uuid, patient in changes.items():
+                if patient is None:
+                    self.patients.pop(patient_uuid, None)
+                    self.patient_hashes.pop(patient_uuid, None)
+                else:
+                    self.patients[patient_uuid] = patient
+                    self.patient_hashes[patient_uuid] = patient_hash(patient)
+            self.write_patients()
+
+    def watched_paths(self):
+        return [os.path.dirname(self.patients_path), self.journal.journal_path]
+
+    def has_external_changes(self):
+        return file_signature(self.patients_path) != self.patients_signature or self.journal.has_changes()
+
+    def reload_changes(self):
+        return self.reload_patient_changes(), self.reload_answer_changes()
+
+    def reload_patient_changes(self):
+        """Return the patient records that differ from what the app was last given.
+
+        The hashes are compared and updated under self.file_lock, like the writes
+        in save_patient_changes, so a save on the autosave thread cannot race them.
+        """
+        with self.file_lock:
+            self.read_external_patients()
+            if not self.external_patients:
+                return {}
+            self.external_patients = False
+            changes = {}
+            for patient_uuid, patient in self.patients.items():
+                digest = patient_hash(patient)
+                if self.patient_hashes.get(patient_uuid) != digest:
+                    changes[patient_uuid] = copy.deepcopy(patient)
+                    self.patient_hashes[patient_uuid] = digest
+            for patient_uuid in set(self.patient_hashes) - set(self.patients):
+                changes[patient_uuid] = None
+                del self.patient_hashes[patient_uuid]
+            return changes
+
+    def reload_answer_changes(self):
+        changes = self.journal.read_changes()
+        if changes is None:
+            logging.info("Patient data was compacted by another instance, reloading it.")
+            changes = flatten_patient_data(self.journal.load())
+        return changes
+
+    def load_questions(self):
+        if not os.path.exists(self.questions_path):
+            self.save_questions(DEFAULT_QUESTIONS)
+        return self.serializer.read(self.questions_path)
+
+    def save_questions(self, questions):
+        with self.file_lock:
+            write_json_atomic(self.questions_path, questions, keep_backup=True, serializer=self.serializer)
+
+    def load_patient_data(self, patient_uuid):
+        return self.journal.load().get(patient_uuid, {})
+
+    def load_all_patient_data(self):
+        return self.journal.load()
+
+    def save_answer(self, patient_uuid, week_key, question, day, value):
+        self.journal.append(patient_uuid, week_key, question, day, value)
+
+    def save_answers(self, answers):
+        self.journal.append_many(answers)
+
+
+class SqliteStorage(Storage):
+    """Storage backed by a single SQLite database with one row per patient, question and answer."""
+
+    supports_partial_load = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS patients (
+            uuid TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS patients_position ON patients (position);
+        CREATE TABLE IF NOT EXISTS questions (
+            position INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            type TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS answers (
+            patient_uuid TEXT NOT NULL,
+            week TEXT NOT NULL,
+            question TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value,
+            PRIMARY KEY (patient_uuid, week, question, day)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or get_user_data_path("casemanager.db")
+        # Writes may come from a background thread, so serialize access ourselves.
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # Sync the WAL on every commit; the autosave writer batches edits into one commit.
+            self.connection.execute("PRAGMA synchronous=FULL")
+            self.connection.executescript(self.SCHEMA)
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load_patients(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT uuid, data FROM patients ORDER BY position").fetchall()
+        return {patient_uuid: json.loads(data) for patient_uuid, data in rows}
+
+    def save_patients(self, patients):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM patients")
+            self.connection.executemany(
+                "INSERT INTO patients (uuid, position, data) VALUES (?, ?, ?)",
+                [(patient_uuid, position, json.dumps(patient))
+                 for position, (patient_uuid, patient) in enumerate(patients.items())]
+            )
+
+    def save_patient(self, patient_uuid, patient):
+        with self.lock, self.connection:
+            self.write_patient(patient_uuid, patient)
+
+    def delete_patient(self, patient_uuid):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM patients WHERE uuid = ?", (patient_uuid,))
+
+    def write_patient(self, patient_uuid, patient):
+        """Upsert a patient row inside the caller's transaction, appending new patients at the end."""
+        updated = self.connection.execute(
+            "UPDATE patients SET data = ? WHERE uuid = ?", (json.dumps(patient), patient_uuid)
+        ).rowcount
+        if not updated:
+            self.connection.execute(
+                "INSERT INTO patients (uuid, position, data) "
+                "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM patients), ?)",
+                (patient_uuid, json.dumps(patient))
+            )
+
+    def load_questions(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT text, type FROM questions ORDER BY position").fetchall()
+        if not rows:
+            self.save_questions(DEFAULT_QUESTIONS)
+            return [dict(question) for question in DEFAULT_QUESTIONS]
+        return [{"text": text, "type": question_type} for text, question_type in rows]
+
+    def save_questions(self, questions):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM questions")
+            self.connection.executemany(
+                "INSERT INTO questions (position, text, type) VALUES (?, ?, ?)",
+                [(position, question["text"], question["type"]) for position, question in enumerate(questions)]
+            )
+
+    def load_patient_data(self, patient_uuid):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT week, question, day, value FROM answers WHERE patient_uuid = ?", (patient_uuid,)
+            ).fetchall()
+        patient_data = {}
+        for week_key, question, day, value in rows:
+            patient_data.setdefault(week_key, {}).setdefault(question, {})[day] = value
+        return patient_data
+
+    def load_all_patient_data(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT patient_uuid, week, question, day, value FROM answers").fetchall()
+        all_data = {}
+        for patient_uuid, week_key, question, day, value in rows:
+            all_data.setdefault(patient_uuid, {}).setdefault(week_key, {}).setdefault(question, {})[day] = value
+        return all_data
+
+    def save_answer(self, patient_uuid, week_key, question, day, value):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO answers (patient_uuid, week, question, day, value) VALUES (?, ?, ?, ?, ?)",
+                (patient_uuid, week_key, question, day, value)
+            )
+
+    def save_answers(self, answers):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO answers (patient_uuid, week, question, day, value) VALUES (?, ?, ?, ?, ?)",
+                [(patient_uuid, week_key, question, day, value)
+                 for (patient_uuid, week_key, question, day), value in answers.items()]
+            )
+
+    def save_patient_changes(self, changes):
+        with self.lock, self.connection:
+            for patient_uuid, patient in changes.items():
+                if patient is None:
+                    self.connection.execute("DELETE FROM patients WHERE uuid = ?", (patient_uuid,))
+                else:
+                    self.write_patient(patient_uuid, patient)
+
+    def import_patient_data(self, all_data):
+        """Bulk insert nested patient data in a single transaction."""
+        rows = (
+            (patient_uuid, week_key, question, day, value)
+            for patient_uuid, weeks in all_data.items()
+            for week_key, week_data in weeks.items()
+            if isinstance(week_data, dict)
+            for question, question_data in week_data.items()
+            if isinstance(question_data, dict)
+            for day, value in question_data.items()
+        )
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO answers (patient_uuid, week, question, day, value) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+
+class ShardedJsonStorage(JsonStorage):
+    """JSON storage with one data file per patient (optionally per patient and year).
+
+    Weekly answers live in the patient_data folder next to a manifest.json that
+    lists each patient's shards. A DataScreen only loads the shards of its own
+    patient, and saving an edit rewrites only the shard it belongs to, so save
+    cost scales with one patient's history instead of the whole caseload.
+    Another instance's writes show up as shards whose file signature changed.
+    """
+
+    supports_partial_load = True
+
+    def __init__(self, split_by_year=False, serializer=None):
+        super().__init__(serializer)
+        self.data_dir = get_user_data_path("patient_data")
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.data_dir, "manifest.json")
+        self.shard_lock = threading.RLock()
+        self.shards = {}  # (patient_uuid, shard_name) -> week data loaded from that shard
+        self.shard_signatures = {}  # (patient_uuid, shard_name) -> file signature when read or written here
+        self.external_answers = {}  # Answers from other instances' shards merged in while saving
+        self.loaded_patients = set()  # Patients whose data the app has read, so it needs their changes
+        self.manifest_signature = None
+        self.manifest = self.load_manifest(split_by_year)
+
+    def load_manifest(self, split_by_year):
+        if os.path.exists(self.manifest_path):
+            self.manifest_signature = file_signature(self.manifest_path)
+            return self.serializer.read(self.manifest_path)
+        # Layout is fixed when the folder is created; later changes to the setting need a re-migration.
+        return {"version": 1, "split_by_year": split_by_year, "patients": {}}
+
+    def save_manifest(self):
+        with self.file_lock:
+            self.read_external_manifest()
+            write_json_atomic(self.manifest_path, self.manifest, keep_backup=True, serializer=self.serializer)
+            self.manifest_signature = file_signature(self.manifest_path)
+
+    def read_external_manifest(self):
+        """Merge in shards another instance added to manifest.json; callers hold self.file_lock."""
+        if not os.path.exists(self.manifest_path) or file_signature(self.manifest_path) == self.manifest_signature:
+            return
+        external = self.serializer.read(self.manifest_path)
+        self.manifest_signature = file_signature(self.manifest_path)
+        for patient_uuid, shard_names in external["patients"].items():
+            patient_shards = self.manifest["patients"].setdefault(patient_uuid, [])
+            patient_shards.extend(name for name in shard_names if name not in patient_shards)
+
+    def shard_name(self, week_key):
+        """Return the shard a week belongs to: "all", or its year when splitting by year."""
+        if not self.manifest["split_by_year"]:
+            return "all"
+        week_start = week_start_from_key(week_key)
+        return str(week_start.year) if week_start else "other"
+
+    def shard_path(self, patient_uuid, shard_name):
+        if shard_name == "all":
+            return os.path.join(self.data_dir, f"{patient_uuid}.json")
+        return os.path.join(self.data_dir, patient_uuid, f"{shard_name}.json")
+
+    def load_shard(self, patient_uuid, shard_name):
+        """Return a shard's week data, reading it from disk the first time it is needed."""
+        key = (patient_uuid, shard_name)
+        if key not in self.shards:
+            path = self.shard_path(patient_uuid, shard_name)
+            self.shard_signatures[key] = file_signature(path)
+            if os.path.exists(path):
+                self.shards[key] = self.serializer.read(path)
+            else:
+                self.shards[key] = {}
+        return self.shards[key]
+
+    def refresh_shard(self, patient_uuid, shard_name):
+        """Re-read a loaded shard another instance rewrote and return the answers that differ."""
+        key = (patient_uuid, shard_name)
+        path = self.shard_path(patient_uuid, shard_name)
+        if file_signature(path) == self.shard_signatures.get(key) or not os.path.exists(path):
+            return {}
+        old_answers = flatten_patient_data({patient_uuid: self.shards[key]})
+        self.shards[key] = self.serializer.read(path)
+        self.shard_signatures[key] = file_signature(path)
+        return {
+            answer_key: value
+            for answer_key, value in flatten_patient_data({patient_uuid: self.shards[key]}).items()
+            if old_answers.get(answer_key) != value
+        }
+
+    def write_shard(self, patient_uuid, shard_name):
+        path = self.shard_path(patient_uuid, shard_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json_atomic(path, self.shards[(patient_uuid, shard_name)], keep_backup=True, serializer=self.serializer)
+        self.shard_signatures[(patient_uuid, shard_name)] = file_signature(path)
+
+    def load_patient_data(self, patient_uuid):
+        with self.shard_lock:
+            self.loaded_patients.add(patient_uuid)
+            patient_data = {}
+            for shard_name in self.manifest["patients"].get(patient_uuid, []):
+                patient_data.update(copy_week_data(self.load_shard(patient_uuid, shard_name)))
+            return patient_data
+
+    def load_all_patient_data(self):
+        return {patient_uuid: self.load_patient_data(patient_uuid) for patient_uuid in self.manifest["patients"]}
+
+    def save_answer(self, patient_uuid, week_key, question, day, value):
+        self.save_answers({(patient_uuid, week_key, question, day): value})
+
+    def save_answers(self, answers):
+        with self.file_lock, self.shard_lock:
+            for key in {(patient_uuid, self.shard_name(week_key)) for patient_uuid, week_key, _, _ in answers}:
+                if key in self.shards:
+                    # Keep what another instance wrote to this shard; only our cells are replaced.
+                    self.external_answers.update(self.refresh_shard(*key))
+            touched = set()
+            manifest_changed = False
+            for (patient_uuid, week_key, question, day), value in answers.items():
+                shard_name = self.shard_name(week_key)
+                shard = self.load_shard(patient_uuid, shard_name)
+                shard.setdefault(week_key, {}).setdefault(question, {})[day] = value
+                touched.add((patient_uuid, shard_name))
+                patient_shards = self.manifest["patients"].setdefault(patient_uuid, [])
+                if shard_name not in patient_shards:
+                    patient_shards.append(shard_name)
+                    manifest_changed = True
+            for patient_uuid, shard_name in touched:
+                self.write_shard(patient_uuid, shard_name)
+            if manifest_changed:
+                self.save_manifest()
+
+    def watched_paths(self):
+        paths = super().watched_paths() + [self.data_dir]
+        if self.manifest["split_by_year"]:
+            # Year shards live in per-patient folders, whose changes the parent folder's watch does not see.
+            paths.extend({os.path.join(self.data_dir, patient_uuid) for patient_uuid, _ in self.shards})
+        return paths
+
+    def has_external_changes(self):
+        if file_signature(self.patients_path) != self.patients_signature:
+            return True
+        with self.shard_lock:
+            if self.external_answers or file_signature(self.manifest_path) != self.manifest_signature:
+                return True
+            return any(file_signature(self.shard_path(*key)) != signature
+                       for key, signature in self.shard_signatures.items())
+
+    def reload_answer_changes(self):
+        with self.file_lock, self.shard_lock:
+            self.read_external_manifest()
+            changes, self.external_answers = self.external_answers, {}
+            for key in list(self.shards):
+                changes.update(self.refresh_shard(*key))
+            for patient_uuid in self.loaded_patients:
+                for shard_name in self.manifest["patients"].get(patient_uuid, []):
+                    if (patient_uuid, shard_name) not in self.shards:
+                        # A shard another instance started, e.g. the patient's first answers or a new year.
+                        changes.update(flatten_patient_data({patient_uuid: self.load_shard(patient_uuid, shard_name)}))
+        return changes
+
+
+def migrate_monolithic_to_shards(sharded_storage):
+    """Split the single patient_data.json (and its journal) into per-patient shards once."""
+    journal = sharded_storage.journal
+    if os.path.exists(sharded_storage.manifest_path) or not (
+            os.path.exists(journal.snapshot_path) or os.path.exists(journal.journal_path)):
+        return
+    logging.info("Migrating patient_data.json into per-patient shards.")
+    sharded_storage.import_patient_data(journal.load())
+    sharded_storage.save_manifest()
+    # Keep the old files for reference, but out of the way of the JSON backend.
+    for path in (journal.snapshot_path, journal.compacting_path, journal.previous_path, journal.journal_path):
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+
+
+def migrate_json_to_sqlite(sqlite_storage):
+    """Copy the existing JSON files into the SQLite database once."""
+    if sqlite_storage.get_meta("migrated_from_json"):
+        return
+    json_paths = [get_user_data_path(name) for name in ("patients.json", "questions.json", "patient_data.json")]
+    if any(os.path.exists(path) for path in json_paths):
+        logging.info("Migrating JSON data files into SQLite storage.")
+        json_storage = JsonStorage()
+        sqlite_storage.save_patients(json_storage.load_patients())
+        sqlite_storage.save_questions(json_storage.load_questions())
+        sqlite_storage.import_patient_data(json_storage.load_all_patient_data())
+    sqlite_storage.set_meta("migrated_from_json", "1")
+
+
+def create_storage(settings=None):
+    """Create the storage backend selected in settings.json.
+
+    Runs recover_data_files first; its messages are kept on the storage as
+    recovered_files so the window can tell the user.
+    """
+    settings = settings or load_settings()
+    with DataFileLock():  # Another running instance's .tmp files are still in use
+        recovered_files = recover_data_files(serializer=create_serializer(settings))
+    storage = create_storage_backend(settings)
+    storage.recovered_files = recovered_files
+    return storage
+
+
+def create_storage_backend(settings):
+    backend = settings.get("storage_backend", "json")
+    if backend == "sqlite":
+        storage = SqliteStorage()
+        migrate_json_to_sqlite(storage)
+        return storage
+    if backend == "sharded":
+        storage = ShardedJsonStorage(split_by_year=settings.get("shard_by_year", False),
+                                     serializer=create_serializer(settings))
+        migrate_monolithic_to_shards(storage)
+        return storage
+    if backend != "json":
+        logging.warning(f"Unknown storage backend '{backend}', falling back to JSON.")
+    return JsonStorage(create_serializer(settings))
+
+
+class AutosaveWriter:
+    """Coalesce edits and write them to storage from a background thread.
+
+    Edits are queued from the GUI thread and written once no new edit arrived for
+    AUTOSAVE_DELAY seconds or AUTOSAVE_MAX_BATCH edits are pending, so typing
+    through the data table never waits on disk I/O. Repeated edits to the same
+    cell or patient collapse into a single write.
+
+    A batch that fails to save goes back into the queue underneath any newer
+    edits and is retried after AUTOSAVE_RETRY_DELAY, or straight away by
+    flush() and stop(). on_error is called once per run of failures.
+    """
+
+    def __init__(self, storage, delay=AUTOSAVE_DELAY, max_batch=AUTOSAVE_MAX_BATCH, on_error=None, on_saved=None):
+        self.storage = storage
+        self.delay = delay
+        self.max_batch = max_batch
+        self.on_error = on_error
+        self.on_saved = on_saved
+        self.pending_answers = {}  # (patient_uuid, week_key, question, day) -> value
+        self.pending_patients = {}  # patient_uuid -> patient dict, or None when deleted
+        self.condition = threading.Condition()
+        self.flushing = False
+        self.flush_requested = False
+        self.stopped = False
+        self.running = False  # The writer thread is inside its loop and will see new edits
+        self.failing = False  # The last write attempt failed
+        self.attempts = 0  # Finished write attempts, so flush() can wait for one to complete
+        self.thread = None
+        self.start()
+
+    def start(self):
+        """Start the writer thread; queuing after stop() starts it again."""
+        with self.condition:
+            self.stopped = False
+            if self.running:
+                return  # The thread has not decided to exit yet and keeps going
+            if self.thread is not None and self.thread.is_alive():
+                self.thread.join()  # It already left its loop and holds no lock
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name="AutosaveWriter", daemon=True)
+            self.thread.start()
+
+    def wake(self):
+        """Notify the writer of new edits; callers hold self.condition."""
+        if self.stopped:
+            self.start()
+        self.condition.notify_all()
+
+    def pending_count(self):
+        return len(self.pending_answers) + len(self.pending_patients)
+
+    def queue_answer(self, patient_uuid, week_key, question, day, value):
+        """Queue one edited cell for saving."""
+        with self.condition:
+            self.pending_answers[(patient_uuid, week_key, question, day)] = value
+            self.wake()
+
+    def queue_answers(self, answers):
+        """Queue a batch of {(patient_uuid, week_key, question, day): value} answers for saving."""
+        with self.condition:
+            self.pending_answers.update(answers)
+            self.wake()
+
+    def queue_patient(self, patient_uuid, patient):
+        """Queue a patient record for saving; pass None to delete it."""
+        with self.condition:
+            self.pending_patients[patient_uuid] = copy.deepcopy(patient)
+            self.wake()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending_count() and not self.stopped:
+                    self.condition.wait()
+                if self.stopped and not self.pending_count():
+                    self.running = False
+                    return
+
+                # Wait for the burst of edits to settle (or for a failing disk to recover) before writing.
+                deadline = time.monotonic() + (AUTOSAVE_RETRY_DELAY if self.failing else self.delay)
+                while not (self.stopped or self.flush_requested) and self.pending_count() < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                answers, self.pending_answers = self.pending_answers, {}
+                patients, self.pending_patients = self.pending_patients, {}
+                self.flushing = True
+
+            try:
+                with timed("autosave", answers=len(answers), patients=len(patients)):
+                    if patients:
+                        self.storage.save_patient_changes(patients)
+                    if answers:
+                        self.storage.save_answers(answers)
+                self.failing = False
+                if self.on_saved:
+                    self.on_saved(answers, patients)
+            except Exception as e:
+                logging.error(f"Autosave failed, will retry {len(answers) + len(patients)} edits: {e}")
+                with self.condition:
+                    # Edits made while this batch was being written are newer and win.
+                    self.pending_answers = {**answers, **self.pending_answers}
+                    self.pending_patients = {**patients, **self.pending_patients}
+                    report = not self.failing
+                    self.failing = True
+                if report and self.on_error:
+                    self.on_error(str(e))
+            finally:
+                with self.condition:
+                    self.flushing = False
+                    self.attempts += 1
+                    if self.stopped and self.failing:
+                        logging.error(f"Giving up on {self.pending_count()} edits that could not be saved.")
+                        self.running = False
+                        self.condition.notify_all()
+                        return
+                    self.condition.notify_all()
+
+    def flush(self):
+        """Block until every edit queued so far has been written, or one attempt to write them has failed."""
+        with self.condition:
+            if not (self.pending_count() or self.flushing):
+                return
+            # A batch already being written may not contain the latest edits, so wait for the next one too.
+            target = self.attempts + (2 if self.flushing else 1)
+            self.flush_requested = True
+            self.condition.notify_all()
+            while (self.pending_count() or self.flushing) and self.attempts < target and self.thread.is_alive():
+                self.condition.wait()
+            self.flush_requested = False
+
+    def stop(self):
+        """Write any pending edits (one more attempt if saving is failing) and stop the writer thread."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class WeekIndex:
+    """Sorted index of the weeks a patient has data for.
+
+    Weeks are kept as Monday dates in a sorted list, so range queries ("weeks in
+    this quarter", "the last 12 weeks", "the next week with data") are bisect
+    lookups instead of scans over every "yyyy-MM-dd_to_yyyy-MM-dd" key.
+    """
+
+    def __init__(self, week_keys=()):
+        self.keys = {}  # Monday (datetime.date) -> week_key
+        for week_key in week_keys:
+            week_start = week_start_from_key(week_key)
+            if week_start is not None:
+                self.keys[week_start] = week_key
+        self.starts = sorted(self.keys)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, week_key):
+        """Index a week, if it is not indexed yet."""
+        week_start = week_start_from_key(week_key)
+        if week_start is None or week_start in self.keys:
+            return
+        self.keys[week_start] = week_key
+        bisect.insort(self.starts, week_start)
+
+    def between(self, first_day=None, last_day=None):
+        """Return the keys of weeks whose Monday falls within first_day..last_day, oldest first."""
+        low = bisect.bisect_left(self.starts, first_day) if first_day else 0
+        high = bisect.bisect_right(self.starts, last_day) if last_day else len(self.starts)
+        return [self.keys[week_start] for week_start in self.starts[low:high]]
+
+    def last(self, count, until=None):
+        """Return the keys of the last count weeks starting on or before until (default: the latest), oldest first."""
+        high = bisect.bisect_right(self.starts, until) if until else len(self.starts)
+        return [self.keys[week_start] for week_start in self.starts[max(high - count, 0):high]]
+
+    def next_after(self, day):
+        """Return the Monday of the first week with data starting after day, or None."""
+        index = bisect.bisect_right(self.starts, day)
+        return self.starts[index] if index < len(self.starts) else None
+
+    def previous_before(self, day):
+        """Return the Monday of the last week with data starting before day, or None."""
+        index = bisect.bisect_left(self.starts, day)
+        return self.starts[index - 1] if index else None
+
+
+class PatientDataStore:
+    """Process-wide cache of weekly answers shared by every DataScreen.
+
+    Each patient's data is read from storage once and every window gets the same
+    dict, so two windows showing one patient can no longer overwrite each other
+    with stale copies. Edits go through set_answer, which updates the cache,
+    queues the cell for the autosave writer and tracks it as dirty until written.
+
+    Answers to quantitative questions are held as an array('d') of the five
+    weekday values (NaN when unanswered) instead of a {day: text} dict, so
+    charts and analytics read floats without parsing strings on every redraw.
+    """
+
+    def __init__(self, storage, on_error=None):
+        self.storage = storage
+        self.patient_data = {}  # patient_uuid -> week -> question -> array('d') or {day: text}
+        self.quantitative = set()  # Questions whose answers are packed into arrays
+        self.week_indexes = {}  # patient_uuid -> WeekIndex, built on first use
+        self.all_loaded = False
+        self.dirty_cells = {}  # (patient_uuid, week_key, question, day) -> value not yet on disk
+        self.dirty_patients = {}  # patient_uuid -> patient_hash of the record queued (None: deleted), not yet on disk
+        self.dirty_lock = threading.Lock()
+        self.listeners = []
+        self.question_listeners = []
+        self.autosave = AutosaveWriter(storage, on_error=on_error, on_saved=self.mark_saved)
+
+    @timed("load_all_patient_data")
+    def load_all(self):
+        """Load every patient's data into the cache."""
+        if not self.all_loaded:
+            for patient_uuid, patient_data in self.storage.load_all_patient_data().items():
+                if patient_uuid not in self.patient_data:
+                    self.patient_data[patient_uuid] = compact_patient_data(patient_data, self.quantitative)
+            self.all_loaded = True
+        return self.patient_data
+
+    def get_patient_data(self, patient_uuid):
+        """Return the shared, live dict of one patient's weekly answers."""
+        if patient_uuid not in self.patient_data:
+            if self.storage.supports_partial_load:
+                self.patient_data[patient_uuid] = compact_patient_data(
+                    self.storage.load_patient_data(patient_uuid), self.quantitative
+                )
+            else:
+                self.load_all()
+        return self.patient_data.setdefault(patient_uuid, {})
+
+    def read_patient_data(self, patient_uuid):
+        """Return one patient's answers for a one-off read such as an export, without caching them.
+
+        Cached patients come from the cache so unsaved edits are included; others
+        are read straight from storage when it can load a single patient.
+        """
+        if patient_uuid in self.patient_data or not self.storage.supports_partial_load:
+            return self.get_patient_data(patient_uuid)
+        return self.storage.load_patient_data(patient_uuid)
+
+    def set_questions(self, questions):
+        """Set which questions are quantitative, repacking cached answers whose question changed type."""
+        quantitative = {question["text"] for question in questions if question["type"] == "Quantitative"}
+        for patient_data in self.patient_data.values():
+            for week_data in patient_data.values():
+                if not isinstance(week_data, dict):
+                    continue
+                for question, answers in week_data.items():
+                    if question in quantitative and isinstance(answers, dict):
+                        week_data[question] = quantitative_array(answers)
+                    elif question not in quantitative and isinstance(answers, array):
+                        week_data[question] = quantitative_answers(answers)
+        self.quantitative = quantitative
+        for listener in list(self.question_listeners):
+            listener(questions)
+
+    def get_week_index(self, patient_uuid):
+        """Return the WeekIndex of a patient's recorded weeks, kept current as answers are set."""
+        if patient_uuid not in self.week_indexes:
+            patient_data = self.get_patient_data(patient_uuid)
+            self.week_indexes[patient_uuid] = WeekIndex(
+                week_key for week_key, week_data in patient_data.items() if week_data
+            )
+        return self.week_indexes[patient_uuid]
+
+    def get_answer(self, patient_uuid, week_key, question, day):
+        """Return one stored answer: a float for quantitative questions, text otherwise, None if unanswered."""
+        question_data = self.get_patient_data(patient_uuid).get(week_key, {}).get(question, {})
+        return answer_value(question_data, DAYS_OF_WEEK.index(day))
+
+    def set_answer(self, patient_uuid, week_key, question, day, value):
+        """Record an edited cell in the cache and queue it for saving.
+
+        Answers to quantitative questions are validated with to_quantitative,
+        which raises ValueError for anything but a number or a blank.
+        """
+        value = self.cache_answer(self.get_patient_data(patient_uuid), week_key, question, day, value)
+        if patient_uuid in self.week_indexes:
+            self.week_indexes[patient_uuid].add(week_key)
+        with self.dirty_lock:
+            self.dirty_cells[(patient_uuid, week_key, question, day)] = value
+        self.autosave.queue_answer(patient_uuid, week_key, question, day, value)
+        for listener in list(self.listeners):
+            listener(patient_uuid, week_key, question, day)
+
+    def cache_answer(self, patient_data, week_key, question, day, value):
+        """Write one answer into a cached patient's weeks and return the value to save."""
+        week_data = patient_data.setdefault(week_key, {})
+        if question in self.quantitative:
+            number = to_quantitative(value)
+            if not isinstance(week_data.get(question), array):
+                week_data[question] = quantitative_array(week_data.get(question, {}))
+            week_data[question][DAYS_OF_WEEK.index(day)] = number
+            return "" if math.isnan(number) else number  # Saved as a JSON number, or "" when cleared
+        week_data.setdefault(question, {})[day] = value
+        return value
+
+    def import_patient_data(self, new_patients, patient_data):
+        """Write a bulk import straight to storage and apply it to the cached patients.
+
+        patient_data is nested patient -> week -> question -> day answers, as
+        planned by plan_import. Edits queued earlier are written first; the
+        import itself bypasses the autosave writer and its batching, so the new
+        patients and the answers reach storage in one call each. Listeners are
+        not called per cell; callers refresh their views afterwards.
+        """
+        self.flush()
+        if new_patients:
+            self.storage.save_patient_changes(new_patients)
+        self.storage.import_patient_data(patient_data)
+        for patient_uuid, weeks in patient_data.items():
+            cached = self.patient_data.get(patient_uuid)
+            if cached is None:
+                if not self.all_loaded:
+                    continue  # Not cached; read back from storage on first use
+                cached = self.patient_data[patient_uuid] = {}
+            for week_key, week_data in weeks.items():
+                for question, answers in week_data.items():
+                    for day, value in answers.items():
+                        self.cache_answer(cached, week_key, question, day, value)
+                if patient_uuid in self.week_indexes:
+                    self.week_indexes[patient_uuid].add(week_key)
+
+    def merge_external_answers(self, answers):
+        """Apply answers another instance saved and return the keys whose cached value changed.
+
+        Cells with local edits that are not on disk yet keep the local value, and
+        patients that were never loaded are skipped since they are read fresh on
+        first use. Listeners are not called; the caller refreshes its views once.
+        """
+        with self.dirty_lock:
+            dirty = set(self.dirty_cells)
+        changed = []
+        for key, value in answers.items():
+            if key in dirty:
+                continue
+            patient_uuid, week_key, question, day = key
+            patient_data = self.patient_data.get(patient_uuid)
+            if patient_data is None:
+                if not self.all_loaded:
+                    continue
+                patient_data = self.patient_data[patient_uuid] = {}
+            day_index = DAYS_OF_WEEK.index(day)
+            previous = answer_value(patient_data.get(week_key, {}).get(question, {}), day_index)
+            try:
+                self.cache_answer(patient_data, week_key, question, day, value)
+            except ValueError:
+                logging.warning(f"Ignoring invalid answer saved by another instance for {key}: {value!r}")
+                continue
+            if answer_value(patient_data[week_key][question], day_index) == previous:
+                continue
+            if patient_uuid in self.week_indexes:
+                self.week_indexes[patient_uuid].add(week_key)
+            changed.append(key)
+        return changed
+
+    def queue_patient(self, patient_uuid, patient):
+        """Queue a patient record for saving; pass None to delete it."""
+        with self.dirty_lock:
+            self.dirty_patients[patient_uuid] = patient_hash(patient) if patient is not None else None
+        self.autosave.queue_patient(patient_uuid, patient)
+
+    def mark_saved(self, answers, patients):
+        """Called from the writer thread once a batch has reached disk."""
+        with self.dirty_lock:
+            for key, value in answers.items():
+                if self.dirty_cells.get(key, value) == value:
+                    self.dirty_cells.pop(key, None)
+            for patient_uuid, patient in patients.items():
+                digest = patient_hash(patient) if patient is not None else None
+                if patient_uuid in self.dirty_patients and self.dirty_patients[patient_uuid] == digest:
+                    del self.dirty_patients[patient_uuid]
+
+    def is_patient_dirty(self, patient_uuid):
+        """Return True if a change to the patient's record is queued but not written yet."""
+        with self.dirty_lock:
+            return patient_uuid in self.dirty_patients
+
+    def is_dirty(self, patient_uuid=None):
+        """Return True if the patient (or any patient) has edits not yet written."""
+        with self.dirty_lock:
+            if patient_uuid is None:
+                return bool(self.dirty_cells)
+            return any(key[0] == patient_uuid for key in self.dirty_cells)
+
+    def add_listener(self, listener):
+        """Call listener(patient_uuid, week_key, question, day) after every edit."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def add_question_listener(self, listener):
+        """Call listener(questions) after the question list changes."""
+        self.question_listeners.append(listener)
+
+    def remove_question_listener(self, listener):
+        if listener in self.question_listeners:
+            self.question_listeners.remove(listener)
+
+    def flush(self):
+        self.autosave.flush()
+
+    def close(self):
+        self.autosave.stop()
+
+
+class SearchIndex:
+    """In-memory inverted index over patient names and answers to Qualitative questions.
+
+    Each indexed document is either a patient name, keyed ("name", patient_uuid),
+    or one free-text answer, keyed ("answer", patient_uuid, week_key, day, question).
+    A token's postings are a list of (recency, doc_key) sorted by recency, so a
+    query walks the shortest posting list from the newest document backwards and
+    stops after MAX_CANDIDATES matches instead of scoring every document. The
+    last query word also matches as a prefix, which keeps results useful while
+    typing. Edits update the affected document in place instead of rebuilding.
+    """
+
+    NAME_BOOST = 3.0  # Name matches rank above notes that mention the same word
+    MAX_CANDIDATES = 2000  # Matching documents scored per query, newest first
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}  # token -> [(recency, doc_key)] sorted oldest first
+        self.doc_tokens = {}  # doc_key -> {token: count}
+        self.doc_text = {}  # doc_key -> original text, for result snippets
+        self.patient_docs = {}  # patient_uuid -> set of doc_keys
+        self.vocabulary = []  # Sorted tokens, for prefix lookups
+        self.qualitative = set()
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r"\w+", str(text).lower())
+
+    @staticmethod
+    def recency(doc_key):
+        """Sort key placing names first, then answers from the newest week and day."""
+        if doc_key[0] == "name":
+            return "~"  # Sorts after every "yyyy-MM-dd..." week key
+        return f"{doc_key[2]}{DAYS_OF_WEEK.index(doc_key[3])}"
+
+    @staticmethod
+    def collect_documents(patients, all_patient_data, questions):
+        """Return the qualitative question texts and a [(doc_key, text)] list of everything to index.
+
+        Cheap enough for the GUI thread; tokenizing them is left to load_documents.
+        """
+        qualitative = {question["text"] for question in questions if question["type"] == "Qualitative"}
+        documents = []
+        for patient_uuid, patient in patients.items():
+            documents.append((("name", patient_uuid), patient.get("name", "")))
+            for week_key, week_data in all_patient_data.get(patient_uuid, {}).items():
+                if not isinstance(week_data, dict):
+                    continue
+                for question in qualitative.intersection(week_data):
+                    for day, value in week_data[question].items():
+                        documents.append((("answer", patient_uuid, week_key, day, question), value))
+        return qualitative, documents
+
+    def build(self, patients, all_patient_data, questions):
+        """Index every patient name and qualitative answer from scratch."""
+        self.load_documents(*self.collect_documents(patients, all_patient_data, questions))
+
+    def load_documents(self, qualitative, documents):
+        """Index the output of collect_documents from scratch; safe to run on a worker thread."""
+        self._reset()
+        self.qualitative = qualitative
+        # Adding documents oldest first keeps every posting list sorted without sorting it.
+        for doc_key, text in sorted(documents, key=lambda document: (self.recency(document[0]), document[0])):
+            self.set_document(doc_key, text, keep_sorted=False)
+        self.vocabulary.sort()
+
+    def set_document(self, doc_key, text, keep_sorted=True):
+        """Add or replace one document, removing the postings of its previous text.
+
+        keep_sorted=False appends instead of inserting, for callers adding
+        documents in recency order that sort the vocabulary afterwards.
+        """
+        self.remove_document(doc_key)
+        counts = {}
+        for token in self.tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        if not counts:
+            return
+        entry = (self.recency(doc_key), doc_key)
+        for token in counts:
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = []
+                if keep_sorted:
+                    bisect.insort(self.vocabulary, token)
+                else:
+                    self.vocabulary.append(token)
+            if keep_sorted:
+                bisect.insort(postings, entry)
+            else:
+                postings.append(entry)
+        self.doc_tokens[doc_key] = counts
+        self.doc_text[doc_key] = str(text)
+        self.patient_docs.setdefault(doc_key[1], set()).add(doc_key)
+
+    def remove_document(self, doc_key):
+        counts = self.doc_tokens.pop(doc_key, None)
+        if counts is None:
+            return
+        self.doc_text.pop(doc_key, None)
+        self.patient_docs.get(doc_key[1], set()).discard(doc_key)
+        entry = (self.recency(doc_key), doc_key)
+        for token in counts:
+            postings = self.postings[token]
+            del postings[bisect.bisect_left(postings, entry)]
+            if not postings:
+                del self.postings[token]
+                index = bisect.bisect_left(self.vocabulary, token)
+                if index < len(self.vocabulary) and self.vocabulary[index] == token:
+                    del self.vocabulary[index]
+
+    def update_answer(self, patient_uuid, week_key, question, day, value):
+        """Reindex one edited answer; answers to quantitative questions are ignored."""
+        if question in self.qualitative:
+            self.set_document(("answer", patient_uuid, week_key, day, question), value)
+
+    def update_patient_name(self, patient_uuid, name):
+        self.set_document(("name", patient_uuid), name)
+
+    def remove_patient(self, patient_uuid):
+        for doc_key in list(self.patient_docs.pop(patient_uuid, ())):
+            self.remove_document(doc_key)
+
+    def expand(self, token, prefix=False):
+        """Return the indexed tokens a query word matches: itself, or every token it prefixes."""
+        if not prefix:
+            return [token] if token in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + "\U0010ffff", start)
+        return self.vocabulary[start:end]
+
+    @staticmethod
+    def term_count(doc_tokens, token, expansions):
+        """Count a query word's occurrences in one document, looping over whichever side is shorter."""
+        if len(expansions) == 1:
+            return doc_tokens.get(expansions[0], 0)
+        if len(expansions) < len(doc_tokens):
+            return sum(doc_tokens.get(expansion, 0) for expansion in expansions)
+        return sum(count for doc_token, count in doc_tokens.items() if doc_token.startswith(token))
+
+    @timed("search")
+    def search(self, query, limit=100):
+        """Return up to limit hits matching every word of the query, best first.
+
+        Each hit is a dict with score, kind ("name" or "answer"), patient_uuid,
+        week_key, day, question and text (week_key, day and question are None
+        for name hits). When more than MAX_CANDIDATES documents match, only the
+        newest ones are ranked.
+        """
+        tokens = self.tokenize(query)
+        if not tokens:
+            return []
+        document_count = max(len(self.doc_tokens), 1)
+        terms = []  # (token, prefix, expansions, idf, posting count)
+        for position, token in enumerate(tokens):
+            prefix = position == len(tokens) - 1
+            expansions = self.expand(token, prefix)
+            if not expansions:
+                return []
+            size = sum(len(self.postings[expansion]) for expansion in expansions)
+            terms.append((token, prefix, expansions, math.log(1 + document_count / size), size))
+
+        # Walk the rarest term's postings newest first; the other terms are checked per document.
+        driver = min(terms, key=lambda term: term[4])
+        streams = [reversed(self.postings[expansion]) for expansion in driver[2]]
+        entries = streams[0] if len(streams) == 1 else heapq.merge(*streams, reverse=True)
+        scores = {}
+        for _, doc_key in entries:
+            if doc_key in scores:
+                continue  # Seen under another expansion of the prefix
+            doc_tokens = self.doc_tokens[doc_key]
+            score = 0.0
+            for token, _, expansions, idf, _ in terms:
+                count = self.term_count(doc_tokens, token, expansions)
+                if not count:
+                    break
+                score += count * idf
+            else:
+                scores[doc_key] = score * (self.NAME_BOOST if doc_key[0] == "name" else 1.0)
+                if len(scores) >= self.MAX_CANDIDATES:
+                    break
+
+        hits = []
+        for doc_key, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            kind, patient_uuid = doc_key[0], doc_key[1]
+            week_key, day, question = doc_key[2:] if kind == "answer" else (None, None, None)
+            hits.append({
+                "score": score,
+                "kind": kind,
+                "patient_uuid": patient_uuid,
+                "week_key": week_key,
+                "day": day,
+                "question": question,
+                "text": self.doc_text[doc_key],
+            })
+        return hits
+
+
+class SearchIndexBuilder(QThread):
+    """Tokenizes collected documents into a new SearchIndex off the GUI thread."""
+
+    built = pyqtSignal(object)  # The finished SearchIndex
+
+    def __init__(self, qualitative, documents, parent=None):
+        super().__init__(parent)
+        self.qualitative = qualitative
+        self.documents = documents
+
+    def run(self):
+        index = SearchIndex()
+        with timed("build_search_index", documents=len(self.documents)):
+            index.load_documents(self.qualitative, self.documents)
+        self.built.emit(index)
+
+
+class CohortAnalytics:
+    """Columnar NumPy store of quantitative answers with per-week rollups for cohort analytics.
+
+    For every week and quantitative question, the answers of all patients are kept
+    in a float array of shape (patients, days), with NaN for blank or invalid
+    answers. Each (week, question) pair also keeps a rollup of its answer count,
+    sum, min, max and median. An edit only rewrites one cell and the rollup of its
+    week, so queries across the caseload combine rollups and arrays instead of
+    parsing strings out of the nested answer dicts.
+
+    Missing rates only count the weeks between a patient's first and last week
+    with any answer, so patients who joined late or stopped recording do not
+    inflate them.
+    """
+
+    INITIAL_CAPACITY = 64  # Patient rows allocated up front; doubled when full
+    NO_WEEK = -1  # first_week/last_week of a row without any recorded week
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.questions = []  # Quantitative question texts, in display order
+        self.patient_rows = {}  # patient_uuid -> row in every column array
+        self.free_rows = []  # Rows released by removed patients, cleared and ready for reuse
+        self.row_count = 0  # Rows handed out so far, including released ones
+        self.active = None  # Boolean mask of rows belonging to current patients
+        self.first_week = None  # Per row, ordinal of the Monday of the first week with any answer
+        self.last_week = None  # Per row, ordinal of the Monday of the last week with any answer
+        self.capacity = 0
+        self.columns = {}  # week_key -> {question: ndarray (capacity, days)}
+        self.rollups = {}  # week_key -> {question: rollup dict}
+
+    @staticmethod
+    def parse_value(value):
+        """Return a quantitative answer as a float, or NaN when it is blank or invalid."""
+        try:
+            return to_quantitative(value)
+        except ValueError:
+            return math.nan
+
+    @staticmethod
+    def has_answers(week_data):
+        """Whether a week's answers dict holds at least one non-blank answer to any question."""
+        for answers in week_data.values():
+            if isinstance(answers, array):
+                if any(not math.isnan(value) for value in answers):
+                    return True
+            elif isinstance(answers, dict) and any(value not in ("", None) for value in answers.values()):
+                return True
+        return False
+
+    def build(self, patients, all_patient_data, questions):
+        """Load every quantitative answer into the column arrays and compute all rollups."""
+        import numpy as np
+
+        self._reset()
+        self.questions = [question["text"] for question in questions if question["type"] == "Quantitative"]
+        self.capacity = max(self.INITIAL_CAPACITY, len(patients))
+        self.active = np.zeros(self.capacity, dtype=bool)
+        self.first_week = np.full(self.capacity, self.NO_WEEK, dtype=np.int64)
+        self.last_week = np.full(self.capacity, self.NO_WEEK, dtype=np.int64)
+        for patient_uuid in patients:
+            self.add_patient(patient_uuid)
+
+        day_columns = {day: column for column, day in enumerate(DAYS_OF_WEEK)}
+        for patient_uuid, row in self.patient_rows.items():
+            for week_key, week_data in all_patient_data.get(patient_uuid, {}).items():
+                if not isinstance(week_data, dict):
+                    continue
+                if self.has_answers(week_data):
+                    self.record_week(row, week_key)
+                for question in self.questions:
+                    answers = week_data.get(question)
+                    if isinstance(answers, array):  # Already parsed by the data store
+                        self.column(week_key, question)[row] = np.frombuffer(answers, dtype=np.float64)
+                        continue
+                    for day, value in (answers or {}).items():
+                        if day in day_columns:
+                            self.column(week_key, question)[row, day_columns[day]] = self.parse_value(value)
+
+        for week_key, week_columns in self.columns.items():
+            for question in week_columns:
+                self.refresh_rollup(week_key, question)
+
+    def column(self, week_key, question):
+        """Return the answer array of one week and question, creating it filled with NaN."""
+        import numpy as np
+
+        week_columns = self.columns.setdefault(week_key, {})
+        if question not in week_columns:
+            week_columns[question] = np.full((self.capacity, len(DAYS_OF_WEEK)), np.nan)
+        return week_columns[question]
+
+    def add_patient(self, patient_uuid):
+        """Give a patient a row, reusing a released one or growing every column array when the capacity is used up."""
+        import numpy as np
+
+        if patient_uuid in self.patient_rows:
+            return self.patient_rows[patient_uuid]
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.patient_rows[patient_uuid] = row
+            self.active[row] = True
+            return row
+        row = self.row_count
+        self.row_count += 1
+        if row >= self.capacity:
+            new_capacity = self.capacity * 2
+            for week_columns in self.columns.values():
+                for question, values in week_columns.items():
+                    grown = np.full((new_capacity, len(DAYS_OF_WEEK)), np.nan)
+                    grown[:self.capacity] = values
+                    week_columns[question] = grown
+            self.active = np.concatenate([self.active, np.zeros(new_capacity - self.capacity, dtype=bool)])
+            unrecorded = np.full(new_capacity - self.capacity, self.NO_WEEK, dtype=np.int64)
+            self.first_week = np.concatenate([self.first_week, unrecorded])
+            self.last_week = np.concatenate([self.last_week, unrecorded])
+            self.capacity = new_capacity
+        self.patient_rows[patient_uuid] = row
+        self.active[row] = True
+        return row
+
+    def remove_patient(self, patient_uuid):
+        """Drop a deleted patient's answers from every rollup they contributed to and release their row.
+
+        The row is cleared (answers and span of recorded weeks) before the next
+        patient added gets it.
+        """
+        import numpy as np
+
+        row = self.patient_rows.pop(patient_uuid, None)
+        if row is None:
+            return
+        self.active[row] = False
+        self.first_week[row] = self.last_week[row] = self.NO_WEEK
+        for week_key, week_columns in self.columns.items():
+            for question, values in week_columns.items():
+                if not np.isnan(values[row]).all():
+                    values[row] = np.nan
+                    self.refresh_rollup(week_key, question)
+        self.free_rows.append(row)
+
+    def record_week(self, row, week_key):
+        """Widen a row's span of recorded weeks to include week_key."""
+        week_start = week_start_from_key(week_key)
+        if week_start is None:
+            return
+        week = week_start.toordinal()
+        if self.first_week[row] == self.NO_WEEK or week < self.first_week[row]:
+            self.first_week[row] = week
+        self.last_week[row] = max(self.last_week[row], week)
+
+    def update_answer(self, patient_uuid, week_key, question, day, value):
+        """Apply one edited answer and refresh the rollup of its week and question.
+
+        Answers to any question widen the patient's span of recorded weeks;
+        clearing one does not narrow it until the next build.
+        """
+        if day not in DAYS_OF_WEEK:
+            return
+        row = self.add_patient(patient_uuid)
+        if value not in ("", None):
+            self.record_week(row, week_key)
+        if question not in self.questions:
+            return
+        self.column(week_key, question)[row, DAYS_OF_WEEK.index(day)] = self.parse_value(value)
+        self.refresh_rollup(week_key, question)
+
+    def refresh_rollup(self, week_key, question):
+        import numpy as np
+
+        values = self.columns[week_key][question]
+        values = values[~np.isnan(values)]
+        week_rollups = self.rollups.setdefault(week_key, {})
+        if not values.size:
+            week_rollups.pop(question, None)
+            return
+        week_rollups[question] = {
+            "count": int(values.size),
+            "total": float(values.sum()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "median": float(np.median(values)),
+        }
+
+    def week_keys(self, first_day=None, last_day=None):
+        """Return the sorted keys of weeks with data whose Monday falls within the given dates."""
+        first = first_day.isoformat() if first_day else ""
+        last = last_day.isoformat() if last_day else "9999"
+        return sorted(week_key for week_key in self.columns if first <= week_key[:10] <= last)
+
+    def expected_patients(self, week_keys):
+        """Count, for the given weeks together, the current patients whose recorded weeks span each one."""
+        import numpy as np
+
+        weeks = np.array([start.toordinal() for start in map(week_start_from_key, week_keys) if start])
+        if self.active is None or not weeks.size:
+            return 0
+        spans = (self.first_week[:, None] <= weeks) & (self.last_week[:, None] >= weeks)
+        return int((spans & self.active[:, None]).sum())
+
+    def missing_rate(self, count, week_keys):
+        """Share of unanswered weekdays among the patient-weeks expected to have answers in the given weeks."""
+        cells = self.expected_patients(week_keys) * len(DAYS_OF_WEEK)
+        return 1.0 - count / cells if cells else 0.0
+
+    def weekly(self, question, first_day=None, last_day=None):
+        """Return one row per week for a question: week_key, count, mean, median, min, max and missing_rate."""
+        rows = []
+        for week_key in self.week_keys(first_day, last_day):
+            rollup = self.rollups.get(week_key, {}).get(question)
+            if rollup is None:
+                rows.append({"week_key": week_key, "count": 0, "mean": None, "median": None,
+                             "min": None, "max": None, "missing_rate": self.missing_rate(0, [week_key])})
+                continue
+            rows.append({
+                "week_key": week_key,
+                "count": rollup["count"],
+                "mean": rollup["total"] / rollup["count"],
+                "median": rollup["median"],
+                "min": rollup["min"],
+                "max": rollup["max"],
+                "missing_rate": self.missing_rate(rollup["count"], [week_key]),
+            })
+        return rows
+
+    @timed("cohort_summary")
+    def summary(self, first_day=None, last_day=None):
+        """Return per-question statistics across all patients and the weeks in the given dates.
+
+        Each row has question, count, mean, median, min, max, missing_rate and trend,
+        the change in mean between the last two weeks with answers (None when there
+        are fewer than two).
+        """
+        import numpy as np
+
+        week_keys = self.week_keys(first_day, last_day)
+        summary = []
+        for question in self.questions:
+            answered_weeks = [week_key for week_key in week_keys if question in self.rollups.get(week_key, {})]
+            rollups = [self.rollups[week_key][question] for week_key in answered_weeks]
+            count = sum(rollup["count"] for rollup in rollups)
+            row = {"question": question, "count": count, "mean": None, "median": None, "min": None,
+                   "max": None, "trend": None, "missing_rate": self.missing_rate(count, week_keys)}
+            if rollups:
+                values = np.concatenate([self.columns[week_key][question].ravel() for week_key in answered_weeks])
+                row.update({
+                    "mean": sum(rollup["total"] for rollup in rollups) / count,
+                    "median": float(np.nanmedian(values)),
+                    "min": min(rollup["min"] for rollup in rollups),
+                    "max": max(rollup["max"] for rollup in rollups),
+                })
+            if len(rollups) >= 2:
+                previous, last = rollups[-2], rollups[-1]
+                row["trend"] = last["total"] / last["count"] - previous["total"] / previous["count"]
+            summary.append(row)
+        return summary
+
+
+class PatientTableModel(QAbstractTableModel):
+    """Table model over the patients dict for the main patient list.
+
+    Rows are added and removed with insert/remove notifications instead of
+    rebuilding the whole table, and the view only asks for the rows on screen.
+    The model keeps a row <-> UUID index so lookups in either direction are O(1);
+    sorting and filtering happen in a proxy model on top of it.
+    """
+
+    SORT_ROLE = Qt.UserRole
+
+    HEADERS = ["Name", "Age", "Data"]
+    NAME_COLUMN, AGE_COLUMN, DATA_COLUMN = range(3)
+
+    patient_edited = pyqtSignal(str)  # patient_uuid
+    invalid_edit = pyqtSignal(str)  # message
+
+    def __init__(self, patients, parent=None):
+        super().__init__(parent)
+        self.patients = patients
+        self.uuids = list(patients.keys())
+        self.rows = {patient_uuid: row for row, patient_uuid in enumerate(self.uuids)}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.uuids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() in (self.NAME_COLUMN, self.AGE_COLUMN):
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole, self.SORT_ROLE):
+            return None
+        patient = self.patients[self.uuids[index.row()]]
+        if role == self.SORT_ROLE:
+            # Sort names case-insensitively and ages numerically rather than as text.
+            if index.column() == self.NAME_COLUMN:
+                return patient.get("name", "Unnamed Patient").lower()
+            if index.column() == self.AGE_COLUMN:
+                return int(patient.get("age", DEFAULT_PATIENT_AGE))
+            return index.row()
+        if index.column() == self.NAME_COLUMN:
+            return patient.get("name", "Unnamed Patient")
+        if index.column() == self.AGE_COLUMN:
+            return str(patient.get("age", DEFAULT_PATIENT_AGE))
+        return "Data"
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """Validate and apply an edit to a patient's name or age."""
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        patient_uuid = self.uuids[index.row()]
+        try:
+            if index.column() == self.NAME_COLUMN:
+                name = str(value).strip()
+                if not name:
+                    raise ValueError("Name cannot be empty.")
+                self.patients[patient_uuid]["name"] = name
+            elif index.column() == self.AGE_COLUMN:
+                age = int(str(value).strip())
+                if age <= 0:
+                    raise ValueError("Age must be a positive number.")
+                self.patients[patient_uuid]["age"] = age
+            else:
+                return False
+        except ValueError as e:
+            self.invalid_edit.emit(str(e))  # The view keeps showing the old value
+            return False
+        self.dataChanged.emit(index, index)
+        self.patient_edited.emit(patient_uuid)
+        return True
+
+    def uuid_at(self, row):
+        """Return the patient UUID shown in the given row."""
+        return self.uuids[row]
+
+    def row_of(self, patient_uuid):
+        """Return the source row of a patient, or -1 if it is not in the table."""
+        return self.rows.get(patient_uuid, -1)
+
+    def refresh_patient(self, patient_uuid):
+        """Tell the views that one patient's name or age changed outside the table."""
+        row = self.row_of(patient_uuid)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def add_patient(self, patient_uuid):
+        """Append a row for a patient that was just added to the patients dict."""
+        row = len(self.uuids)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.uuids.append(patient_uuid)
+        self.rows[patient_uuid] = row
+        self.endInsertRows()
+
+    def remove_patient(self, patient_uuid):
+        """Remove the row of a patient that was just deleted from the patients dict."""
+        row = self.rows[patient_uuid]
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.uuids[row]
+        del self.rows[patient_uuid]
+        for shifted_row in range(row, len(self.uuids)):
+            self.rows[self.uuids[shifted_row]] = shifted_row
+        self.endRemoveRows()
+
+    def reset_patients(self, patients):
+        """Replace the whole patients dict."""
+        self.beginResetModel()
+        self.patients = patients
+        self.uuids = list(patients.keys())
+        self.rows = {patient_uuid: row for row, patient_uuid in enumerate(self.uuids)}
+        self.endResetModel()
+
+
+class DataButtonDelegate(QStyledItemDelegate):
+    """Paints a push button in the Data column instead of creating a real widget per row."""
+
+    clicked = pyqtSignal(QModelIndex)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and option.rect.contains(event.pos()):
+            self.clicked.emit(index)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ExternalChangesReader(QThread):
+    """Reads the patients and answers other instances saved off the GUI thread."""
+
+    loaded = pyqtSignal(object, object)  # patient_changes, answer_changes as returned by Storage.reload_changes
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+
+    def run(self):
+        patient_changes, answer_changes = {}, {}
+        try:
+            if self.storage.has_external_changes():  # The watcher also fires for this instance's own saves
+                with timed("read_external_changes"):
+                    patient_changes, answer_changes = self.storage.reload_changes()
+        except Exception as e:  # A file still being synced may not parse yet; the next change retries
+            logging.warning(f"Failed to reload changes from other instances: {e}")
+        self.loaded.emit(patient_changes, answer_changes)
+
+
+class UpdateCheckWorker(QThread):
+    """Fetches the latest release off the GUI thread."""
+
+    checked = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, url, parent=None):
+        super().__init__(parent)
+        self.url = url
+
+    def run(self):
+        import requests
+
+        try:
+            self.checked.emit(fetch_latest_release(self.url))
+        except (requests.RequestException, ValueError) as e:
+            self.failed.emit(str(e))
+
+
+class UpdateDownloadWorker(QThread):
+    """Downloads, verifies and extracts an update archive off the GUI thread.
+
+    The archive is downloaded into the updates folder as a .part file in large
+    chunks, so a dropped connection resumes where it stopped instead of starting
+    from zero. The .part file is named after the release tag, so a partial
+    download of one release is never continued with another's bytes. When the release publishes a SHA-256 checksum the archive is
+    verified before being extracted once into a fresh temporary folder.
+    """
+
+    progress = pyqtSignal(int, int)  # received bytes, total bytes (0 if unknown)
+    downloaded = pyqtSignal(str)  # folder with the extracted update
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, download_url, checksum_url=None, version="", parent=None):
+        super().__init__(parent)
+        self.download_url = download_url
+        self.checksum_url = checksum_url
+        self.version = version
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def run(self):
+        import requests
+
+        asset_name = os.path.basename(urlparse(self.download_url).path) or "update.zip"
+        download_dir = get_user_data_path("updates")
+        os.makedirs(download_dir, exist_ok=True)
+        archive_path = os.path.join(download_dir, asset_name)
+        part_path = f"{archive_path}.{safe_filename(self.version or 'latest')}.part"
+        validator_path = part_path + ".validator"
+        try:
+            expected_sha256 = None
+            if self.checksum_url:
+                expected_sha256 = fetch_expected_sha256(self.checksum_url, asset_name)
+            else:
+                logging.warning(f"No checksum published for {asset_name}; skipping verification.")
+
+            actual_sha256 = download_with_resume(
+                self.download_url, part_path, progress=self.progress.emit, is_cancelled=lambda: self.cancel_requested
+            )
+            if actual_sha256 is None:
+                self.cancelled.emit()
+                return
+            if expected_sha256 and actual_sha256 != expected_sha256:
+                os.remove(part_path)  # Corrupt or tampered; do not resume from it
+                os.remove(validator_path)
+                raise ValueError("Downloaded update failed SHA-256 verification.")
+            os.replace(part_path, archive_path)
+            os.remove(validator_path)
+
+            update_dir = tempfile.mkdtemp()
+            extract_archive(archive_path, update_dir)
+            os.remove(archive_path)
+            self.downloaded.emit(update_dir)
+        except (requests.RequestException, OSError, ValueError, EOFError) as e:
+            logging.error(f"Update download failed: {e}")
+            self.failed.emit(str(e))
+        except Exception as e:  # zipfile.BadZipFile, tarfile.TarError
+            logging.error(f"Update extraction failed: {e}")
+            self.failed.emit(f"Downloaded update file is corrupted ({e}).")
 
 
 class EMRManager(QMainWindow):
+    autosave_failed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle(f"Case Manager {VERSION}")
@@ -82,23 +3007,62 @@ class EMRManager(QMainWindow):
         self.main_widget = QWidget()
         self.main_layout = QVBoxLayout()
 
-        # Table to display patients
-        self.patient_table = QTableWidget()
-        self.patient_table.setColumnCount(3)
-        self.patient_table.setHorizontalHeaderLabels(["Name", "Age", "Data"])
-        self.main_layout.addWidget(self.patient_table)
-
-        # Connect cellChanged signal to handle table edits
-        self.patient_table.cellChanged.connect(self.update_patient_data)
-
         # Load patient data
+        self.settings = load_settings()
+        self.storage = create_storage(self.settings)
+        if self.storage.recovered_files:
+            QTimer.singleShot(0, lambda: QMessageBox.warning(
+                self, "Data Recovered", "\n\n".join(self.storage.recovered_files)
+            ))
+        self.patient_data_store = PatientDataStore(self.storage, on_error=self.autosave_failed.emit)
+        self.chart_cache = ChartRenderCache()
+        self.search_index = None  # Built on a worker thread on first search
+        self.search_index_builder = None  # SearchIndexBuilder while a build is running
+        self.search_index_updates = []  # (method, args) made during a build, replayed onto its result
+        self.search_window = None
+        self.cohort_analytics = None  # Built when the analytics window is first opened
+        self.analytics_window = None
+        self.data_windows = []
+        self.autosave_failed.connect(self.show_autosave_error)
         self.patients = self.load_patients()
-        self.populate_table()
+        startup_profiler.mark("load patients")
+
+        # Table to display patients
+        self.patient_model = PatientTableModel(self.patients, self)
+        self.patient_model.patient_edited.connect(self.update_patient_data)
+        self.patient_model.invalid_edit.connect(self.show_invalid_input)
+        self.patient_proxy = QSortFilterProxyModel(self)
+        self.patient_proxy.setSourceModel(self.patient_model)
+        self.patient_proxy.setSortRole(PatientTableModel.SORT_ROLE)
+        self.patient_proxy.setFilterKeyColumn(PatientTableModel.NAME_COLUMN)
+        self.patient_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search patients by name...")
+        self.search_box.textChanged.connect(self.patient_proxy.setFilterFixedString)
+        self.main_layout.addWidget(self.search_box)
+
+        self.patient_table = QTableView()
+        self.patient_table.setModel(self.patient_proxy)
+        self.patient_table.setSortingEnabled(True)
+        self.patient_table.sortByColumn(-1, Qt.AscendingOrder)  # Keep insertion order until a header is clicked
+        self.patient_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.patient_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        # Fixed row heights let the view skip measuring rows that are off screen.
+        self.patient_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.data_button_delegate = DataButtonDelegate(self.patient_table)
+        self.data_button_delegate.clicked.connect(
+            lambda index: self.open_data_screen(self.patient_uuid_at(index))
+        )
+        self.patient_table.setItemDelegateForColumn(PatientTableModel.DATA_COLUMN, self.data_button_delegate)
+        self.main_layout.addWidget(self.patient_table)
+        startup_profiler.mark("populate table")
 
         # Buttons
         self.update_button = QPushButton("Check for updates")
-        self.update_button.clicked.connect(self.check_for_updates)
+        self.update_button.clicked.connect(lambda: self.check_for_updates())
         self.main_layout.addWidget(self.update_button)
+        self.update_check_worker = None
 
         add_button = QPushButton("Add Patient")
         add_button.clicked.connect(self.add_patient)
@@ -120,79 +3084,119 @@ class EMRManager(QMainWindow):
         edit_data_action = settings_menu.addAction("Edit Data")
         edit_data_action.triggered.connect(self.open_edit_data_screen)
 
-        # Load questions
-        self.questions = self.load_questions()
+        performance_action = settings_menu.addAction("Performance")
+        performance_action.triggered.connect(self.open_performance_screen)
 
-    def check_for_updates(self):
-        """Check for updates using GitHub API."""
-        repo_owner = "marcinknara"
-        repo_name = "minimal-emr"
-        current_version = self.get_current_version()
+        export_menu = self.menu_bar.addMenu("Export")
+        export_all_action = export_menu.addAction("Export All Patients...")
+        export_all_action.triggered.connect(self.export_all_patients)
+        export_history_action = export_menu.addAction("Export Full History (All Patients)...")
+        export_history_action.triggered.connect(self.export_all_history)
 
-        try:
-            # Fetch the latest release data from GitHub API
-            url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/releases/latest"
-            response = requests.get(url)
-            response.raise_for_status()
-            release_data = response.json()
-
-            # download_url = release_data['zipball_url']
-            download_url = ''
-            latest_version = release_data["tag_name"]
-            for release in release_data["assets"]:
-                if is_new_version_on_platform2(release['name']):
-                    download_url = release["browser_download_url"] if release["browser_download_url"] else None
-
-            if latest_version > current_version and download_url:
-                logging.info(f"Download URL: {download_url}")
-
-                choice = QMessageBox.question(
-                    self,
-                    "Update Available",
-                    f"A new version ({latest_version}) is available. Current version({current_version}). Do you want to update?",
-                    QMessageBox.Yes | QMessageBox.No
-                )
-                if choice == QMessageBox.Yes and download_url:
-                    self.download_and_apply_update(download_url, latest_version)
-                else:
-                    QMessageBox.information(self, "Update", "Update canceled.")
-            else:
-                QMessageBox.information(self, "No Updates", "You are using the latest version.")
+        import_menu = self.menu_bar.addMenu("Import")
+        import_action = import_menu.addAction("Import Patient Data...")
+        import_action.triggered.connect(self.import_patient_data)
 
-        except requests.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Failed to check for updates: {e}")
+        search_menu = self.menu_bar.addMenu("Search")
+        search_action = search_menu.addAction("Search Names and Notes...")
+        search_action.setShortcut(QKeySequence.Find)
+        search_action.triggered.connect(self.open_search_screen)
 
-    def download_and_apply_update(self, download_url, latest_version):
-        """Download and apply the update."""
+        analytics_menu = self.menu_bar.addMenu("Analytics")
+        analytics_action = analytics_menu.addAction("Cohort Analytics...")
+        analytics_action.triggered.connect(self.open_analytics_screen)
+
+        # Load questions
+        self.questions = self.load_questions()
+        self.patient_data_store.set_questions(self.questions)
+        startup_profiler.mark("load questions")
+
+        # Pick up what other instances (or a synced folder) write to the data files.
+        self.external_reload_timer = QTimer(self)
+        self.external_reload_timer.setSingleShot(True)
+        self.external_reload_timer.setInterval(EXTERNAL_RELOAD_DELAY_MS)
+        self.external_reload_timer.timeout.connect(self.reload_external_changes)
+        self.external_reader = None  # ExternalChangesReader while a read is running
+        self.external_reload_pending = False  # Files changed again during that read
+        self.data_watcher = QFileSystemWatcher(self)
+        self.data_watcher.fileChanged.connect(self.external_reload_timer.start)
+        self.data_watcher.directoryChanged.connect(self.external_reload_timer.start)
+        self.watch_data_files()
+
+        if self.settings.get("check_updates_on_startup"):
+            QTimer.singleShot(0, lambda: self.check_for_updates(silent=True))
+
+    def check_for_updates(self, silent=False):
+        """Check GitHub for a new release on a worker thread.
+
+        With silent=True (the startup check) nothing is shown unless an update is available.
+        """
+        if self.update_check_worker and self.update_check_worker.isRunning():
+            return
+        self.update_button.setEnabled(False)
+        self.update_check_worker = UpdateCheckWorker(self.settings["update_url"], self)
+        self.update_check_worker.checked.connect(lambda release_data: self.handle_release(release_data, silent))
+        self.update_check_worker.failed.connect(lambda message: self.handle_update_check_error(message, silent))
+        self.update_check_worker.finished.connect(lambda: self.update_button.setEnabled(True))
+        self.update_check_worker.start()
+
+    def handle_release(self, release_data, silent=False):
+        """Offer the update if the release returned by the worker is newer than this version."""
+        current_version = self.get_current_version()
         try:
-            temp_dir = tempfile.mkdtemp()
-            if platform.system() == 'Windows':
-                archive_path = os.path.join(temp_dir, "update.zip")
-            else:  # macOS
-                archive_path = os.path.join(temp_dir, "update.tar.gz")
-
-            # Download the update
-            response = requests.get(download_url, stream=True)
-            with open(archive_path, "wb") as update_file:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        update_file.write(chunk)
-
-            # Extract the update
-            if platform.system() == 'Windows':
-                with zipfile.ZipFile(archive_path, "r") as zip_ref:
-                    zip_ref.extractall(temp_dir)
-            else:  # macOS
-                with tarfile.open(archive_path, "r:gz") as tar:
-                    tar.extractall(temp_dir)
+            update = find_update(release_data, current_version)
+        except (KeyError, TypeError) as e:
+            self.handle_update_check_error(f"Unexpected release data: {e}", silent)
+            return
 
-            # Apply the update
-            self.apply_update(temp_dir, latest_version)
+        if update:
+            latest_version, download_url, checksum_url = update
+            logging.info(f"Download URL: {download_url}")
 
-        except requests.RequestException as e:
-            QMessageBox.critical(self, "Error", f"Failed to download update: {e}")
-        except zipfile.BadZipFile:
-            QMessageBox.critical(self, "Error", "Downloaded update file is corrupted.")
+            choice = QMessageBox.question(
+                self,
+                "Update Available",
+                f"A new version ({latest_version}) is available. Current version({current_version}). Do you want to update?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if choice == QMessageBox.Yes:
+                self.download_and_apply_update(download_url, latest_version, checksum_url)
+            else:
+                QMessageBox.information(self, "Update", "Update canceled.")
+        elif not silent:
+            QMessageBox.information(self, "No Updates", "You are using the latest version.")
+
+    def handle_update_check_error(self, message, silent=False):
+        """Report a failed update check; the silent startup check only logs it."""
+        logging.warning(f"Update check failed: {message}")
+        if not silent:
+            QMessageBox.critical(self, "Error", f"Failed to check for updates: {message}")
+
+    def download_and_apply_update(self, download_url, latest_version, checksum_url=None):
+        """Download, verify and extract the update on a worker thread, then apply it."""
+        progress_dialog = QProgressDialog("Downloading update...", "Cancel", 0, 0, self)
+        progress_dialog.setWindowTitle("Update")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.show()
+
+        self.update_download_worker = UpdateDownloadWorker(download_url, checksum_url, latest_version, self)
+        self.update_download_worker.progress.connect(
+            lambda received, total: (progress_dialog.setMaximum(total), progress_dialog.setValue(received))
+            if total else progress_dialog.setLabelText(f"Downloading update... {received // 1024} KB")
+        )
+        progress_dialog.canceled.connect(self.update_download_worker.cancel)
+        self.update_download_worker.downloaded.connect(
+            lambda update_dir: (progress_dialog.close(), self.apply_update(update_dir, latest_version))
+        )
+        self.update_download_worker.failed.connect(
+            lambda message: (progress_dialog.close(),
+                             QMessageBox.critical(self, "Error", f"Failed to download update: {message}"))
+        )
+        self.update_download_worker.cancelled.connect(
+            lambda: (progress_dialog.close(),
+                     QMessageBox.information(self, "Update", "Update paused. It will resume where it stopped."))
+        )
+        self.update_download_worker.start()
 
     def apply_update(self, update_dir, latest_version):
         """Replace the current executable with the new one and restart."""
@@ -202,16 +3206,6 @@ class EMRManager(QMainWindow):
             current_exe = sys.executable
             logging.info(f"Current executable path: {current_exe}")
 
-            # Extract update.zip
-            for filename in os.listdir(update_dir):
-                file_path = os.path.join(update_dir, filename)
-                if platform.system() == 'Windows' and filename == 'update.zip':
-                    with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                        zip_ref.extractall(update_dir)
-                elif platform.system() == 'Darwin' and filename == 'update.tar.gz':
-                    with tarfile.open(file_path, 'r:gz') as tar:
-                        tar.extractall(update_dir)
-
             # Find the new executable (assume it's inside the extracted folder)
             subdirs = [d for d in os.listdir(update_dir) if os.path.isdir(os.path.join(update_dir, d))]
             random_dir = os.path.join(update_dir, subdirs[0])
@@ -247,8 +3241,7 @@ class EMRManager(QMainWindow):
                 # Update version.json
                 existing_dir = os.getcwd()
                 app_dir = os.path.abspath(os.path.join(existing_dir, ".."))
-                with open(os.path.join(app_dir, "version.json"), "w") as version_file:
-                    json.dump({"version": latest_version}, version_file, indent=4)
+                write_json_atomic(os.path.join(app_dir, "version.json"), {"version": latest_version})
 
                 # Restart the application
                 QMessageBox.information(self, "Update", "Update applied successfully. Restarting...")
@@ -270,8 +3263,7 @@ class EMRManager(QMainWindow):
 
                 # Update version.json (optional)
                 app_dir = os.path.dirname(current_exe)
-                with open(os.path.join(app_dir, "version.json"), "w") as version_file:
-                    json.dump({"version": latest_version}, version_file, indent=4)
+                write_json_atomic(os.path.join(app_dir, "version.json"), {"version": latest_version})
 
                 # Restart the updated application
                 QMessageBox.information(self, "Update", "Update applied successfully. Restarting...")
@@ -301,99 +3293,87 @@ class EMRManager(QMainWindow):
             # QMessageBox.warning(self, "Error", "Version file not found or corrupted. Assuming version 0.0.0.")
             return "0.0.0"
 
+    @timed("load_patients")
     def load_patients(self):
         try:
-            path = get_user_data_path("patients.json")
-            logging.info(f"Loading patients from: {path}")  # Debugging information
-            if not os.path.exists(path):
-                with open(path, "w") as file:
-                    json.dump({}, file, indent=4)
-                    logging.info("Created new patients.json file.")  # Debugging information
-            with open(path, "r") as file:
-                return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return self.storage.load_patients()
+        except (OSError, ValueError, sqlite3.Error) as e:  # DataSerializer reports bad files as ValueError
             QMessageBox.warning(self, "Error", f"Failed to load patients: {str(e)}")
             return {}
 
-    def save_patients(self):
-        try:
-            with open(get_user_data_path("patients.json"), "w") as file:
-                json.dump(self.patients, file, indent=4)
-        except IOError as e:
-            QMessageBox.critical(self, "Error", f"Failed to save patients: {str(e)}")
+    def save_patient(self, patient_uuid):
+        """Queue a single patient's record for the background writer."""
+        self.patient_data_store.queue_patient(patient_uuid, self.patients.get(patient_uuid))
 
-    def populate_table(self):
-        """Populate the patient table."""
-        self.patient_table.blockSignals(True)
-        self.patient_table.setRowCount(0)
-        for uuid_key, patient in self.patients.items():
-            try:
-                row = self.patient_table.rowCount()
-                self.patient_table.insertRow(row)
+    def show_autosave_error(self, message):
+        """Report a failed background save."""
+        QMessageBox.critical(self, "Error", f"Failed to save data: {message}")
 
-                name_item = QTableWidgetItem(patient.get("name", "Unnamed Patient"))
-                name_item.setFlags(name_item.flags() | Qt.ItemIsEditable)
-                self.patient_table.setItem(row, 0, name_item)
+    def closeEvent(self, event):
+        """Write pending edits; data windows may stay open, so the writer keeps running until the app quits."""
+        self.patient_data_store.flush()
+        super().closeEvent(event)
 
-                age_item = QTableWidgetItem(str(patient.get("age", 30)))
-                age_item.setFlags(age_item.flags() | Qt.ItemIsEditable)
-                self.patient_table.setItem(row, 1, age_item)
+    @timed("populate_patient_table")
+    def populate_table(self):
+        """Reload the patient table from self.patients."""
+        self.patient_model.reset_patients(self.patients)
 
-                data_button = QPushButton("Data")
-                data_button.clicked.connect(lambda _, uuid_key=uuid_key: self.open_data_screen(uuid_key))
-                self.patient_table.setCellWidget(row, 2, data_button)
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Error populating patient row: {str(e)}")
-        self.patient_table.blockSignals(False)
+    def patient_uuid_at(self, proxy_index):
+        """Return the UUID of the patient shown at a (sorted/filtered) table index."""
+        source_index = self.patient_proxy.mapToSource(proxy_index)
+        return self.patient_model.uuid_at(source_index.row())
 
-    def update_patient_data(self, row, column):
-        """Update the patient data based on table edits."""
-        try:
-            patient_uuid = list(self.patients.keys())[row]
-            if column == 0:  # Name column
-                self.patients[patient_uuid]["name"] = self.patient_table.item(row, column).text().strip()
-                if not self.patients[patient_uuid]["name"]:
-                    raise ValueError("Name cannot be empty.")
-            elif column == 1:  # Age column
-                age = int(self.patient_table.item(row, column).text().strip())
-                if age <= 0:
-                    raise ValueError("Age must be a positive number.")
-                self.patients[patient_uuid]["age"] = age
-            self.save_patients()
-        except ValueError as e:
-            QMessageBox.warning(self, "Invalid Input", str(e))
-            self.populate_table()  # Revert invalid input
+    def update_patient_data(self, patient_uuid):
+        """Save a patient after a valid name or age edit in the table."""
+        self.save_patient(patient_uuid)
+        self.update_search_index("update_patient_name", patient_uuid, self.patients[patient_uuid]["name"])
+
+    def show_invalid_input(self, message):
+        """Warn about a rejected table edit; the model has already kept the old value."""
+        QMessageBox.warning(self, "Invalid Input", message)
 
     def add_patient(self):
         """Add a new patient."""
         new_patient_uuid = str(uuid.uuid4())  # Generate a unique UUID for the new patient
         new_patient = {
             "name": "New Patient",
-            "age": 30,
+            "age": DEFAULT_PATIENT_AGE,
             "records": {}
         }
         self.patients[new_patient_uuid] = new_patient
-        self.save_patients()
-        self.populate_table()
+        self.save_patient(new_patient_uuid)
+        self.patient_model.add_patient(new_patient_uuid)
+        self.update_search_index("update_patient_name", new_patient_uuid, new_patient["name"])
+        if self.cohort_analytics:
+            self.cohort_analytics.add_patient(new_patient_uuid)
 
     def save_questions_from_settings(self, updated_questions):
         """Save updated questions from the settings screen."""
         self.questions = updated_questions  # Update the in-memory list of questions
         self.save_questions()  # Save the questions to the JSON file
-
+        self.patient_data_store.set_questions(self.questions)
+        if self.search_index or self.search_index_builder:
+            # Question types may have changed, so rebuild which answers are indexed.
+            self.rebuild_search_index()
+        if self.cohort_analytics:
+            self.cohort_analytics.build(self.patients, self.patient_data_store.load_all(), self.questions)
+            if self.analytics_window and self.analytics_window.isVisible():
+                self.analytics_window.refresh()
+
+    @timed("save_questions")
     def save_questions(self):
-        with open(get_user_data_path("questions.json"), "w") as file:
-            json.dump(self.questions, file, indent=4)
+        self.storage.save_questions(self.questions)
 
     def delete_patient(self):
         """Delete the selected patient."""
-        selected_row = self.patient_table.currentRow()
-        if selected_row < 0:
+        selected_index = self.patient_table.currentIndex()
+        if not selected_index.isValid():
             QMessageBox.warning(self, "No Selection", "Please select a patient to delete.")
             return
 
         # Confirm deletion
-        patient_uuid = list(self.patients.keys())[selected_row]
+        patient_uuid = self.patient_uuid_at(selected_index)
         patient_name = self.patients[patient_uuid]["name"]
         confirmation = QMessageBox.question(
             self,
@@ -405,28 +3385,312 @@ class EMRManager(QMainWindow):
             return
 
         del self.patients[patient_uuid]
-        self.save_patients()
-        self.populate_table()
+        self.save_patient(patient_uuid)
+        self.patient_model.remove_patient(patient_uuid)
+        self.update_search_index("remove_patient", patient_uuid)
+        if self.cohort_analytics:
+            self.cohort_analytics.remove_patient(patient_uuid)
 
+    @timed("load_questions")
     def load_questions(self):
-        path = get_user_data_path("questions.json")
-        if not os.path.exists(path):
-            default_questions = [
-                {"text": "Question 1", "type": "Quantitative"},
-                {"text": "Question 2", "type": "Qualitative"},
-            ]
-            with open(path, "w") as file:
-                json.dump(default_questions, file, indent=4)
-        with open(path, "r") as file:
-            return json.load(file)
-
+        return self.storage.load_questions()
+
+    def rebuild_search_index(self):
+        """Index everything again on a worker thread; the current index keeps answering until it is done.
+
+        Only gathering the texts happens on the GUI thread. Edits made while the
+        worker runs go to the current index and are replayed onto the new one.
+        """
+        if self.search_index is None and self.search_index_builder is None:
+            self.patient_data_store.add_listener(self.index_answer)
+        qualitative, documents = SearchIndex.collect_documents(
+            self.patients, self.patient_data_store.load_all(), self.questions
+        )
+        self.search_index_updates = []
+        builder = SearchIndexBuilder(qualitative, documents, self)
+        builder.built.connect(lambda index, builder=builder: self.install_search_index(index, builder))
+        builder.finished.connect(builder.deleteLater)
+        self.search_index_builder = builder
+        builder.start()
+
+    def install_search_index(self, index, builder):
+        """Swap in a freshly built index once the edits made during the build are applied to it."""
+        if builder is not self.search_index_builder:
+            return  # A newer build has started since
+        for method, args in self.search_index_updates:
+            getattr(index, method)(*args)
+        self.search_index_updates = []
+        self.search_index_builder = None
+        self.search_index = index
+        if self.search_window is not None:
+            self.search_window.set_search_index(index)
+
+    def update_search_index(self, method, *args):
+        """Apply one change to the search index, and to the index being built if there is one."""
+        if self.search_index:
+            getattr(self.search_index, method)(*args)
+        if self.search_index_builder:
+            self.search_index_updates.append((method, args))
+
+    def index_answer(self, patient_uuid, week_key, question, day):
+        """Store listener: reindex an answer right after it is edited."""
+        value = self.patient_data_store.get_answer(patient_uuid, week_key, question, day)
+        self.update_search_index("update_answer", patient_uuid, week_key, question, day, value)
+
+    def open_search_screen(self):
+        """Open the search window."""
+        if self.search_index is None and self.search_index_builder is None:
+            self.rebuild_search_index()
+        self.search_window = SearchScreen(self.search_index, self.patients, self.open_search_hit)
+        self.search_window.show()
+
+    def index_analytics_answer(self, patient_uuid, week_key, question, day):
+        """Store listener: keep the cohort rollups current as answers are edited."""
+        value = self.patient_data_store.get_answer(patient_uuid, week_key, question, day)
+        self.cohort_analytics.update_answer(patient_uuid, week_key, question, day, value)
+
+    def open_analytics_screen(self):
+        """Open the cohort analytics window, building the columnar answer store on first use."""
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            QMessageBox.warning(self, "Analytics Unavailable",
+                                "Cohort analytics needs NumPy. Install it with: pip install numpy")
+            return
+        if self.cohort_analytics is None:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.cohort_analytics = CohortAnalytics()
+                self.cohort_analytics.build(self.patients, self.patient_data_store.load_all(), self.questions)
+                self.patient_data_store.add_listener(self.index_analytics_answer)
+            finally:
+                QApplication.restoreOverrideCursor()
+        self.analytics_window = AnalyticsScreen(self.cohort_analytics, self.patient_data_store)
+        self.analytics_window.show()
+
+    def open_performance_screen(self):
+        """Show p50/p95 timings of the instrumented operations."""
+        self.performance_window = PerformanceScreen(performance_monitor)
+        self.performance_window.show()
+
+    def open_search_hit(self, hit):
+        """Open the data screen of a search hit at the week it was found in."""
+        data_window = self.open_data_screen(hit["patient_uuid"])
+        if data_window and hit["week_key"]:
+            week_start = week_start_from_key(hit["week_key"])
+            if week_start:
+                data_window.go_to_week(QDate(week_start.year, week_start.month, week_start.day))
+
+    @timed("open_data_screen")
     def open_data_screen(self, patient_uuid):
         """Open the Data screen for the selected patient."""
         if patient_uuid in self.patients:
-            self.data_window = DataScreen(patient_uuid, self.questions, self.patients)
-            self.data_window.show()
+            data_window = DataScreen(
+                patient_uuid, self.questions, self.patients, self.patient_data_store, self.chart_cache
+            )
+            data_window.setAttribute(Qt.WA_DeleteOnClose)
+            # Keep a reference so several data windows can stay open at once.
+            self.data_windows.append(data_window)
+            data_window.destroyed.connect(lambda _=None, window=data_window: self.data_windows.remove(window))
+            data_window.show()
+            return data_window
         else:
             QMessageBox.warning(self, "Error", "Patient UUID not found.")
+            return None
+
+    def export_all_patients(self):
+        """Export this week's data for every patient in the background."""
+        if not self.patients:
+            QMessageBox.information(self, "Export", "There are no patients to export.")
+            return
+        labels = [label for label, _, _ in BATCH_EXPORT_MODES]
+        label, ok = QInputDialog.getItem(self, "Export All Patients", "Export format:", labels, 0, False)
+        if not ok:
+            return
+        output_dir = QFileDialog.getExistingDirectory(self, "Export Folder")
+        if not output_dir:
+            return
+        _, formats, combined = BATCH_EXPORT_MODES[labels.index(label)]
+        start_date_str, end_date_str = week_range_for(datetime.date.today())
+
+        progress_dialog = QProgressDialog("Exporting patients...", None, 0, len(self.patients), self)
+        progress_dialog.setWindowTitle("Export All Patients")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.show()
+
+        self.batch_export_worker = BatchExportWorker({
+            "patients": copy.deepcopy(self.patients),
+            "week_data_by_patient": slice_week(self.patients, self.patient_data_store.read_patient_data,
+                                               start_date_str, end_date_str),
+            "questions": copy.deepcopy(self.questions),
+            "start_date_str": start_date_str,
+            "end_date_str": end_date_str,
+            "output_dir": output_dir,
+            "formats": formats,
+            "combined": combined,
+        }, self)
+        self.batch_export_worker.progress.connect(lambda done, total: progress_dialog.setValue(done))
+        self.batch_export_worker.finished_export.connect(
+            lambda paths: (progress_dialog.close(),
+                           QMessageBox.information(self, "Exported", f"Exported {len(paths)} file(s) to {output_dir}."))
+        )
+        self.batch_export_worker.failed.connect(
+            lambda message: (progress_dialog.close(),
+                             QMessageBox.critical(self, "Error", f"Failed to export patients: {message}"))
+        )
+        self.batch_export_worker.start()
+
+    def export_all_history(self):
+        """Export every week of every patient to one workbook, one sheet per patient."""
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "Save File", "all_patients_history.xlsx", "Excel Files (*.xlsx)"
+        )
+        if not save_path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            rows = export_full_history(save_path, self.patients, self.patient_data_store.read_patient_data,
+                                       self.questions)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export history: {str(e)}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Exported", f"Exported {rows} rows to {save_path}.")
+
+    def import_patient_data(self):
+        """Import patients and weekly answers from a CSV or Excel file after showing what it would import."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Patient Data", "", "Spreadsheets (*.csv *.xlsx);;CSV Files (*.csv);;Excel Files (*.xlsx)"
+        )
+        if not path:
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            report, new_patients, patient_data = plan_import(path, self.patients, self.questions)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Error", f"Failed to read {path}: {e}")
+            return
+        QApplication.restoreOverrideCursor()
+
+        if not report.answers:
+            QMessageBox.warning(self, "Nothing to Import", report.summary())
+            return
+        confirm = QMessageBox(QMessageBox.Question, "Import Patient Data",
+                              f"{report.summary()}\n\nImport the valid rows?", QMessageBox.Yes | QMessageBox.No, self)
+        if report.errors:
+            confirm.setDetailedText("\n".join(report.errors))
+        if confirm.exec_() != QMessageBox.Yes:
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            # Commit the plan the report was made from instead of reading the file again.
+            self.patient_data_store.import_patient_data(new_patients, patient_data)
+            for patient_uuid, patient in new_patients.items():
+                self.patients[patient_uuid] = patient
+                self.patient_model.add_patient(patient_uuid)
+                if self.cohort_analytics:
+                    self.cohort_analytics.add_patient(patient_uuid)
+            self.refresh_after_import(set(patient_data))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to import data: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Imported",
+                                f"Imported {report.answers} answer(s), adding {len(new_patients)} new patient(s).")
+
+    def refresh_after_import(self, patient_uuids):
+        """Bring the search index, analytics and open data windows up to date after a bulk import."""
+        if self.search_index or self.search_index_builder:
+            self.rebuild_search_index()
+        if self.cohort_analytics:
+            self.cohort_analytics.build(self.patients, self.patient_data_store.load_all(), self.questions)
+            if self.analytics_window and self.analytics_window.isVisible():
+                self.analytics_window.refresh()
+        for data_window in self.data_windows:
+            if data_window.patient_uuid in patient_uuids:
+                data_window.reload()
+
+    def watch_data_files(self):
+        """Watch the storage's files, re-adding any that were replaced since the last change."""
+        watched = set(self.data_watcher.files() + self.data_watcher.directories())
+        missing = [path for path in set(self.storage.watched_paths()) if path not in watched and os.path.exists(path)]
+        if missing:
+            self.data_watcher.addPaths(missing)
+
+    def reload_external_changes(self):
+        """Read what other instances saved on a worker thread; merge_external_changes applies it."""
+        self.watch_data_files()
+        if self.external_reader is not None:
+            self.external_reload_pending = True  # Read again once the running read is done
+            return
+        self.external_reader = ExternalChangesReader(self.storage, self)
+        self.external_reader.loaded.connect(self.merge_external_changes)
+        self.external_reader.finished.connect(self.external_reader.deleteLater)
+        self.external_reader.start()
+
+    @timed("merge_external_changes")
+    def merge_external_changes(self, patient_changes, answer_changes):
+        """Merge the patients and answers another instance saved into this window and the open data screens.
+
+        Edits of this instance that are still queued for saving are newer, so
+        the store keeps those cells and records as they are.
+        """
+        self.external_reader = None
+        if self.external_reload_pending:
+            self.external_reload_pending = False
+            self.external_reload_timer.start()
+        for patient_uuid, patient in patient_changes.items():
+            if self.patient_data_store.is_patient_dirty(patient_uuid):
+                continue
+            self.apply_external_patient(patient_uuid, patient)
+        changed = self.patient_data_store.merge_external_answers(answer_changes)
+        if not (patient_changes or changed):
+            return
+        logging.info(f"Reloaded {len(patient_changes)} patients and {len(changed)} answers saved elsewhere.")
+        for patient_uuid, week_key, question, day in changed:
+            if self.search_index or self.search_index_builder:
+                self.index_answer(patient_uuid, week_key, question, day)
+            if self.cohort_analytics:
+                self.index_analytics_answer(patient_uuid, week_key, question, day)
+        if changed and self.analytics_window and self.analytics_window.isVisible():
+            self.analytics_window.refresh()
+        for data_window in self.data_windows:
+            data_window.apply_external_changes(changed)
+
+    def apply_external_patient(self, patient_uuid, patient):
+        """Add, update or remove one patient record that another instance saved."""
+        if patient is None:
+            if patient_uuid not in self.patients:
+                return
+            for data_window in list(self.data_windows):
+                if data_window.patient_uuid == patient_uuid:
+                    data_window.close()
+            del self.patients[patient_uuid]
+            self.patient_model.remove_patient(patient_uuid)
+            self.update_search_index("remove_patient", patient_uuid)
+            if self.cohort_analytics:
+                self.cohort_analytics.remove_patient(patient_uuid)
+            return
+
+        if patient_uuid in self.patients:
+            # Update in place; open data screens hold a reference to this dict.
+            self.patients[patient_uuid].clear()
+            self.patients[patient_uuid].update(patient)
+            self.patient_model.refresh_patient(patient_uuid)
+            for data_window in self.data_windows:
+                if data_window.patient_uuid == patient_uuid:
+                    data_window.setWindowTitle(f"Data for {patient['name']}")
+        else:
+            self.patients[patient_uuid] = patient
+            self.patient_model.add_patient(patient_uuid)
+            if self.cohort_analytics:
+                self.cohort_analytics.add_patient(patient_uuid)
+        self.update_search_index("update_patient_name", patient_uuid, patient.get("name", ""))
 
     def open_edit_data_screen(self):
         """Open the Edit Data screen."""
@@ -437,17 +3701,749 @@ class EMRManager(QMainWindow):
         self.edit_data_window.show()
 
 
+def safe_filename(name):
+    """Replace characters that are not allowed in file names."""
+    return re.sub(r'[\\/:*?"<>|]+', "_", name).strip() or "patient"
+
+
+def unique_sheet_title(title, used_titles):
+    """Return a valid, unique Excel sheet title (max 31 characters, no []:*?/\\)."""
+    base = re.sub(r"[\[\]:*?/\\]", "_", title)[:31]
+    candidate = base
+    counter = 2
+    while candidate.lower() in used_titles:
+        suffix = f" ({counter})"
+        candidate = base[:31 - len(suffix)] + suffix
+        counter += 1
+    used_titles.add(candidate.lower())
+    return candidate
+
+
+def week_key_for(start_date_str, end_date_str):
+    """Build the patient_data key for a Monday-Friday week."""
+    return f"{start_date_str}_to_{end_date_str}"
+
+
+def build_week_chart(week_data, questions, start_date_str, end_date_str):
+    """Build a standalone line chart of one week's quantitative answers."""
+    from PyQt5.QtChart import QChart, QLineSeries
+
+    chart = QChart()
+    for question in questions:
+        if question["type"] == "Quantitative":
+            series = QLineSeries()
+            series.setName(question["text"])
+            for i, value in enumerate(chart_values(week_data.get(question["text"], {}))):
+                series.append(i, value)
+            chart.addSeries(series)
+    chart.createDefaultAxes()
+    chart.setTitle(f"Quantitative Data ({start_date_str} to {end_date_str})")
+    chart.legend().setVisible(True)
+    return chart
+
+
+def render_chart_png(chart, size=EXPORT_CHART_SIZE, dpi=EXPORT_CHART_DPI):
+    """Render a chart offscreen to PNG bytes without showing any window.
+
+    The image is painted directly at the requested pixel size, so the result does
+    not depend on the screen's scaling or on whether a window is visible.
+    """
+    from PyQt5.QtChart import QChartView
+
+    view = QChartView(chart)
+    view.setRenderHint(QPainter.Antialiasing)
+    view.resize(*size)
+    image = QImage(size[0], size[1], QImage.Format_ARGB32)
+    image.fill(Qt.white)
+    dots_per_meter = int(dpi / 0.0254)
+    image.setDotsPerMeterX(dots_per_meter)
+    image.setDotsPerMeterY(dots_per_meter)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    view.render(painter)
+    painter.end()
+
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class ChartRenderCache:
+    """LRU cache of rendered week charts shared by the Excel and PDF exporters.
+
+    Charts are keyed by a hash of the patient, week, question set, the week's
+    quantitative answers and the chart size, so an edit produces a new key and a
+    stale image is never served. Recent charts stay in memory; older ones are
+    kept as PNG files in the chart_cache folder, which export worker processes
+    share, and the least recently used files are evicted.
+    """
+
+    def __init__(self, cache_dir=None, memory_entries=CHART_CACHE_MEMORY_ENTRIES,
+                 disk_entries=CHART_CACHE_DISK_ENTRIES):
+        self.cache_dir = cache_dir or get_user_data_path("chart_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()  # key -> PNG bytes, most recently used last
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(patient_uuid, week_key, week_data, questions, size, dpi):
+        quantitative = [question["text"] for question in questions if question["type"] == "Quantitative"]
+        answers = {text: chart_values(week_data.get(text, {})) for text in quantitative}
+        payload = json.dumps(
+            [patient_uuid, week_key, [[q["text"], q["type"]] for q in questions], answers, list(size), dpi],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_chart_png(self, patient_uuid, week_data, questions, start_date_str, end_date_str,
+                      size=EXPORT_CHART_SIZE, dpi=EXPORT_CHART_DPI):
+        """Return the PNG bytes of a week chart, rendering it only on a cache miss."""
+        key = self.make_key(patient_uuid, week_key_for(start_date_str, end_date_str), week_data, questions, size, dpi)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        path = os.path.join(self.cache_dir, key + ".png")
+        try:
+            with open(path, "rb") as file:
+                png = file.read()
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            chart = build_week_chart(week_data, questions, start_date_str, end_date_str)
+            png = render_chart_png(chart, size, dpi)
+            self.write_disk_entry(path, png)
+
+        with self.lock:
+            self.memory[key] = png
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+        return png
+
+    def write_disk_entry(self, path, png):
+        """Store a rendered chart on disk and evict the least recently used files."""
+        try:
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(png)
+            os.replace(temp_path, path)  # Other export processes never see a partial file
+
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".png")]
+            if len(entries) > self.disk_entries:
+                entries.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in entries[:len(entries) - self.disk_entries]:
+                    os.remove(entry.path)
+        except OSError as e:
+            logging.warning(f"Failed to write chart cache entry: {e}")
+
+
+def write_week_sheet(ws, patient, week_data, questions, start_date_str, end_date_str, chart_png=None):
+    """Fill a worksheet with one patient's answers for one week and the chart image."""
+    from openpyxl.drawing.image import Image
+
+    ws.append(["Patient Name:", patient["name"]])
+    ws.append(["Patient Age:", patient["age"]])
+    ws.append(["Date Range:", f"{start_date_str} to {end_date_str}"])
+    ws.append([])
+
+    # Add headers
+    ws.append(["Question"] + DAYS_OF_WEEK)
+    for question in questions:
+        question_data = week_data.get(question["text"], {})
+        ws.append([question["text"]] + [answer_text(question_data, i) for i in range(len(DAYS_OF_WEEK))])
+
+    if chart_png:
+        ws.add_image(Image(io.BytesIO(chart_png)), "H2")
+
+
+def add_week_pdf_page(pdf, patient, week_data, questions, start_date_str, end_date_str, chart_png=None):
+    """Add a page with one patient's answers for one week and the chart image."""
+    pdf.add_page()
+
+    # Add patient information
+    pdf.set_font("Arial", style="B", size=14)
+    pdf.cell(0, 10, f"Patient Name: {patient['name']}", ln=True)
+    pdf.cell(0, 10, f"Patient Age: {patient['age']}", ln=True)
+    pdf.cell(0, 10, f"Date Range: {start_date_str} to {end_date_str}", ln=True)
+    pdf.ln(10)
+
+    # Add table headers
+    pdf.set_font("Arial", style="B", size=12)
+    column_widths = [50, 25, 25, 25, 25, 25]  # Adjust to fit A4 size
+    pdf.cell(column_widths[0], 10, "Question", border=1)
+    for day in DAYS_OF_WEEK:
+        pdf.cell(column_widths[1], 10, day, border=1)
+    pdf.ln()
+
+    # Add table data
+    pdf.set_font("Arial", size=12)
+    for question in questions:
+        pdf.cell(column_widths[0], 10, question["text"], border=1)
+        question_data = week_data.get(question["text"], {})
+        for i in range(len(DAYS_OF_WEEK)):
+            pdf.cell(column_widths[1], 10, answer_text(question_data, i), border=1)
+        pdf.ln()
+
+    if chart_png:
+        pdf.ln(10)  # Add spacing before the chart
+        pdf.image(io.BytesIO(chart_png), x=10, y=pdf.get_y(), w=180)  # Fit chart within page width
+
+
+def new_pdf():
+    """Create an A4 PDF document with the app's page settings."""
+    from fpdf import FPDF
+
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    return pdf
+
+
+_export_app = None
+_export_chart_cache = None
+
+
+def init_export_worker():
+    """Set up an offscreen Qt application and chart cache in a batch export worker process."""
+    global _export_app, _export_chart_cache
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    _export_app = QApplication.instance() or QApplication([])
+    _export_chart_cache = ChartRenderCache()
+
+
+def export_patient_job(job):
+    """Render one patient's chart and, unless exporting a combined file, write their files.
+
+    Runs in a worker process. Returns (patient_uuid, written paths, chart PNG bytes).
+    """
+    from openpyxl import Workbook
+
+    patient = job["patient"]
+    week_data = job["week_data"]
+    chart_png = _export_chart_cache.get_chart_png(
+        job["patient_uuid"], week_data, job["questions"], job["start_date"], job["end_date"]
+    )
+    if job["combined"]:
+        return job["patient_uuid"], [], chart_png
+
+    base_name = f"{safe_filename(patient['name'])}_{job['patient_uuid'][:8]}_{job['start_date']}_to_{job['end_date']}_data"
+    paths = []
+    if "xlsx" in job["formats"]:
+        wb = Workbook()
+        ws = wb.active
+        ws.title = unique_sheet_title(f"Data for {patient['name']}", set())
+        write_week_sheet(ws, patient, week_data, job["questions"], job["start_date"], job["end_date"], chart_png)
+        path = os.path.join(job["output_dir"], base_name + ".xlsx")
+        wb.save(path)
+        paths.append(path)
+    if "pdf" in job["formats"]:
+        pdf = new_pdf()
+        add_week_pdf_page(pdf, patient, week_data, job["questions"], job["start_date"], job["end_date"], chart_png)
+        path = os.path.join(job["output_dir"], base_name + ".pdf")
+        pdf.output(path)
+        paths.append(path)
+    return job["patient_uuid"], paths, chart_png
+
+
+@timed("batch_export")
+def batch_export(patients, week_data_by_patient, questions, start_date_str, end_date_str, output_dir,
+                 formats=("xlsx", "pdf"), combined=False, workers=None, progress=None):
+    """Export every patient's week, fanning the chart rendering out over a process pool.
+
+    week_data_by_patient holds only the exported week of each patient (see
+    slice_week), so the workers are not sent anyone's full history.
+    Writes one file per patient and format, or a single combined workbook/PDF when
+    combined is True. progress(done, total) is called as patients finish.
+    Returns the list of written file paths.
+    """
+    from openpyxl import Workbook
+
+    os.makedirs(output_dir, exist_ok=True)
+    total = len(patients)
+    jobs = [
+        {
+            "patient_uuid": patient_uuid,
+            "patient": patient,
+            "week_data": week_data_by_patient.get(patient_uuid, {}),
+            "questions": questions,
+            "start_date": start_date_str,
+            "end_date": end_date_str,
+            "output_dir": output_dir,
+            "formats": formats,
+            "combined": combined,
+        }
+        for patient_uuid, patient in patients.items()
+    ]
+
+    written = []
+    charts = {}
+    # Spawn fresh workers: forking a process that already runs a QApplication is not safe.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_export_worker) as executor:
+        futures = [executor.submit(export_patient_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            patient_uuid, paths, chart_png = future.result()
+            written.extend(paths)
+            charts[patient_uuid] = chart_png
+            if progress:
+                progress(done, total)
+
+    if combined:
+        # Assemble in the original patient order so the combined file is stable.
+        base_path = os.path.join(output_dir, f"all_patients_{start_date_str}_to_{end_date_str}_data")
+        if "xlsx" in formats:
+            wb = Workbook()
+            wb.remove(wb.active)
+            used_titles = set()
+            for job in jobs:
+                ws = wb.create_sheet(unique_sheet_title(job["patient"]["name"], used_titles))
+                write_week_sheet(ws, job["patient"], job["week_data"], questions, start_date_str, end_date_str,
+                                 charts[job["patient_uuid"]])
+            wb.save(base_path + ".xlsx")
+            written.append(base_path + ".xlsx")
+        if "pdf" in formats:
+            pdf = new_pdf()
+            for job in jobs:
+                add_week_pdf_page(pdf, job["patient"], job["week_data"], questions, start_date_str, end_date_str,
+                                  charts[job["patient_uuid"]])
+            pdf.output(base_path + ".pdf")
+            written.append(base_path + ".pdf")
+    return written
+
+
+def slice_week(patient_uuids, get_patient_data, start_date_str, end_date_str):
+    """Return {patient_uuid: a copy of that patient's answers for one week} for batch_export."""
+    week_key = week_key_for(start_date_str, end_date_str)
+    return {
+        patient_uuid: copy.deepcopy(get_patient_data(patient_uuid).get(week_key, {}))
+        for patient_uuid in patient_uuids
+    }
+
+
+def excel_value(value, question_type):
+    """Write quantitative answers as numbers so they can be charted and summed in Excel."""
+    if question_type == "Quantitative" and value not in (None, ""):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+    return value
+
+
+@timed("export_full_history")
+def export_full_history(save_path, patients, get_patient_data, questions, split_by="patient"):
+    """Stream every recorded week of the given patients into a write-only workbook.
+
+    patients maps UUID -> patient record; get_patient_data(uuid) returns that
+    patient's weekly answers, so callers can load one patient at a time. Rows
+    are written straight to disk through openpyxl's write-only mode, keeping
+    memory flat however long the history is. split_by is "patient" for one sheet
+    per patient or "year" for one sheet per patient and calendar year.
+    Returns the number of answer rows written.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    used_titles = set()
+    rows_written = 0
+    header = ["Week", "Question"] + DAYS_OF_WEEK
+
+    for patient_uuid, patient in patients.items():
+        patient_data = get_patient_data(patient_uuid)
+        weeks = sorted(
+            (week_start, week_key) for week_key in patient_data
+            for week_start in [week_start_from_key(week_key)] if week_start
+        )
+        ws = None
+        sheet_year = None
+        if split_by == "patient" or not weeks:
+            ws = wb.create_sheet(unique_sheet_title(patient["name"], used_titles))
+            ws.append(["Patient Name:", patient["name"]])
+            ws.append(["Patient Age:", patient["age"]])
+            ws.append([])
+            ws.append(header)
+
+        for week_start, week_key in weeks:
+            if split_by == "year" and week_start.year != sheet_year:
+                sheet_year = week_start.year
+                ws = wb.create_sheet(unique_sheet_title(f"{patient['name']} {sheet_year}", used_titles))
+                ws.append(["Patient Name:", patient["name"]])
+                ws.append(["Patient Age:", patient["age"]])
+                ws.append([])
+                ws.append(header)
+
+            week_data = patient_data[week_key]
+            week_label = week_key.replace("_to_", " to ")
+            for question in questions:
+                question_data = week_data.get(question["text"])
+                if not question_data:
+                    continue
+                values = [answer_value(question_data, i) for i in range(len(DAYS_OF_WEEK))]
+                if all(value is None for value in values):
+                    continue  # An array with every day unanswered
+                ws.append([week_label, question["text"]]
+                          + [excel_value("" if value is None else value, question["type"]) for value in values])
+                rows_written += 1
+
+    if not used_titles:
+        wb.create_sheet("History")  # A workbook needs at least one sheet
+    wb.save(save_path)
+    return rows_written
+
+
+def week_range_for(date):
+    """Return the (Monday, Friday) date strings of the week containing date."""
+    monday = date - datetime.timedelta(days=date.weekday())
+    return monday.isoformat(), (monday + datetime.timedelta(days=4)).isoformat()
+
+
+class BatchExportWorker(QThread):
+    """Runs batch_export off the GUI thread and reports progress."""
+
+    progress = pyqtSignal(int, int)
+    finished_export = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, export_args, parent=None):
+        super().__init__(parent)
+        self.export_args = export_args
+
+    def run(self):
+        try:
+            self.finished_export.emit(batch_export(**self.export_args, progress=self.progress.emit))
+        except Exception as e:
+            logging.error(f"Batch export failed: {e}")
+            self.failed.emit(str(e))
+
+
+def run_batch_export_cli(args):
+    """Headless entry point for --batch-export."""
+    storage = create_storage()
+    patients = storage.load_patients()
+    questions = storage.load_questions()
+    all_patient_data = storage.load_all_patient_data()
+    week_date = datetime.date.fromisoformat(args.week) if args.week else datetime.date.today()
+    start_date_str, end_date_str = week_range_for(week_date)
+    week_data = slice_week(patients, lambda patient_uuid: all_patient_data.get(patient_uuid, {}),
+                           start_date_str, end_date_str)
+    formats = ("xlsx", "pdf") if args.format == "both" else (args.format,)
+
+    def report(done, total):
+        print(f"[{done}/{total}] patients exported", flush=True)
+
+    written = batch_export(patients, week_data, questions, start_date_str, end_date_str, args.batch_export,
+                           formats=formats, combined=args.combined, workers=args.workers, progress=report)
+    print(f"Wrote {len(written)} file(s) to {args.batch_export}")
+    return 0
+
+
+def run_history_export_cli(args):
+    """Headless entry point for --export-history."""
+    storage = create_storage()
+    if storage.supports_partial_load:
+        get_patient_data = storage.load_patient_data  # One patient in memory at a time
+    else:
+        all_patient_data = storage.load_all_patient_data()
+
+        def get_patient_data(patient_uuid):
+            return all_patient_data.get(patient_uuid, {})
+
+    rows = export_full_history(args.export_history, storage.load_patients(), get_patient_data,
+                               storage.load_questions(), split_by=args.split_by)
+    print(f"Wrote {rows} row(s) to {args.export_history}")
+    return 0
+
+
+def map_import_rows(rows):
+    """Yield (row number, {field: value}) for the data rows under a header row, skipping blank lines.
+
+    Raises ValueError if a required column is missing.
+    """
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = {}
+    for column, name in enumerate(header):
+        normalized = str(name or "").strip().lower().replace(" ", "_").replace("-", "_")
+        for field, aliases in IMPORT_COLUMNS.items():
+            if normalized in aliases and field not in columns:
+                columns[field] = column
+    missing = [field for field in ("date", "question", "value") if field not in columns]
+    if "patient_uuid" not in columns and "patient" not in columns:
+        missing.append("patient or patient_uuid")
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    for row_number, row in enumerate(rows, start=2):
+        if all(cell in (None, "") for cell in row):
+            continue
+        yield row_number, {field: row[column] if column < len(row) else None for field, column in columns.items()}
+
+
+def read_import_rows(path):
+    """Stream the rows of a CSV or XLSX import file one at a time.
+
+    Excel files are opened in openpyxl's read-only mode, so neither format is
+    ever loaded into memory as a whole.
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from map_import_rows(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            yield from map_import_rows(csv.reader(file))
+
+
+def import_week_and_day(value):
+    """Return (week_key, day) for an answer date, raising ValueError for weekends and unreadable dates."""
+    if isinstance(value, datetime.datetime):
+        date = value.date()
+    elif isinstance(value, datetime.date):
+        date = value
+    else:
+        date = datetime.date.fromisoformat(str(value or "").strip()[:10])
+    if date.weekday() >= len(DAYS_OF_WEEK):
+        raise ValueError("answers can only be recorded on weekdays")
+    monday = date - datetime.timedelta(days=date.weekday())
+    friday = monday + datetime.timedelta(days=4)
+    return week_key_for(monday.isoformat(), friday.isoformat()), DAYS_OF_WEEK[date.weekday()]
+
+
+class ImportReport:
+    """What a bulk import found (in a dry run) or wrote."""
+
+    def __init__(self):
+        self.rows = 0
+        self.answers = 0
+        self.blank = 0
+        self.error_count = 0
+        self.errors = []  # The first IMPORT_MAX_ERRORS messages
+        self.existing_patients = set()
+        self.new_patients = {}  # patient_uuid -> name
+        self.first_week = None
+        self.last_week = None
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(f"Row {row_number}: {message}")
+
+    def summary(self):
+        lines = [
+            f"Rows read: {self.rows}",
+            f"Answers to import: {self.answers}",
+            f"Blank values skipped: {self.blank}",
+            f"Rows with errors (skipped): {self.error_count}",
+            f"Existing patients: {len(self.existing_patients)}",
+            f"New patients: {len(self.new_patients)}",
+        ]
+        if self.first_week:
+            lines.append(f"Weeks: {self.first_week.split('_to_')[0]} to {self.last_week.split('_to_')[1]}")
+        return "\n".join(lines)
+
+
+def plan_import(path, patients, questions, dry_run=False):
+    """Validate an import file against the questions and map its rows to patient UUIDs.
+
+    Rows name a patient by patient_uuid or by name; names matching exactly one
+    existing patient (ignoring case) are mapped to them, unknown ones become new
+    patients. Each row needs a weekday date, a known question and a value, which
+    must be a number for quantitative questions. New patients take the row's
+    age, which must be a positive whole number, or else DEFAULT_PATIENT_AGE.
+    Answers are grouped per patient while the file streams, so memory grows
+    with the distinct answers rather than with a record per row. Returns
+    (report, new patients, patient_data), where patient_data is nested
+    patient -> week -> question -> day answers ready for
+    Storage.import_patient_data; in a dry run it is left empty.
+    """
+    report = ImportReport()
+    new_patients = {}
+    patient_data = {}
+    questions_by_name = {question["text"].casefold(): question for question in questions}
+    uuids_by_name = {}
+    for patient_uuid, patient in patients.items():
+        uuids_by_name.setdefault(str(patient.get("name", "")).strip().casefold(), []).append(patient_uuid)
+    weeks_by_date = {}  # Rows usually repeat dates, so parse each one once
+
+    for row_number, row in read_import_rows(path):
+        report.rows += 1
+        question = questions_by_name.get(str(row.get("question") or "").strip().casefold())
+        if question is None:
+            report.add_error(row_number, f"Unknown question {row.get('question')!r}")
+            continue
+
+        value = row.get("value")
+        if value is None or (isinstance(value, str) and not value.strip()):
+            report.blank += 1
+            continue
+        if question["type"] == "Quantitative":
+            try:
+                value = to_quantitative(value)
+            except ValueError:
+                report.add_error(row_number, f"{question['text']!r} needs a number, got {value!r}")
+                continue
+        elif isinstance(value, float):
+            value = format_quantitative(value)  # Excel stores typed-in numbers as floats
+        else:
+            value = str(value)
+
+        date = row.get("date")
+        try:
+            week_key, day = weeks_by_date.get(date) or weeks_by_date.setdefault(date, import_week_and_day(date))
+        except (TypeError, ValueError) as e:
+            report.add_error(row_number, f"Invalid date {date!r}: {e}")
+            continue
+
+        patient_uuid = str(row.get("patient_uuid") or "").strip()
+        name = str(row.get("patient") or "").strip()
+        if patient_uuid:
+            if patient_uuid not in patients and patient_uuid not in new_patients:
+                try:
+                    uuid.UUID(patient_uuid)
+                except ValueError:
+                    report.add_error(row_number, f"Invalid patient UUID {patient_uuid!r}")
+                    continue
+        elif name:
+            matches = uuids_by_name.get(name.casefold(), [])
+            if len(matches) > 1:
+                report.add_error(row_number, f"{name!r} matches {len(matches)} patients; add a patient_uuid column")
+                continue
+            patient_uuid = matches[0] if matches else str(uuid.uuid4())
+            uuids_by_name[name.casefold()] = [patient_uuid]
+        else:
+            report.add_error(row_number, "No patient name or UUID")
+            continue
+
+        if patient_uuid not in patients and patient_uuid not in new_patients:
+            age = row.get("age")
+            if age in (None, ""):
+                age = DEFAULT_PATIENT_AGE
+            else:
+                # Same rule as editing the age in the patient table; Excel gives whole numbers as floats
+                try:
+                    valid = float(age).is_integer() and float(age) > 0
+                except (TypeError, ValueError):
+                    valid = False
+                if not valid:
+                    report.add_error(row_number, f"Invalid age {age!r}; ages must be positive whole numbers")
+                    continue
+                age = int(float(age))
+            new_patients[patient_uuid] = {"name": name or "Imported Patient", "age": age, "records": {}}
+            report.new_patients[patient_uuid] = new_patients[patient_uuid]["name"]
+        elif patient_uuid in patients:
+            report.existing_patients.add(patient_uuid)
+
+        report.answers += 1
+        if report.first_week is None or week_key < report.first_week:
+            report.first_week = week_key
+        if report.last_week is None or week_key > report.last_week:
+            report.last_week = week_key
+        if not dry_run:
+            week_data = patient_data.setdefault(patient_uuid, {}).setdefault(week_key, {})
+            week_data.setdefault(question["text"], {})[day] = value
+    return report, new_patients, patient_data
+
+
+def run_import_cli(args):
+    """Headless entry point for --import."""
+    started = time.perf_counter()
+    storage = create_storage()
+    try:
+        report, new_patients, patient_data = plan_import(args.import_file, storage.load_patients(),
+                                                         storage.load_questions(), dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    if not args.dry_run:
+        # One batched write for the patients and one for the answers
+        if new_patients:
+            storage.save_patient_changes(new_patients)
+        if patient_data:
+            storage.import_patient_data(patient_data)
+    print(report.summary())
+    for error in report.errors:
+        print(error)
+    if report.error_count > len(report.errors):
+        print(f"... and {report.error_count - len(report.errors)} more error(s)")
+    verb = "Checked" if args.dry_run else "Imported"
+    print(f"{verb} {report.rows} row(s) in {time.perf_counter() - started:.1f} s")
+    return 1 if report.error_count else 0
+
+
+def parse_arguments(argv):
+    """Parse the command line, leaving unknown arguments for Qt."""
+    parser = argparse.ArgumentParser(description="Case Manager")
+    parser.add_argument("--batch-export", metavar="OUTPUT_DIR",
+                        help="export every patient's week without opening the window")
+    parser.add_argument("--format", choices=["xlsx", "pdf", "both"], default="both",
+                        help="file format for --batch-export (default: both)")
+    parser.add_argument("--combined", action="store_true",
+                        help="write one combined file instead of one file per patient")
+    parser.add_argument("--week", metavar="YYYY-MM-DD",
+                        help="any date in the week to export (default: this week)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of export processes (default: one per CPU)")
+    parser.add_argument("--export-history", metavar="FILE.xlsx",
+                        help="export every patient's full history to one workbook without opening the window")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="log how long each startup phase takes")
+    parser.add_argument("--split-by", choices=["patient", "year"], default="patient",
+                        help="sheet layout for --export-history (default: one sheet per patient)")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="import patients and weekly answers from a CSV or XLSX file without opening the window")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --import, only validate the file and print the report")
+    return parser.parse_known_args(argv)
+
+
+class HistoryChartControls(QObject):
+    """Event filter for the history chart view: wheel zooms, arrow keys pan, right click zooms out."""
+
+    def __init__(self, chart_view):
+        super().__init__(chart_view)
+        self.chart_view = chart_view
+        chart_view.setRubberBand(chart_view.HorizontalRubberBand)
+        chart_view.setRenderHint(QPainter.Antialiasing)
+        chart_view.setFocusPolicy(Qt.StrongFocus)
+        chart_view.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        chart = self.chart_view.chart()
+        if event.type() == QEvent.Wheel:
+            chart.zoom(1.25 if event.angleDelta().y() > 0 else 0.8)
+            return True
+        if event.type() == QEvent.KeyPress and event.key() in (Qt.Key_Left, Qt.Key_Right):
+            step = chart.plotArea().width() / 10
+            chart.scroll(-step if event.key() == Qt.Key_Left else step, 0)
+            return True
+        return False
+
+
 class DataScreen(QWidget):
-    def __init__(self, patient_uuid, questions, patients):
+    def __init__(self, patient_uuid, questions, patients, store, chart_cache):
         super().__init__()
         self.patient_uuid = patient_uuid
+        self.store = store
+        self.chart_cache = chart_cache
         self.patient = patients[self.patient_uuid]  # Retrieve patient data using UUID
         self.questions = questions
         self.setWindowTitle(f"Data for {self.patient['name']}")
         self.setGeometry(100, 100, 800, 600)
 
         # Load existing patient data
+        self.saving_edit = False
         self.patient_data = self.load_patient_data()
+        self.week_index = self.store.get_week_index(self.patient_uuid)
+        self.prepared_weeks = OrderedDict()  # week_key -> table texts and chart values, most recent last
+        self.store.add_listener(self.handle_store_change)
+        self.store.add_question_listener(self.set_questions)
 
         # Initialize current date range (Monday to Friday)
         today = QDate.currentDate()
@@ -461,6 +4457,8 @@ class DataScreen(QWidget):
 
     def build_ui(self):
         """Build the UI layout for the data screen."""
+        from PyQt5.QtChart import QChart, QChartView, QValueAxis, QDateTimeAxis
+
         layout = QVBoxLayout()
 
         # Date Range Input
@@ -471,12 +4469,25 @@ class DataScreen(QWidget):
         next_week_button = QPushButton("Next Week")
         prev_week_button.clicked.connect(self.go_to_previous_week)
         next_week_button.clicked.connect(self.go_to_next_week)
+        self.prev_data_button = QPushButton("<< Previous with Data")
+        self.next_data_button = QPushButton("Next with Data >>")
+        self.prev_data_button.clicked.connect(self.go_to_previous_week_with_data)
+        self.next_data_button.clicked.connect(self.go_to_next_week_with_data)
         date_range_layout.addWidget(QLabel("Start Date:"))
         date_range_layout.addWidget(self.start_date_label)
         date_range_layout.addWidget(QLabel("End Date:"))
         date_range_layout.addWidget(self.end_date_label)
+        date_range_layout.addWidget(self.prev_data_button)
         date_range_layout.addWidget(prev_week_button)
         date_range_layout.addWidget(next_week_button)
+        date_range_layout.addWidget(self.next_data_button)
+        self.update_navigation_buttons()
+        self.range_selector = QComboBox()
+        self.range_selector.addItem("Current week", None)
+        for label, days in HISTORY_RANGES:
+            self.range_selector.addItem(label, days)
+        self.range_selector.currentIndexChanged.connect(self.change_chart_range)
+        date_range_layout.addWidget(self.range_selector)
         layout.addLayout(date_range_layout)
 
         # Table for weekly data input
@@ -489,11 +4500,39 @@ class DataScreen(QWidget):
         # Connect cellChanged to handle real-time updates
         self.data_table.cellChanged.connect(self.handle_table_edit)
 
-        # Chart for quantitative data
+        # Chart for quantitative data. Series and axes are created once and updated in place.
         self.chart = QChart()
+        self.chart.legend().setVisible(True)
+        self.axis_x = QValueAxis()
+        self.axis_x.setRange(0, len(DAYS_OF_WEEK) - 1)
+        self.axis_x.setTickCount(len(DAYS_OF_WEEK))
+        self.axis_x.setLabelFormat("%d")
+        self.axis_y = QValueAxis()
+        self.chart.addAxis(self.axis_x, Qt.AlignBottom)
+        self.chart.addAxis(self.axis_y, Qt.AlignLeft)
+        self.series_by_question = {}  # question text -> QLineSeries
+        self.chart_values = {}  # question text -> [value per day]
         self.chart_view = QChartView(self.chart)
         layout.addWidget(self.chart_view)
 
+        # Multi-week history chart, shown instead of the weekly chart when a range is selected
+        self.history_chart = QChart()
+        self.history_chart.legend().setVisible(True)
+        self.history_axis_x = QDateTimeAxis()
+        self.history_axis_x.setFormat("yyyy-MM-dd")
+        self.history_axis_y = QValueAxis()
+        self.history_chart.addAxis(self.history_axis_x, Qt.AlignBottom)
+        self.history_chart.addAxis(self.history_axis_y, Qt.AlignLeft)
+        self.history_axis_x.rangeChanged.connect(self.resample_history)
+        self.history_points = {}  # question text -> full resolution [(msecs, value)]
+        self.history_series = {}  # question text -> QLineSeries
+        self.history_days = (None, None)  # (first_day, last_day) plotted, first_day None for all time
+        self.resampling_history = False
+        self.history_view = QChartView(self.history_chart)
+        self.history_controls = HistoryChartControls(self.history_view)
+        self.history_view.hide()
+        layout.addWidget(self.history_view)
+
         # Buttons
         export_button = QPushButton("Export to Excel")
         export_button.clicked.connect(self.export_to_excel)
@@ -503,8 +4542,11 @@ class DataScreen(QWidget):
         export_to_pdf_button.clicked.connect(self.export_to_pdf)
         layout.addWidget(export_to_pdf_button)
 
+        export_history_button = QPushButton("Export Full History to Excel")
+        export_history_button.clicked.connect(self.export_history_to_excel)
+        layout.addWidget(export_history_button)
+
         self.setLayout(layout)
-        self.update_chart()
 
     def get_week_start_date(self, current_date):
         """Get the Monday of the current week based on the given date."""
@@ -522,55 +4564,155 @@ class DataScreen(QWidget):
 
         self.is_data_changed = True  # Mark as changed
         try:
-            week_key = f"{self.start_date.toString('yyyy-MM-dd')}_to_{self.end_date.toString('yyyy-MM-dd')}"
+            week_key = self.current_week_key()
             question = self.data_table.item(row, 0).text()
             day = DAYS_OF_WEEK[column - 1]
             value = self.data_table.item(row, column).text()
 
-            # Update the patient data in memory
-            week_data = self.patient_data.get(week_key, {})
-            question_data = week_data.get(question, {})
-            question_data[day] = value
-            week_data[question] = question_data
-            self.patient_data[week_key] = week_data
-
-            # Autosave
-            self.save_patient_data()  # Autosave changes
-
-            # Update the chart dynamically
-            self.update_chart()
+            # Validate numeric answers once, here, so the store only ever holds floats for them
+            if self.questions[row]["type"] == "Quantitative":
+                try:
+                    value = to_quantitative(value)
+                except ValueError:
+                    QMessageBox.warning(self, "Invalid Input", f"'{question}' only accepts numbers.")
+                    self.data_table.blockSignals(True)  # Put back the stored answer without re-entering here
+                    previous = self.patient_data.get(week_key, {}).get(question, {})
+                    self.data_table.item(row, column).setText(answer_text(previous, column - 1))
+                    self.data_table.blockSignals(False)
+                    return
+
+            # Update the shared store, which also queues the autosave
+            self.save_patient_data(week_key, question, day, value)
+
+            # Update just the edited point on the chart
+            self.update_chart_point(question, column - 1, value)
+            if self.history_view.isVisible() and question in self.history_series:
+                self.update_history_point(question, week_key, column - 1, value)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to update data: {e}")
 
-    def go_to_previous_week(self):
-        """Navigate to the previous week's data."""
-        self.start_date = self.start_date.addDays(-7)
-        self.end_date = self.end_date.addDays(-7)
+    def go_to_week(self, week_start_date):
+        """Navigate to the week starting on the given Monday."""
+        self.start_date = self.get_week_start_date(week_start_date)
+        self.end_date = self.start_date.addDays(4)
         self.update_date_labels()
         self.populate_table()
         self.update_chart()
+        # Get the neighbouring weeks ready once this one is on screen.
+        QTimer.singleShot(0, self.prefetch_neighbours)
+
+    def go_to_previous_week(self):
+        """Navigate to the previous week's data."""
+        self.go_to_week(self.start_date.addDays(-7))
 
     def go_to_next_week(self):
         """Navigate to the next week's data."""
-        self.start_date = self.start_date.addDays(7)
-        self.end_date = self.end_date.addDays(7)
-        self.update_date_labels()
+        self.go_to_week(self.start_date.addDays(7))
+
+    def go_to_previous_week_with_data(self):
+        """Jump back to the closest earlier week that has answers."""
+        week_start = self.week_index.previous_before(self.start_date.toPyDate())
+        if week_start:
+            self.go_to_week(QDate(week_start.year, week_start.month, week_start.day))
+
+    def go_to_next_week_with_data(self):
+        """Jump ahead to the closest later week that has answers."""
+        week_start = self.week_index.next_after(self.start_date.toPyDate())
+        if week_start:
+            self.go_to_week(QDate(week_start.year, week_start.month, week_start.day))
+
+    def current_week_key(self):
+        return week_key_for(self.start_date.toString("yyyy-MM-dd"), self.end_date.toString("yyyy-MM-dd"))
+
+    def neighbour_week_keys(self):
+        """Return the keys of the weeks one step away: previous, next and the nearest ones with data."""
+        week_starts = [self.start_date.addDays(-7).toPyDate(), self.start_date.addDays(7).toPyDate()]
+        week_starts += [self.week_index.previous_before(self.start_date.toPyDate()),
+                        self.week_index.next_after(self.start_date.toPyDate())]
+        return [week_key_for(week_start.isoformat(), (week_start + datetime.timedelta(days=4)).isoformat())
+                for week_start in week_starts if week_start]
+
+    def prepare_week(self, week_key):
+        """Return one week's table texts and chart values, building them if they are not cached."""
+        prepared = self.prepared_weeks.get(week_key)
+        if prepared is not None:
+            self.prepared_weeks.move_to_end(week_key)
+            return prepared
+        week_data = self.patient_data.get(week_key, {})
+        prepared = {
+            "texts": [[answer_text(week_data.get(question["text"], {}), day_index)
+                       for day_index in range(len(DAYS_OF_WEEK))] for question in self.questions],
+            "chart": {question["text"]: chart_values(week_data.get(question["text"], {}))
+                      for question in self.questions if question["type"] == "Quantitative"},
+        }
+        self.prepared_weeks[week_key] = prepared
+        while len(self.prepared_weeks) > PREPARED_WEEKS:
+            self.prepared_weeks.popitem(last=False)
+        return prepared
+
+    def reload(self):
+        """Redraw the current week after the patient's data changed in bulk."""
+        self.prepared_weeks.clear()
         self.populate_table()
         self.update_chart()
+        self.update_navigation_buttons()
+        if self.history_view.isVisible():
+            self.update_history_chart()
+
+    def set_questions(self, questions):
+        """Store listener: redraw every row with the new question list after the settings changed it."""
+        self.questions = questions
+        self.data_table.blockSignals(True)
+        self.data_table.setRowCount(0)  # Rows are matched to questions by position, so rebuild them all
+        self.data_table.blockSignals(False)
+        self.reload()
+
+    def apply_external_changes(self, keys):
+        """Show answers another instance saved, redrawing the table only if the current week changed."""
+        week_keys = {week_key for patient_uuid, week_key, _, _ in keys if patient_uuid == self.patient_uuid}
+        if not week_keys:
+            return
+        for week_key in week_keys:
+            self.prepared_weeks.pop(week_key, None)
+        self.update_navigation_buttons()
+        if self.current_week_key() in week_keys:
+            self.populate_table()
+            self.update_chart()
+        if self.history_view.isVisible():
+            self.update_history_chart()
+
+    def prefetch_neighbours(self):
+        """Prepare the weeks the navigation buttons lead to, so stepping to them only refills the widgets."""
+        for week_key in self.neighbour_week_keys():
+            self.prepare_week(week_key)
 
     def update_date_labels(self):
         """Update the displayed date range labels."""
         self.start_date_label.setText(self.start_date.toString("yyyy-MM-dd"))
         self.end_date_label.setText(self.end_date.toString("yyyy-MM-dd"))
+        self.update_navigation_buttons()
 
+    def update_navigation_buttons(self):
+        """Enable the "with data" buttons only when there is such a week to jump to."""
+        current = self.start_date.toPyDate()
+        self.prev_data_button.setEnabled(self.week_index.previous_before(current) is not None)
+        self.next_data_button.setEnabled(self.week_index.next_after(current) is not None)
+
+    @timed("populate_week_table")
     def populate_table(self):
         """Populate the data table with weekly inputs."""
         self.data_table.blockSignals(True)  # Prevent triggering cellChanged while populating
-        self.data_table.setRowCount(0)
-        week_key = f"{self.start_date.toString('yyyy-MM-dd')}_to_{self.end_date.toString('yyyy-MM-dd')}"
+        texts = self.prepare_week(self.current_week_key())["texts"]
+
+        if self.data_table.rowCount() == len(self.questions):
+            # Same questions as the week on screen: only swap the answer texts
+            for i, row_texts in enumerate(texts):
+                for j, text in enumerate(row_texts, start=1):
+                    self.data_table.item(i, j).setText(text)
+            self.data_table.blockSignals(False)
+            return
 
-        # Get data for the selected week
-        week_data = self.patient_data.get(week_key, {})
+        self.data_table.setRowCount(0)
         for i, question in enumerate(self.questions):
             self.data_table.insertRow(i)
 
@@ -580,74 +4722,219 @@ class DataScreen(QWidget):
             self.data_table.setItem(i, 0, question_item)
 
             # Weekly data inputs (editable)
-            for j, day in enumerate(DAYS_OF_WEEK, start=1):
-                value = week_data.get(question["text"], {}).get(day, "")
-                day_item = QTableWidgetItem(str(value))
-                self.data_table.setItem(i, j, day_item)
+            for j, text in enumerate(texts[i], start=1):
+                self.data_table.setItem(i, j, QTableWidgetItem(text))
 
         self.data_table.blockSignals(False)  # Re-enable cellChanged
 
-    def update_chart(self):
-        """Update the line chart with quantitative data for the current week."""
-        self.chart.removeAllSeries()
-        week_key = f"{self.start_date.toString('yyyy-MM-dd')}_to_{self.end_date.toString('yyyy-MM-dd')}"
-        week_data = self.patient_data.get(week_key, {})
+    def rebuild_series(self):
+        """Create one persistent series per quantitative question."""
+        from PyQt5.QtChart import QLineSeries
 
+        for series in self.series_by_question.values():
+            self.chart.removeSeries(series)
+        self.series_by_question = {}
+        self.chart_values = {}
         for question in self.questions:
-            if question["type"] == "Quantitative":
+            if question["type"] == "Quantitative" and question["text"] not in self.series_by_question:
                 series = QLineSeries()
                 series.setName(question["text"])
+                self.chart.addSeries(series)
+                series.attachAxis(self.axis_x)
+                series.attachAxis(self.axis_y)
+                self.series_by_question[question["text"]] = series
 
-                # Add data points for Monday to Friday
-                question_data = week_data.get(question["text"], {})
-                for i, day in enumerate(DAYS_OF_WEEK):
-                    try:
-                        value = float(question_data.get(day, 0) or 0)
-                    except ValueError:
-                        value = 0
-                    series.append(i, value)
+    @timed("update_chart")
+    def update_chart(self):
+        """Update the line chart with quantitative data for the current week."""
+        quantitative = [question["text"] for question in self.questions if question["type"] == "Quantitative"]
+        if quantitative != list(self.series_by_question):
+            self.rebuild_series()  # Only when the question set changed
 
-                self.chart.addSeries(series)
+        prepared_values = self.prepare_week(self.current_week_key())["chart"]
+        for question_text, series in self.series_by_question.items():
+            values = list(prepared_values[question_text])  # Copy: update_chart_point edits it in place
+            self.chart_values[question_text] = values
+            series.replace([QPointF(i, value) for i, value in enumerate(values)])
 
-        # Configure the chart
-        self.chart.createDefaultAxes()
+        self.update_axis_range()
         self.chart.setTitle(
             f"Quantitative Data ({self.start_date.toString('yyyy-MM-dd')} to {self.end_date.toString('yyyy-MM-dd')})")
-        self.chart.legend().setVisible(True)
 
+    def update_chart_point(self, question_text, day_index, value):
+        """Move a single point after a cell edit instead of redrawing the whole chart."""
+        series = self.series_by_question.get(question_text)
+        if series is None:
+            return  # Qualitative question, nothing to plot
+        parsed = parse_quantitative(value)
+        values = self.chart_values[question_text]
+        if values[day_index] == parsed:
+            return
+        values[day_index] = parsed
+        series.replace(day_index, QPointF(day_index, parsed))
+        self.update_axis_range()
+
+    def change_chart_range(self):
+        """Switch between the weekly chart and the multi-week history chart."""
+        if self.range_selector.currentData() is None:
+            self.history_view.hide()
+            self.chart_view.show()
+        else:
+            self.update_history_chart()
+            self.chart_view.hide()
+            self.history_view.show()
+
+    @timed("update_history_chart")
+    def update_history_chart(self):
+        """Plot every quantitative question over the selected date range."""
+        from PyQt5.QtChart import QLineSeries
+
+        days_back = self.range_selector.currentData()
+        last_day = self.end_date.toPyDate()
+        first_day = last_day - datetime.timedelta(days=days_back) if days_back else None
+        # A week starting up to four days before first_day still has days inside the range.
+        week_keys = self.week_index.between(first_day - datetime.timedelta(days=4) if first_day else None, last_day)
+
+        for series in self.history_series.values():
+            self.history_chart.removeSeries(series)
+        self.history_series = {}
+        self.history_points = {}
+        self.history_days = (first_day, last_day)
+        for question in self.questions:
+            if question["type"] != "Quantitative":
+                continue
+            self.history_points[question["text"]] = collect_history_points(
+                self.patient_data, question["text"], first_day, last_day, week_keys
+            )
+            series = QLineSeries()
+            series.setName(question["text"])
+            self.history_chart.addSeries(series)
+            series.attachAxis(self.history_axis_x)
+            series.attachAxis(self.history_axis_y)
+            self.history_series[question["text"]] = series
+
+        all_points = [point for points in self.history_points.values() for point in points]
+        low_x = min((x for x, _ in all_points), default=None)
+        high_x = max((x for x, _ in all_points), default=None)
+        if low_x is None:
+            low_x = high_x = datetime.datetime.combine(last_day, datetime.time()).timestamp() * 1000
+        if first_day:
+            low_x = datetime.datetime.combine(first_day, datetime.time()).timestamp() * 1000
+        low_y = min((y for _, y in all_points), default=0.0)
+        high_y = max((y for _, y in all_points), default=0.0)
+        self.history_axis_y.setRange(low_y, high_y if high_y > low_y else low_y + 1)
+        self.history_chart.setTitle(f"Quantitative Data ({self.range_selector.currentText()})")
+
+        # Setting the x range triggers resample_history, which fills the series; an unchanged range does not.
+        low, high = QDateTime.fromMSecsSinceEpoch(int(low_x)), QDateTime.fromMSecsSinceEpoch(int(high_x) + 1)
+        if (self.history_axis_x.min(), self.history_axis_x.max()) == (low, high):
+            self.resample_history()
+        else:
+            self.history_axis_x.setRange(low, high)
+
+    def update_history_point(self, question_text, week_key, day_index, value):
+        """Apply a single cell edit to the full resolution history and re-run only the downsampling."""
+        week_start = week_start_from_key(week_key)
+        if week_start is None:
+            return
+        date = week_start + datetime.timedelta(days=day_index)
+        first_day, last_day = self.history_days
+        if (first_day and date < first_day) or date > last_day:
+            return  # Outside the plotted range
+        msecs = datetime.datetime.combine(date, datetime.time()).timestamp() * 1000
+        points = self.history_points[question_text]
+        index = bisect.bisect_left(points, (msecs,))
+        if index < len(points) and points[index][0] == msecs:
+            del points[index]
+        if not math.isnan(value):
+            points.insert(index, (msecs, value))
+            # Grow the y axis to fit the new value; it is refitted on the next full redraw.
+            low_y, high_y = self.history_axis_y.min(), self.history_axis_y.max()
+            if not low_y <= value <= high_y:
+                self.history_axis_y.setRange(min(low_y, value), max(high_y, value))
+        low_x = self.history_axis_x.min().toMSecsSinceEpoch()
+        high_x = self.history_axis_x.max().toMSecsSinceEpoch()
+        if low_x <= msecs < high_x:
+            self.resample_history()
+        else:  # Widening the x axis to show the edit resamples too
+            self.history_axis_x.setRange(
+                QDateTime.fromMSecsSinceEpoch(int(min(low_x, msecs))),
+                QDateTime.fromMSecsSinceEpoch(int(max(high_x, msecs + 1))),
+            )
+
+    def resample_history(self, *_):
+        """Downsample the visible part of each history series to at most HISTORY_MAX_POINTS."""
+        if self.resampling_history:
+            return
+        self.resampling_history = True
+        try:
+            low_x = self.history_axis_x.min().toMSecsSinceEpoch()
+            high_x = self.history_axis_x.max().toMSecsSinceEpoch()
+            for question_text, series in self.history_series.items():
+                points = self.history_points[question_text]
+                # Keep one point either side of the window so lines run to the edges when zoomed in.
+                start = max(bisect.bisect_left(points, (low_x,)) - 1, 0)
+                end = bisect.bisect_right(points, (high_x, float("inf"))) + 1
+                visible = downsample_lttb(points[start:end], HISTORY_MAX_POINTS)
+                series.replace([QPointF(x, y) for x, y in visible])
+        finally:
+            self.resampling_history = False
+
+    def update_axis_range(self):
+        """Fit the y axis to the cached chart values."""
+        all_values = [value for values in self.chart_values.values() for value in values]
+        low = min(all_values, default=0.0)
+        high = max(all_values, default=0.0)
+        if low == high:
+            high = low + 1
+        self.axis_y.setRange(low, high)
+
+    @timed("load_patient_data")
     def load_patient_data(self):
         """Load existing patient data for the specific patient."""
         try:
-            path = get_user_data_path("patient_data.json")
-            if os.path.exists(path):
-                with open(path, "r") as file:
-                    all_data = json.load(file)
-                    return all_data.get(self.patient_uuid, {})  # Load only this patient's data
-            else:
-                return {}
+            return self.store.get_patient_data(self.patient_uuid)  # Shared with other windows
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load patient data: {e}")
             return {}
 
-    def save_patient_data(self):
-        """Save the patient's data to a persistent file."""
+    @timed("save_answer")
+    def save_patient_data(self, week_key, question, day, value):
+        """Record a single edited cell in the shared store."""
+        self.saving_edit = True  # Our own edit is already on screen
         try:
-            path = get_user_data_path("patient_data.json")
-            all_data = {}
-            if os.path.exists(path):
-                with open(path, "r") as file:
-                    all_data = json.load(file)
-            all_data[self.patient_uuid] = self.patient_data
-            with open(path, "w") as file:
-                json.dump(all_data, file, indent=4)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save patient data: {e}")
+            self.store.set_answer(self.patient_uuid, week_key, question, day, value)
+        finally:
+            self.saving_edit = False
+
+    def handle_store_change(self, patient_uuid, week_key, question, day):
+        """Refresh this window when another window edits the same patient's current week."""
+        if patient_uuid != self.patient_uuid:
+            return
+        self.prepared_weeks.pop(week_key, None)  # Stale now, whoever made the edit
+        self.update_navigation_buttons()
+        if self.saving_edit:
+            return
+        if week_key == self.current_week_key():
+            self.populate_table()
+            self.update_chart()
+        if self.history_view.isVisible():
+            self.update_history_chart()
+
+    def closeEvent(self, event):
+        """Flush this patient's pending edits when the window closes."""
+        self.store.remove_listener(self.handle_store_change)
+        self.store.remove_question_listener(self.set_questions)
+        self.store.flush()
+        super().closeEvent(event)
 
     def export_to_excel(self):
         """Export patient data to an Excel file with date range in the file name."""
+        from openpyxl import Workbook
+
         try:
-            start_date_str = self.patient_data.get("start_date", "start")
-            end_date_str = self.patient_data.get("end_date", "end")
+            start_date_str = self.start_date.toString("yyyy-MM-dd")
+            end_date_str = self.end_date.toString("yyyy-MM-dd")
             file_name = f"{self.patient['name']}_{start_date_str}_to_{end_date_str}_data.xlsx"
             save_path, _ = QFileDialog.getSaveFileName(
                 self, "Save File", file_name, "Excel Files (*.xlsx)"
@@ -655,49 +4942,20 @@ class DataScreen(QWidget):
             if not save_path:
                 return
 
-            # Create a temporary directory for the chart image
-            temp_dir = tempfile.gettempdir()
-            chart_image_path = os.path.join(temp_dir, f"{self.patient['name']}_chart.png")
-
-            # Create Excel workbook
-            wb = Workbook()
-            ws = wb.active
-            ws.title = f"Data for {self.patient['name']}"
-
-            ws.append(["Patient Name:", self.patient["name"]])
-            ws.append(["Patient Age:", self.patient["age"]])
-            ws.append(["Date Range:", f"{start_date_str} to {end_date_str}"])
-            ws.append([])
-
-            # Add headers
-            ws.append(["Question"] + DAYS_OF_WEEK)
-
-            for question, weekly_data in self.patient_data.items():
-                if question in ["start_date", "end_date"]:  # Skip date metadata
-                    continue
-                row = [question]
-                for day in DAYS_OF_WEEK:
-                    row.append(weekly_data.get(day, ""))
-                ws.append(row)
-
-            # Add chart image
-            try:
-                chart_pixmap = self.chart_view.grab()
-                chart_pixmap.save(chart_image_path)
-                img = Image(chart_image_path)
-                ws.add_image(img, "H2")
-            except Exception as e:
-                QMessageBox.warning(self, "Warning", f"Failed to add chart image: {str(e)}")
-
-            # Save the Excel file
-            wb.save(save_path)
+            with timed("export_excel"):
+                # Create Excel workbook
+                wb = Workbook()
+                ws = wb.active
+                ws.title = unique_sheet_title(f"Data for {self.patient['name']}", set())
+                week_data = self.patient_data.get(week_key_for(start_date_str, end_date_str), {})
+                write_week_sheet(ws, self.patient, week_data, self.questions, start_date_str, end_date_str,
+                                 self.render_export_chart(week_data, start_date_str, end_date_str))
+
+                # Save the Excel file
+                wb.save(save_path)
             QMessageBox.information(self, "Exported", f"Data exported to {save_path}.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to export data: {str(e)}")
-        finally:
-            # Clean up temporary files
-            if os.path.exists(chart_image_path):
-                os.remove(chart_image_path)
 
     def export_to_pdf(self):
         """Export patient data to a PDF file."""
@@ -711,58 +4969,263 @@ class DataScreen(QWidget):
             if not save_path:
                 return
 
-            pdf = FPDF(orientation="P", unit="mm", format="A4")
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-
-            # Add patient information
-            pdf.set_font("Arial", style="B", size=14)
-            pdf.cell(0, 10, f"Patient Name: {self.patient['name']}", ln=True)
-            pdf.cell(0, 10, f"Patient Age: {self.patient['age']}", ln=True)
-            pdf.cell(0, 10, f"Date Range: {start_date_str} to {end_date_str}", ln=True)
-            pdf.ln(10)
-
-            # Add table headers
-            pdf.set_font("Arial", style="B", size=12)
-            column_widths = [50, 25, 25, 25, 25, 25]  # Adjust to fit A4 size
-            pdf.cell(column_widths[0], 10, "Question", border=1)
-            for day in DAYS_OF_WEEK:
-                pdf.cell(column_widths[1], 10, day, border=1)
-            pdf.ln()
-
-            # Add table data
-            pdf.set_font("Arial", size=12)
-            week_key = f"{start_date_str}_to_{end_date_str}"
-            week_data = self.patient_data.get(week_key, {})
-
-            for question in self.questions:
-                pdf.cell(column_widths[0], 10, question["text"], border=1)
-                for day in DAYS_OF_WEEK:
-                    value = week_data.get(question["text"], {}).get(day, "")
-                    pdf.cell(column_widths[1], 10, str(value), border=1)
-                pdf.ln()
-
-            # Add chart image
-            temp_dir = tempfile.gettempdir()
-            chart_image_path = os.path.join(temp_dir, "chart.png")
-            try:
-                chart_pixmap = self.chart_view.grab()
-                chart_pixmap.save(chart_image_path)
-                pdf.ln(10)  # Add spacing before the chart
-                pdf.image(chart_image_path, x=10, y=pdf.get_y(), w=180)  # Fit chart within page width
-            except Exception as e:
-                QMessageBox.warning(self, "Warning", f"Failed to add chart image: {str(e)}")
-            finally:
-                if os.path.exists(chart_image_path):
-                    os.remove(chart_image_path)
+            with timed("export_pdf"):
+                pdf = new_pdf()
+                week_data = self.patient_data.get(week_key_for(start_date_str, end_date_str), {})
+                add_week_pdf_page(pdf, self.patient, week_data, self.questions, start_date_str, end_date_str,
+                                  self.render_export_chart(week_data, start_date_str, end_date_str))
 
-            # Save the PDF
-            pdf.output(save_path)
+                # Save the PDF
+                pdf.output(save_path)
             QMessageBox.information(self, "Exported", f"Data exported to {save_path}.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to export data to PDF: {str(e)}")
 
+    def export_history_to_excel(self):
+        """Export every recorded week for this patient, one sheet per year."""
+        try:
+            file_name = f"{self.patient['name']}_history.xlsx"
+            save_path, _ = QFileDialog.getSaveFileName(
+                self, "Save File", file_name, "Excel Files (*.xlsx)"
+            )
+            if not save_path:
+                return
+            export_full_history(save_path, {self.patient_uuid: self.patient}, self.store.get_patient_data,
+                                self.questions, split_by="year")
+            QMessageBox.information(self, "Exported", f"Data exported to {save_path}.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export history: {str(e)}")
+
+    def render_export_chart(self, week_data, start_date_str, end_date_str):
+        """Get the week's chart as PNG bytes from the shared render cache."""
+        try:
+            return self.chart_cache.get_chart_png(
+                self.patient_uuid, week_data, self.questions, start_date_str, end_date_str
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", f"Failed to add chart image: {str(e)}")
+            return None
+
+
+class SearchScreen(QWidget):
+    """Search patient names and qualitative answers; double-click a hit to open it.
+
+    search_index may be None while the index is still being built; set_search_index
+    supplies it later and re-runs the current query.
+    """
+
+    def __init__(self, search_index, patients, open_hit_callback):
+        super().__init__()
+        self.setWindowTitle("Search")
+        self.setGeometry(150, 150, 800, 500)
+        self.search_index = search_index
+        self.patients = patients
+        self.open_hit_callback = open_hit_callback
+        self.hits = []
+
+        layout = QVBoxLayout()
+        self.query_box = QLineEdit()
+        self.query_box.setPlaceholderText("Search names and notes...")
+        layout.addWidget(self.query_box)
+
+        # Search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(lambda: self.run_search(self.query_box.text()))
+        self.query_box.textChanged.connect(self.search_timer.start)
+
+        self.status_label = QLabel("" if search_index else "Building search index...")
+        layout.addWidget(self.status_label)
+
+        self.results_table = QTableWidget()
+        self.results_table.setColumnCount(5)
+        self.results_table.setHorizontalHeaderLabels(["Patient", "Week", "Day", "Question", "Text"])
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.horizontalHeader().setStretchLastSection(True)
+        self.results_table.cellDoubleClicked.connect(self.open_hit)
+        layout.addWidget(self.results_table)
+        self.setLayout(layout)
+
+    def set_search_index(self, search_index):
+        """Use a newly built index and show the current query's hits from it."""
+        self.search_index = search_index
+        self.run_search(self.query_box.text())
+
+    def run_search(self, query):
+        """Show the ranked hits for the current query."""
+        if self.search_index is None:
+            self.status_label.setText("Building search index...")
+            return
+        started = time.perf_counter()
+        self.hits = self.search_index.search(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.results_table.setRowCount(len(self.hits))
+        for row, hit in enumerate(self.hits):
+            patient_name = self.patients.get(hit["patient_uuid"], {}).get("name", "Unknown patient")
+            week = hit["week_key"].replace("_to_", " to ") if hit["week_key"] else ""
+            text = hit["text"] if len(hit["text"]) <= 120 else hit["text"][:117] + "..."
+            for column, value in enumerate([patient_name, week, hit["day"] or "", hit["question"] or "", text]):
+                self.results_table.setItem(row, column, QTableWidgetItem(value))
+        self.status_label.setText(f"{len(self.hits)} result(s) in {elapsed_ms:.1f} ms" if query.strip() else "")
+
+    def open_hit(self, row, column):
+        self.open_hit_callback(self.hits[row])
+
+
+class AnalyticsScreen(QWidget):
+    """Cohort statistics for every quantitative question across all patients."""
+
+    SUMMARY_HEADERS = ["Question", "Mean", "Median", "Min", "Max", "Trend", "Missing %", "Answers"]
+    WEEKLY_HEADERS = ["Week", "Mean", "Median", "Min", "Max", "Missing %", "Answers"]
+
+    def __init__(self, analytics, store):
+        super().__init__()
+        self.setWindowTitle("Cohort Analytics")
+        self.setGeometry(150, 150, 900, 600)
+        self.analytics = analytics
+        self.store = store
+
+        layout = QVBoxLayout()
+        range_layout = QHBoxLayout()
+        range_layout.addWidget(QLabel("Date range:"))
+        self.range_selector = QComboBox()
+        for label, days in HISTORY_RANGES:
+            self.range_selector.addItem(label, days)
+        self.range_selector.setCurrentIndex(len(HISTORY_RANGES) - 1)
+        self.range_selector.currentIndexChanged.connect(self.refresh)
+        range_layout.addWidget(self.range_selector)
+        layout.addLayout(range_layout)
+
+        self.summary_table = QTableWidget()
+        self.summary_table.setColumnCount(len(self.SUMMARY_HEADERS))
+        self.summary_table.setHorizontalHeaderLabels(self.SUMMARY_HEADERS)
+        self.summary_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.summary_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.summary_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.summary_table.itemSelectionChanged.connect(self.refresh_weekly)
+        layout.addWidget(self.summary_table)
+
+        layout.addWidget(QLabel("Week over week (select a question above):"))
+        self.weekly_table = QTableWidget()
+        self.weekly_table.setColumnCount(len(self.WEEKLY_HEADERS))
+        self.weekly_table.setHorizontalHeaderLabels(self.WEEKLY_HEADERS)
+        self.weekly_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.weekly_table)
+        self.setLayout(layout)
+
+        self.store.add_listener(self.handle_store_change)
+        self.refresh()
+
+    def date_range(self):
+        """Return (first_day, last_day) of the selected range, ending with the current week."""
+        today = datetime.date.today()
+        last_day = today - datetime.timedelta(days=today.weekday())
+        days_back = self.range_selector.currentData()
+        return (last_day - datetime.timedelta(days=days_back) if days_back else None), last_day
+
+    @staticmethod
+    def format_number(value, percent=False):
+        if value is None:
+            return ""
+        return f"{value * 100:.1f}%" if percent else f"{value:.2f}"
+
+    def fill_row(self, table, row, values):
+        for column, value in enumerate(values):
+            table.setItem(row, column, QTableWidgetItem(value))
+
+    def refresh(self):
+        """Recompute the summary for the selected range, keeping the selected question."""
+        selected = self.selected_question()
+        summary = self.analytics.summary(*self.date_range())
+        self.summary_table.blockSignals(True)
+        self.summary_table.setRowCount(len(summary))
+        for row, stats in enumerate(summary):
+            trend = self.format_number(stats["trend"])
+            if stats["trend"] is not None and stats["trend"] > 0:
+                trend = "+" + trend
+            self.fill_row(self.summary_table, row, [
+                stats["question"],
+                self.format_number(stats["mean"]),
+                self.format_number(stats["median"]),
+                self.format_number(stats["min"]),
+                self.format_number(stats["max"]),
+                trend,
+                self.format_number(stats["missing_rate"], percent=True),
+                str(stats["count"]),
+            ])
+            if stats["question"] == selected:
+                self.summary_table.selectRow(row)
+        self.summary_table.blockSignals(False)
+        self.refresh_weekly()
+
+    def selected_question(self):
+        rows = self.summary_table.selectionModel().selectedRows()
+        return self.summary_table.item(rows[0].row(), 0).text() if rows else None
+
+    def refresh_weekly(self):
+        """Show the weekly rollups of the selected question."""
+        question = self.selected_question()
+        weekly = self.analytics.weekly(question, *self.date_range()) if question else []
+        self.weekly_table.setRowCount(len(weekly))
+        for row, stats in enumerate(reversed(weekly)):  # Most recent week first
+            self.fill_row(self.weekly_table, row, [
+                stats["week_key"].replace("_to_", " to "),
+                self.format_number(stats["mean"]),
+                self.format_number(stats["median"]),
+                self.format_number(stats["min"]),
+                self.format_number(stats["max"]),
+                self.format_number(stats["missing_rate"], percent=True),
+                str(stats["count"]),
+            ])
+
+    def handle_store_change(self, patient_uuid, week_key, question, day):
+        """Refresh after an edit; the manager has already updated the rollups."""
+        if question in self.analytics.questions:
+            self.refresh()
+
+    def closeEvent(self, event):
+        self.store.remove_listener(self.handle_store_change)
+        super().closeEvent(event)
+
+
+class PerformanceScreen(QWidget):
+    """Live p50/p95 durations of the timed operations in this session."""
+
+    HEADERS = ["Operation", "Calls", "p50 (ms)", "p95 (ms)", "Max (ms)"]
+    REFRESH_INTERVAL_MS = 2000
+
+    def __init__(self, monitor):
+        super().__init__()
+        self.setWindowTitle("Performance")
+        self.setGeometry(150, 150, 600, 400)
+        self.monitor = monitor
+
+        layout = QVBoxLayout()
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+        layout.addWidget(QLabel("Timing events are also written to timings.jsonl in the data folder."))
+        self.setLayout(layout)
+
+        # Refresh while the window is open so the numbers follow what the user is doing.
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(self.REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def refresh(self):
+        rows = self.monitor.summary()
+        self.table.setRowCount(len(rows))
+        for row, (operation, calls, p50, p95, maximum) in enumerate(rows):
+            for column, value in enumerate([operation, str(calls), f"{p50:.1f}", f"{p95:.1f}", f"{maximum:.1f}"]):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
 
 class EditDataScreen(QWidget):
     def __init__(self, questions, save_questions_callback):
@@ -861,13 +5324,27 @@ class EditDataScreen(QWidget):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Export worker processes in the PyInstaller build
+    args, qt_args = parse_arguments(sys.argv[1:])
+    setup_logging()
+    startup_profiler.enabled = args.profile_startup
+    startup_profiler.mark("imports")
+    if args.batch_export:
+        sys.exit(run_batch_export_cli(args))
+    if args.export_history:
+        sys.exit(run_history_export_cli(args))
+    if args.import_file:
+        sys.exit(run_import_cli(args))
     try:
         logging.info("Application started.")
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
 
         # Initialize main application window
         window = EMRManager()
+        app.aboutToQuit.connect(window.patient_data_store.close)  # Final flush even if the window is never closed
         window.show()
+        # Runs once the event loop has processed the first paint of the window.
+        QTimer.singleShot(0, lambda: (startup_profiler.mark("first paint"), startup_profiler.report()))
         sys.exit(app.exec_())
     except Exception as e:
         logging.error(f"Application error: {e}")
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Shared fixtures for the behaviour tests.
+
+Every test gets its own home folder, so the app's data folder
+(get_user_data_path) points into tmp_path.
+"""
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def data_dir(home):
+    import emr_app
+
+    return emr_app.get_user_data_path("")
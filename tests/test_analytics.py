@@ -0,0 +1,57 @@
+"""Cohort analytics: rollups and missing-data rates."""
+import pytest
+
+import emr_app
+
+pytest.importorskip("numpy")
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+ADA, GRACE, ALAN = "ada", "grace", "alan"
+WEEK_1 = "2024-01-01_to_2024-01-05"
+WEEK_2 = "2024-01-08_to_2024-01-12"
+WEEK_3 = "2024-01-15_to_2024-01-19"
+
+
+def build_analytics():
+    data = {
+        ADA: {WEEK_1: {"Mood": {"Monday": "5"}}, WEEK_3: {"Mood": {"Monday": "5"}}},
+        GRACE: {WEEK_2: {"Notes": {"Tuesday": "joined"}}, WEEK_3: {"Mood": {"Monday": "3", "Tuesday": "4"}}},
+        ALAN: {},  # Has not recorded anything yet
+    }
+    analytics = emr_app.CohortAnalytics()
+    analytics.build({ADA: {}, GRACE: {}, ALAN: {}}, data, QUESTIONS)
+    return analytics
+
+
+def test_missing_rate_counts_only_weeks_patients_were_recording():
+    analytics = build_analytics()
+    weekly = {row["week_key"]: row for row in analytics.weekly("Mood")}
+    assert weekly[WEEK_1]["missing_rate"] == pytest.approx(1 - 1 / 5)  # Only Ada had started
+    assert weekly[WEEK_3]["missing_rate"] == pytest.approx(1 - 3 / 10)  # Ada and Grace
+    (summary,) = analytics.summary()
+    assert (summary["count"], summary["mean"]) == (4, pytest.approx(17 / 4))
+    assert summary["missing_rate"] == pytest.approx(1 - 4 / 15)
+
+
+def test_edits_and_removals_update_the_expected_patient_weeks():
+    analytics = build_analytics()
+    analytics.update_answer(ALAN, WEEK_3, "Notes", "Friday", "first visit")
+    assert analytics.weekly("Mood")[-1]["missing_rate"] == pytest.approx(1 - 3 / 15)
+
+    analytics.remove_patient(GRACE)
+    assert analytics.weekly("Mood")[-1]["missing_rate"] == pytest.approx(1 - 1 / 10)
+
+
+def test_released_rows_start_empty_for_the_next_patient():
+    analytics = build_analytics()
+    grace_row = analytics.patient_rows[GRACE]
+    analytics.remove_patient(GRACE)
+    analytics.update_answer("new", WEEK_1, "Mood", "Friday", "2")
+    assert analytics.patient_rows["new"] == grace_row
+
+    weekly = {row["week_key"]: row for row in analytics.weekly("Mood")}
+    assert weekly[WEEK_3]["count"] == 1  # Grace's answers are gone, not inherited
+    assert weekly[WEEK_3]["missing_rate"] == pytest.approx(1 - 1 / 5)  # Only Ada spans week 3
+    assert weekly[WEEK_1]["missing_rate"] == pytest.approx(1 - 2 / 10)
+    analytics.remove_patient(GRACE)  # Removing twice is harmless
+    assert analytics.weekly("Mood")[0]["count"] == 2
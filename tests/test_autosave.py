@@ -0,0 +1,58 @@
+"""AutosaveWriter batching and retry after failed writes."""
+import emr_app
+
+
+class FlakyStorage:
+    def __init__(self, failures):
+        self.failures = failures
+        self.saved = {}
+
+    def save_patient_changes(self, changes):
+        pass
+
+    def save_answers(self, answers):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("file is locked")
+        self.saved.update(answers)
+
+
+def test_failed_batch_is_retried_with_newer_edits_winning(monkeypatch):
+    monkeypatch.setattr(emr_app, "AUTOSAVE_RETRY_DELAY", 0.05)
+    storage, errors = FlakyStorage(failures=1), []
+    writer = emr_app.AutosaveWriter(storage, delay=0.01, on_error=errors.append)
+    writer.queue_answer("p1", "week", "Mood", "Monday", 1.0)
+    writer.flush()  # Fails once and keeps the edit
+    writer.queue_answer("p1", "week", "Mood", "Monday", 2.0)
+    writer.queue_answer("p1", "week", "Mood", "Tuesday", 3.0)
+    writer.flush()
+    writer.stop()
+
+    assert storage.saved == {("p1", "week", "Mood", "Monday"): 2.0, ("p1", "week", "Mood", "Tuesday"): 3.0}
+    assert errors == ["file is locked"]
+
+
+def test_queuing_after_stop_restarts_the_writer():
+    storage = FlakyStorage(failures=0)
+    writer = emr_app.AutosaveWriter(storage, delay=0.01)
+    writer.stop()
+    writer.queue_answer("p1", "week", "Mood", "Monday", 1.0)
+    writer.flush()
+    writer.stop()
+    assert storage.saved == {("p1", "week", "Mood", "Monday"): 1.0}
+
+
+def test_queuing_while_stopping_keeps_one_writer_thread():
+    import threading
+
+    storage = FlakyStorage(failures=0)
+    writer = emr_app.AutosaveWriter(storage, delay=0.5)
+    writer.queue_answer("p1", "week", "Mood", "Monday", 1.0)  # The thread is now waiting out the delay
+    thread = writer.thread
+    with writer.condition:
+        writer.stopped = True  # stop() has begun but not joined yet
+        writer.queue_answer("p1", "week", "Mood", "Tuesday", 2.0)
+    assert writer.thread is thread
+    assert sum(t.name == "AutosaveWriter" and t.is_alive() for t in threading.enumerate()) == 1
+    writer.stop()
+    assert len(storage.saved) == 2
@@ -0,0 +1,59 @@
+"""Quantitative answers kept as float arrays in memory."""
+import math
+from array import array
+
+import pytest
+
+import emr_app
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+ADA = "11111111-1111-1111-1111-111111111111"
+WEEK_KEY = "2024-01-08_to_2024-01-12"
+
+
+def test_answers_pack_into_arrays_and_back():
+    values = emr_app.quantitative_array({"Monday": "4", "Tuesday": 2.5, "Wednesday": "", "Friday": "n/a"})
+    assert isinstance(values, array) and values.typecode == "d"
+    assert values[:2] == array("d", [4.0, 2.5]) and all(math.isnan(value) for value in values[2:])
+    assert emr_app.quantitative_answers(values) == {"Monday": "4", "Tuesday": "2.5"}
+
+
+@pytest.mark.parametrize("value", ["abc", "inf", [1]])
+def test_anything_but_a_finite_number_is_rejected(value):
+    with pytest.raises(ValueError):
+        emr_app.to_quantitative(value)
+
+
+@pytest.mark.parametrize("value", ["", "  ", None, float("nan")])
+def test_blanks_become_nan(value):
+    assert math.isnan(emr_app.to_quantitative(value))
+
+
+def test_store_keeps_arrays_and_saves_numbers(data_dir):
+    storage = emr_app.JsonStorage()
+    store = emr_app.PatientDataStore(storage)
+    store.set_questions(QUESTIONS)
+    store.set_answer(ADA, WEEK_KEY, "Mood", "Monday", "4")
+    store.set_answer(ADA, WEEK_KEY, "Mood", "Tuesday", "3")
+    store.set_answer(ADA, WEEK_KEY, "Mood", "Tuesday", "")  # Cleared
+    store.set_answer(ADA, WEEK_KEY, "Notes", "Monday", "fine")
+    with pytest.raises(ValueError):
+        store.set_answer(ADA, WEEK_KEY, "Mood", "Friday", "lots")
+
+    week_data = store.get_patient_data(ADA)[WEEK_KEY]
+    assert isinstance(week_data["Mood"], array) and week_data["Notes"] == {"Monday": "fine"}
+    assert store.get_answer(ADA, WEEK_KEY, "Mood", "Monday") == 4.0
+    assert store.get_answer(ADA, WEEK_KEY, "Mood", "Tuesday") is None
+    store.close()
+    assert emr_app.JsonStorage().load_patient_data(ADA)[WEEK_KEY]["Mood"] == {"Monday": 4.0, "Tuesday": ""}
+
+
+def test_changing_a_question_type_repacks_cached_answers(data_dir):
+    store = emr_app.PatientDataStore(emr_app.JsonStorage())
+    store.set_questions(QUESTIONS)
+    store.set_answer(ADA, WEEK_KEY, "Mood", "Monday", 4.5)
+    store.set_questions([{"text": "Mood", "type": "Qualitative"}])
+    assert store.get_patient_data(ADA)[WEEK_KEY]["Mood"] == {"Monday": "4.5"}
+    store.set_questions(QUESTIONS)
+    assert store.get_answer(ADA, WEEK_KEY, "Mood", "Monday") == 4.5
+    store.close()
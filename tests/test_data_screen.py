@@ -0,0 +1,73 @@
+"""DataScreen redraws after question changes and keeps the history chart in step with edits."""
+import pytest
+
+import emr_app
+
+pytest.importorskip("PyQt5.QtChart")
+
+PATIENT = "11111111-1111-1111-1111-111111111111"
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+
+
+@pytest.fixture
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def test_downsampling_keeps_the_ends_and_the_peaks():
+    points = [(x, 0.0) for x in range(1000)]
+    points[400] = (400, 50.0)
+    sampled = emr_app.downsample_lttb(points, 20)
+    assert len(sampled) == 20
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert (400, 50.0) in sampled
+    assert emr_app.downsample_lttb(points[:10], 20) == points[:10]
+
+
+def test_open_screens_follow_question_changes(qapp, data_dir):
+    storage = emr_app.JsonStorage()
+    store = emr_app.PatientDataStore(storage)
+    store.set_questions(QUESTIONS)
+    screen = emr_app.DataScreen(PATIENT, QUESTIONS, {PATIENT: {"name": "Ada", "age": 40}}, store, None)
+    week_key = screen.current_week_key()
+    store.set_answer(PATIENT, week_key, "Sleep", "Monday", 6.0)
+    screen.go_to_week(screen.start_date.addDays(-7))  # Prepare the neighbouring weeks
+    screen.go_to_week(screen.start_date.addDays(7))
+
+    # Same number of rows, different questions: the rows must not keep the old names
+    store.set_questions([{"text": "Sleep", "type": "Quantitative"}, {"text": "Mood", "type": "Quantitative"}])
+    table = screen.data_table
+    assert [table.item(row, 0).text() for row in range(table.rowCount())] == ["Sleep", "Mood"]
+    assert table.item(0, 1).text() == "6"
+    assert list(screen.series_by_question) == ["Sleep", "Mood"]
+
+    store.set_questions(QUESTIONS[:1])
+    assert table.rowCount() == 1 and list(screen.series_by_question) == ["Mood"]
+
+    screen.close()
+    store.set_questions(QUESTIONS)
+    assert table.rowCount() == 1  # Closed screens stop listening
+    store.close()
+
+
+def test_edits_move_one_history_point_without_a_full_redraw(qapp, data_dir, monkeypatch):
+    storage = emr_app.JsonStorage()
+    store = emr_app.PatientDataStore(storage)
+    screen = emr_app.DataScreen(PATIENT, QUESTIONS, {PATIENT: {"name": "Ada", "age": 40}}, store, None)
+    store.set_answer(PATIENT, screen.current_week_key(), "Mood", "Tuesday", 3.0)
+    screen.show()
+    screen.range_selector.setCurrentIndex(1)
+    series = screen.history_series["Mood"]
+    assert [point.y() for point in series.pointsVector()] == [3.0]
+
+    monkeypatch.setattr(screen, "update_history_chart", lambda: pytest.fail("redrew the whole history"))
+    screen.data_table.item(0, 1).setText("7")  # Monday, before the only point so far
+    assert [point.y() for point in series.pointsVector()] == [7.0, 3.0]
+    assert screen.history_axis_y.max() >= 7.0
+    screen.data_table.item(0, 2).setText("")  # Clearing Tuesday removes its point
+    assert [value for _, value in screen.history_points["Mood"]] == [7.0]
+
+    screen.close()
+    store.close()
@@ -0,0 +1,99 @@
+"""Batch and full history exports."""
+import json
+
+import openpyxl
+import pytest
+
+import emr_app
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+ADA = "11111111-1111-1111-1111-111111111111"
+GRACE = "22222222-2222-2222-2222-222222222222"
+PATIENTS = {ADA: {"name": "Ada", "age": 40}, GRACE: {"name": "Grace", "age": 50}}
+WEEK = ("2024-01-08", "2024-01-12")
+WEEK_KEY = "2024-01-08_to_2024-01-12"
+PATIENT_DATA = {
+    ADA: {
+        "2023-12-25_to_2023-12-29": {"Mood": {"Monday": 2.0}},
+        WEEK_KEY: {"Mood": {"Monday": 4.0, "Friday": 5.0}, "Notes": {"Monday": "slept well"}},
+    },
+    GRACE: {WEEK_KEY: {"Notes": {"Tuesday": "headache"}}},
+}
+
+
+def sheet_rows(path):
+    wb = openpyxl.load_workbook(path)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+
+def test_batch_export_sends_only_the_exported_week():
+    week_data = emr_app.slice_week(PATIENTS, PATIENT_DATA.get, *WEEK)
+    assert week_data[ADA] == PATIENT_DATA[ADA][WEEK_KEY]
+    week_data[ADA]["Mood"]["Monday"] = 0.0  # A copy: the export cannot touch the live data
+    assert PATIENT_DATA[ADA][WEEK_KEY]["Mood"]["Monday"] == 4.0
+
+
+@pytest.mark.parametrize("combined", [False, True])
+def test_batch_export_writes_every_patient(tmp_path, combined):
+    week_data = emr_app.slice_week(PATIENTS, PATIENT_DATA.get, *WEEK)
+    progress = []
+    written = emr_app.batch_export(PATIENTS, week_data, QUESTIONS, *WEEK, str(tmp_path), combined=combined,
+                                   workers=1, progress=lambda done, total: progress.append((done, total)))
+
+    assert progress == [(1, 2), (2, 2)]
+    assert len(written) == (2 if combined else 4)  # xlsx and pdf, per patient or combined
+    workbooks = [path for path in written if path.endswith(".xlsx")]
+    sheets = {title: rows for path in workbooks for title, rows in sheet_rows(path).items()}
+    assert len(sheets) == 2
+    ada_rows = next(rows for rows in sheets.values() if ["Patient Name:", "Ada"] in [row[:2] for row in rows])
+    assert ["Mood", "4", None, None, None, "5"] in [row[:6] for row in ada_rows]
+
+
+def answers_of(patient_data):
+    return {(patient_uuid, week_key, question, day): value
+            for patient_uuid, weeks in patient_data.items() for week_key, week_data in weeks.items()
+            for question, days in week_data.items() for day, value in days.items()}
+
+
+def test_history_export_splits_sheets_by_year(tmp_path):
+    path = str(tmp_path / "history.xlsx")
+    rows = emr_app.export_full_history(path, PATIENTS, PATIENT_DATA.get, QUESTIONS, split_by="year")
+    sheets = sheet_rows(path)
+    assert rows == 4
+    assert list(sheets) == ["Ada 2023", "Ada 2024", "Grace 2024"]
+    assert sheets["Ada 2024"][4:] == [
+        ["2024-01-08 to 2024-01-12", "Mood", 4, None, None, None, 5],
+        ["2024-01-08 to 2024-01-12", "Notes", "slept well", None, None, None, None],
+    ]
+
+
+def test_history_export_cli_reads_patients_straight_from_storage(tmp_path, data_dir, monkeypatch):
+    storage = emr_app.SqliteStorage()
+    storage.save_patients(PATIENTS)
+    storage.save_questions(QUESTIONS)
+    storage.save_answers(answers_of(PATIENT_DATA))
+    with open(emr_app.get_user_data_path("settings.json"), "w") as file:
+        json.dump({"storage_backend": "sqlite"}, file)
+    loaded = []
+    monkeypatch.setattr(emr_app.SqliteStorage, "load_all_patient_data", lambda self: pytest.fail("loaded everyone"))
+    monkeypatch.setattr(emr_app.SqliteStorage, "load_patient_data",
+                        lambda self, patient_uuid: loaded.append(patient_uuid) or PATIENT_DATA[patient_uuid])
+    monkeypatch.setattr(emr_app, "PatientDataStore", None)  # No cache or autosave thread for a one-off read
+
+    path = str(tmp_path / "history.xlsx")
+    args, _ = emr_app.parse_arguments(["--export-history", path])
+    assert emr_app.run_history_export_cli(args) == 0
+    assert loaded == [ADA, GRACE]
+    assert list(sheet_rows(path)) == ["Ada", "Grace"]
+
+
+def test_gui_history_export_leaves_uncached_patients_uncached(data_dir):
+    storage = emr_app.SqliteStorage()
+    storage.save_answers(answers_of(PATIENT_DATA))
+    store = emr_app.PatientDataStore(storage)
+    store.set_answer(ADA, WEEK_KEY, "Mood", "Tuesday", 1.0)  # Not saved yet
+
+    assert emr_app.answer_value(store.read_patient_data(ADA)[WEEK_KEY]["Mood"], 1) == 1.0
+    assert store.read_patient_data(GRACE) == PATIENT_DATA[GRACE]
+    assert GRACE not in store.patient_data
+    store.close()
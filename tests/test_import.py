@@ -0,0 +1,92 @@
+"""Bulk import: validation, patient matching, dry runs and writing the plan."""
+import csv
+
+import emr_app
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+PATIENTS = {"11111111-1111-1111-1111-111111111111": {"name": "Ada", "age": 40, "records": {}}}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["patient", "date", "question", "value"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_plan_import_maps_rows_and_reports_errors(tmp_path):
+    path = write_csv(tmp_path / "import.csv", [
+        ["ada", "2024-01-01", "Mood", "7"],
+        ["Ada", "2024-01-02", "Notes", "slept well"],
+        ["Grace", "2024-01-03", "Mood", "5"],
+        ["Ada", "2024-01-06", "Mood", "3"],  # Saturday
+        ["Ada", "2024-01-04", "Mood", "lots"],
+        ["Ada", "2024-01-04", "Unknown", "1"],
+        ["Ada", "2024-01-05", "Mood", ""],
+    ])
+    report, new_patients, patient_data = emr_app.plan_import(path, PATIENTS, QUESTIONS)
+
+    ada = next(iter(PATIENTS))
+    grace = next(iter(new_patients))
+    week = "2024-01-01_to_2024-01-05"
+    assert patient_data == {
+        ada: {week: {"Mood": {"Monday": 7.0}, "Notes": {"Tuesday": "slept well"}}},
+        grace: {week: {"Mood": {"Wednesday": 5.0}}},
+    }
+    assert new_patients[grace] == {"name": "Grace", "age": emr_app.DEFAULT_PATIENT_AGE, "records": {}}
+    assert (report.rows, report.answers, report.blank, report.error_count) == (7, 3, 1, 3)
+
+
+def test_dry_run_reports_without_answers(tmp_path):
+    path = write_csv(tmp_path / "import.csv", [["Ada", "2024-01-01", "Mood", "7"]])
+    report, _, patient_data = emr_app.plan_import(path, PATIENTS, QUESTIONS, dry_run=True)
+    assert report.answers == 1
+    assert patient_data == {}
+
+
+def test_new_patients_need_a_positive_whole_age(tmp_path):
+    path = tmp_path / "import.csv"
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows([
+            ["patient", "age", "date", "question", "value"],
+            ["Grace", "52", "2024-01-01", "Mood", "5"],
+            ["Alan", "0", "2024-01-01", "Mood", "5"],
+            ["Alan", "41.5", "2024-01-01", "Mood", "5"],
+            ["Alan", "old", "2024-01-01", "Mood", "5"],
+            ["Alan", "41.0", "2024-01-02", "Mood", "6"],
+        ])
+    report, new_patients, _ = emr_app.plan_import(str(path), PATIENTS, QUESTIONS)
+    assert sorted((patient["name"], patient["age"]) for patient in new_patients.values()) == [
+        ("Alan", 41), ("Grace", 52)]
+    assert (report.answers, report.error_count) == (2, 3)
+
+
+def test_import_is_written_in_one_batch(tmp_path, data_dir, monkeypatch):
+    ada = next(iter(PATIENTS))
+    path = write_csv(tmp_path / "import.csv", [
+        [name, f"2024-01-{day:02d}", "Mood", str(day)] for name in ("Ada", "Grace") for day in (1, 2, 3, 4, 5)
+    ])
+    _, new_patients, patient_data = emr_app.plan_import(path, PATIENTS, QUESTIONS)
+    (grace,) = new_patients
+
+    storage = emr_app.JsonStorage()
+    storage.save_patients(PATIENTS)
+    store = emr_app.PatientDataStore(storage)
+    store.set_questions(QUESTIONS)
+    store.set_answer(ada, "2023-12-25_to_2023-12-29", "Notes", "Monday", "before")  # Ada is cached
+    store.autosave.max_batch = 3  # Smaller than the import
+    batches = []
+    save_answers = storage.save_answers
+    monkeypatch.setattr(storage, "save_answers", lambda answers: batches.append(len(answers)) or save_answers(answers))
+
+    store.import_patient_data(new_patients, patient_data)
+    assert batches == [1, 10]  # The queued edit, then the whole import at once
+    assert store.get_answer(ada, "2024-01-01_to_2024-01-05", "Mood", "Friday") == 5.0
+    assert store.get_answer(grace, "2024-01-01_to_2024-01-05", "Mood", "Monday") == 1.0
+    store.close()
+
+    reopened = emr_app.JsonStorage()
+    assert reopened.load_patients()[grace]["name"] == "Grace"
+    assert reopened.load_patient_data(grace)["2024-01-01_to_2024-01-05"]["Mood"]["Monday"] == 1.0
+    assert reopened.load_patient_data(ada)["2023-12-25_to_2023-12-29"]["Notes"] == {"Monday": "before"}
@@ -0,0 +1,99 @@
+"""Journal replay, compaction and incremental reads of the JSON backend."""
+import json
+
+import pytest
+
+import emr_app
+
+WEEK = "2024-01-01_to_2024-01-05"
+
+
+def make_journal(tmp_path, **kwargs):
+    return emr_app.PatientDataJournal(str(tmp_path / "patient_data.json"), str(tmp_path / "patient_data.journal"),
+                                      file_lock=emr_app.DataFileLock(str(tmp_path / "test.lock")), **kwargs)
+
+
+def test_replay_skips_torn_last_line(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append("p1", WEEK, "Mood", "Monday", 3.0)
+    journal.append("p1", WEEK, "Mood", "Tuesday", 4.0)
+    with open(journal.journal_path, "a") as file:
+        file.write('{"patient": "p1", "week": "' + WEEK + '", "question": "Mo')  # Died mid-append
+
+    assert make_journal(tmp_path).load() == {"p1": {WEEK: {"Mood": {"Monday": 3.0, "Tuesday": 4.0}}}}
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append_many({("p1", WEEK, "Mood", day): 1.0 for day in ("Monday", "Tuesday")})
+    journal.compact()
+
+    with open(journal.snapshot_path) as file:
+        assert json.load(file) == {"p1": {WEEK: {"Mood": {"Monday": 1.0, "Tuesday": 1.0}}}}
+    assert make_journal(tmp_path).load() == {"p1": {WEEK: {"Mood": {"Monday": 1.0, "Tuesday": 1.0}}}}
+
+
+def test_read_changes_returns_only_other_writers_records(tmp_path):
+    mine, theirs = make_journal(tmp_path), make_journal(tmp_path)
+    mine.load()
+    theirs.load()
+    mine.append("p1", WEEK, "Mood", "Monday", 1.0)
+    theirs.append("p2", WEEK, "Mood", "Friday", 5.0)
+
+    assert mine.read_changes() == {("p2", WEEK, "Mood", "Friday"): 5.0}
+    assert mine.read_changes() == {}
+
+
+def test_read_changes_ignores_a_line_still_being_written(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.load()
+    with open(journal.journal_path, "a") as file:
+        file.write('{"patient": "p2", "week": "' + WEEK + '", "question": "Mood", "day": "Monday", "value": 2.0}\n{"pat')
+
+    assert journal.read_changes() == {("p2", WEEK, "Mood", "Monday"): 2.0}
+    assert journal.read_changes() == {}
+
+
+def test_own_appends_and_compactions_are_not_changes(tmp_path):
+    mine, theirs = make_journal(tmp_path), make_journal(tmp_path)
+    mine.load()
+    theirs.load()
+    mine.append("p1", WEEK, "Mood", "Monday", 1.0)
+    mine.compact()
+    mine.append("p1", WEEK, "Mood", "Tuesday", 2.0)
+    assert not mine.has_changes()
+
+    theirs.read_changes()
+    theirs.append("p2", WEEK, "Mood", "Friday", 5.0)
+    assert mine.has_changes()
+
+
+def test_read_changes_finishes_a_segment_another_instance_compacted(tmp_path, monkeypatch):
+    mine, theirs = make_journal(tmp_path), make_journal(tmp_path)
+    mine.load()
+    theirs.load()
+    theirs.append("p2", WEEK, "Mood", "Monday", 1.0)
+    assert mine.read_changes() == {("p2", WEEK, "Mood", "Monday"): 1.0}
+    theirs.append("p2", WEEK, "Mood", "Tuesday", 2.0)
+    theirs.compact()
+    theirs.append("p2", WEEK, "Mood", "Wednesday", 3.0)
+
+    monkeypatch.setattr(mine, "read_snapshot", lambda: pytest.fail("the snapshot was read again"))
+    assert mine.read_changes() == {("p2", WEEK, "Mood", "Tuesday"): 2.0, ("p2", WEEK, "Mood", "Wednesday"): 3.0}
+    assert mine.read_changes() == {}
+
+
+def test_read_changes_asks_for_a_reload_after_missing_a_segment(tmp_path):
+    mine, theirs = make_journal(tmp_path), make_journal(tmp_path)
+    mine.load()
+    theirs.load()
+    theirs.append("p2", WEEK, "Mood", "Monday", 1.0)
+    mine.read_changes()
+    theirs.append("p2", WEEK, "Mood", "Tuesday", 2.0)
+    theirs.compact()
+    theirs.append("p2", WEEK, "Mood", "Wednesday", 3.0)
+    theirs.compact()  # The segment holding Tuesday is gone
+
+    assert mine.read_changes() is None
+    assert mine.load()["p2"][WEEK]["Mood"]["Tuesday"] == 2.0
+    assert mine.read_changes() == {}
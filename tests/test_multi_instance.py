@@ -0,0 +1,103 @@
+"""Two storages on one data folder: merged saves, change detection and the advisory lock."""
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+import emr_app
+
+WEEK = "2024-01-01_to_2024-01-05"
+
+
+def test_save_merges_patients_added_by_another_instance(data_dir):
+    first, second = emr_app.JsonStorage(), emr_app.JsonStorage()
+    first.load_patients()
+    second.load_patients()
+
+    second.save_patient("p2", {"name": "From second", "age": 50, "records": {}})
+    first.save_patient("p1", {"name": "From first", "age": 40, "records": {}})
+
+    assert set(emr_app.JsonStorage().load_patients()) == {"p1", "p2"}
+
+
+def test_reload_changes_reports_only_changed_records(data_dir):
+    first, second = emr_app.JsonStorage(), emr_app.JsonStorage()
+    first.save_patients({"p1": {"name": "Ada", "age": 40}, "p2": {"name": "Grace", "age": 50}})
+    first.load_all_patient_data()
+    second.load_patients()
+    second.load_all_patient_data()
+
+    second.save_patient("p2", {"name": "Grace H.", "age": 50})
+    second.delete_patient("p1")
+    second.save_answers({("p2", WEEK, "Mood", "Monday"): 4.0})
+
+    patient_changes, answer_changes = first.reload_changes()
+    assert patient_changes == {"p2": {"name": "Grace H.", "age": 50}, "p1": None}
+    assert answer_changes == {("p2", WEEK, "Mood", "Monday"): 4.0}
+    assert first.reload_changes() == ({}, {})
+
+
+def test_patient_hashes_are_only_touched_under_the_file_lock(data_dir, monkeypatch):
+    first, second = emr_app.JsonStorage(), emr_app.JsonStorage()
+    patient_hash = emr_app.patient_hash
+
+    def locked_patient_hash(patient):
+        assert first.file_lock.depth or second.file_lock.depth, "patient_hashes used outside the file lock"
+        return patient_hash(patient)
+
+    first.save_patients({"p1": {"name": "Ada", "age": 40}})
+    second.save_patient("p2", {"name": "Grace", "age": 50})
+    monkeypatch.setattr(emr_app, "patient_hash", locked_patient_hash)
+    first.load_patients()
+    first.save_patients({"p1": {"name": "Ada", "age": 41}})
+    first.save_patient("p3", {"name": "Alan", "age": 41})
+    second.save_patient("p2", {"name": "Grace H.", "age": 50})
+    assert first.reload_patient_changes() == {"p2": {"name": "Grace H.", "age": 50}}
+
+
+def test_sharded_reload_changes_reads_changed_shards(data_dir):
+    first, second = emr_app.ShardedJsonStorage(), emr_app.ShardedJsonStorage()
+    first.save_answers({("p1", WEEK, "Mood", "Monday"): 1.0})
+    first.load_patient_data("p1")
+    second.save_answers({("p1", WEEK, "Mood", "Tuesday"): 2.0})
+
+    assert first.reload_answer_changes() == {("p1", WEEK, "Mood", "Tuesday"): 2.0}
+
+
+@pytest.mark.parametrize("storage_class", [emr_app.JsonStorage, emr_app.ShardedJsonStorage])
+def test_own_saves_are_not_external_changes(data_dir, storage_class):
+    first, second = storage_class(), storage_class()
+    first.load_patients()
+    first.load_all_patient_data()
+    second.load_patients()
+    second.load_all_patient_data()
+    first.save_patient("p1", {"name": "Ada", "age": 40})
+    first.save_answers({("p1", WEEK, "Mood", "Monday"): 1.0})
+    first.load_patient_data("p1")
+    assert not first.has_external_changes()
+
+    second.save_answers({("p1", WEEK, "Mood", "Tuesday"): 2.0})
+    assert first.has_external_changes()
+    first.reload_changes()
+    assert not first.has_external_changes()
+
+
+def test_lock_blocks_until_the_other_process_releases_it(data_dir, home):
+    holder = subprocess.Popen([sys.executable, "-c", textwrap.dedent("""
+        import sys, time
+        sys.path.insert(0, sys.argv[1])
+        import emr_app
+        with emr_app.DataFileLock():
+            print("locked", flush=True)
+            time.sleep(1)
+    """), emr_app.os.path.dirname(emr_app.__file__)], stdout=subprocess.PIPE, text=True,
+        env={**emr_app.os.environ, "HOME": str(home)})
+    assert holder.stdout.readline().strip() == "locked"
+
+    started = time.monotonic()
+    with emr_app.DataFileLock():
+        waited = time.monotonic() - started
+    holder.wait()
+    assert waited > 0.5
@@ -0,0 +1,113 @@
+"""Startup recovery of damaged data files, and files in formats this installation cannot read."""
+import os
+import sys
+
+import pytest
+
+import emr_app
+
+PATIENTS = {"p1": {"name": "Ada", "age": 40, "records": {}}}
+
+
+def test_torn_file_is_rolled_back_to_its_backup(data_dir):
+    path = os.path.join(data_dir, "patients.json")
+    emr_app.write_json_atomic(path, PATIENTS)
+    emr_app.write_json_atomic(path, {**PATIENTS, "p2": {"name": "Grace"}}, keep_backup=True)
+    with open(path, "w") as file:
+        file.write('{"p1": {"na')
+
+    messages = emr_app.recover_data_files(data_dir)
+    assert "rolled back" in messages[0]
+    assert emr_app.DataSerializer.read(path) == PATIENTS
+    assert any(name.startswith("patients.json.torn-") for name in os.listdir(data_dir))
+
+
+@pytest.mark.parametrize("data_format, compression, module", [
+    ("msgpack", "none", "msgpack"),
+    ("json", "zstd", "zstandard"),
+])
+def test_file_without_installed_decoder_is_left_alone(data_dir, monkeypatch, data_format, compression, module):
+    pytest.importorskip(module)
+    path = os.path.join(data_dir, "patients.json")
+    emr_app.write_json_atomic(path, PATIENTS, serializer=emr_app.DataSerializer(data_format, compression))
+    with open(path, "rb") as file:
+        content = file.read()
+    monkeypatch.setitem(sys.modules, module, None)  # Makes "import <module>" fail
+
+    with pytest.raises(emr_app.UnsupportedDataFormat):
+        emr_app.DataSerializer.read(path)
+    messages = emr_app.recover_data_files(data_dir)
+    assert "left unchanged" in messages[0]
+    with open(path, "rb") as file:
+        assert file.read() == content
+    assert os.listdir(data_dir) == ["patients.json"]
+
+
+def test_damaged_binary_file_raises_value_error(tmp_path):
+    path = tmp_path / "patients.json"
+    path.write_bytes(emr_app.DataSerializer("msgpack", "gzip").dumps(PATIENTS)[:-8])
+    with pytest.raises(ValueError):
+        emr_app.DataSerializer.read(str(path))
+    path.write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError) as error:
+        emr_app.DataSerializer.read(str(path))
+    assert not isinstance(error.value, emr_app.UnsupportedDataFormat)
+
+
+def test_torn_shard_is_rolled_back_to_its_backup(data_dir):
+    storage = emr_app.ShardedJsonStorage(split_by_year=True)
+    storage.save_answers({("p1", "2024-01-08_to_2024-01-12", "Mood", "Monday"): 4.0})
+    storage.save_answers({("p1", "2024-01-08_to_2024-01-12", "Mood", "Tuesday"): 5.0})
+    shard_path = storage.shard_path("p1", "2024")
+    with open(shard_path, "w") as file:
+        file.write('{"2024-01-08_to_2024-01')
+    with open(shard_path + ".0123.tmp", "w") as file:
+        file.write("{")
+
+    messages = emr_app.recover_data_files(data_dir)
+    assert len(messages) == 1 and os.path.join("p1", "2024.json") in messages[0] and "rolled back" in messages[0]
+    assert emr_app.ShardedJsonStorage().load_patient_data("p1") == {
+        "2024-01-08_to_2024-01-12": {"Mood": {"Monday": 4.0}}
+    }
+    assert not os.path.exists(shard_path + ".0123.tmp")
+
+
+def test_intact_files_are_not_decoded_at_startup(data_dir, monkeypatch):
+    storage = emr_app.ShardedJsonStorage()
+    storage.save_patients(PATIENTS)
+    storage.save_answer("p1", "2024-01-08_to_2024-01-12", "Mood", "Monday", 4.0)
+    monkeypatch.setattr(emr_app.DataSerializer, "loads", lambda raw: pytest.fail("decoded a whole file"))
+    assert emr_app.recover_data_files(data_dir) == []
+
+
+def test_unfinished_write_makes_its_file_checked_in_full(data_dir):
+    path = os.path.join(data_dir, "patients.json")
+    emr_app.write_json_atomic(path, PATIENTS)
+    emr_app.write_json_atomic(path, {**PATIENTS, "p2": {"name": "Grace"}}, keep_backup=True)
+    with open(path, "w") as file:
+        file.write('{"p1": {"name": "Ada", "age": 4')  # Damaged inside, yet ends in a plausible "}"
+        file.write("}")
+    assert emr_app.recover_data_files(data_dir) == []  # Only the first and last bytes were checked
+
+    with open(path + ".x1y2.tmp", "w") as file:
+        file.write("{")
+    messages = emr_app.recover_data_files(data_dir)
+    assert "rolled back" in messages[0]
+    assert emr_app.DataSerializer.read(path) == PATIENTS
+
+
+def test_rolled_back_snapshot_keeps_the_edits_folded_into_it(data_dir):
+    journal = emr_app.PatientDataJournal()
+    journal.append("p1", "2024-01-08_to_2024-01-12", "Mood", "Monday", 1.0)
+    journal.compact()
+    journal.append("p1", "2024-01-08_to_2024-01-12", "Mood", "Tuesday", 2.0)
+    journal.compact()  # patient_data.json.bak only has Monday, .previous has Tuesday
+    journal.append("p1", "2024-01-08_to_2024-01-12", "Mood", "Wednesday", 3.0)
+    with open(journal.snapshot_path, "w") as file:
+        file.write('{"p1": {"2024-01-08_to_2024-01-12": {"Mood": {"Mon')
+
+    messages = emr_app.recover_data_files(data_dir)
+    assert "plus 1 edit(s)" in messages[0]
+    assert emr_app.PatientDataJournal().load() == {
+        "p1": {"2024-01-08_to_2024-01-12": {"Mood": {"Monday": 1.0, "Tuesday": 2.0, "Wednesday": 3.0}}}
+    }
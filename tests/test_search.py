@@ -0,0 +1,60 @@
+"""Search index: matching, ranking, incremental updates and the candidate cap."""
+import emr_app
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+ADA = "11111111-1111-1111-1111-111111111111"
+GRACE = "22222222-2222-2222-2222-222222222222"
+OLD_WEEK = "2024-01-01_to_2024-01-05"
+NEW_WEEK = "2024-01-08_to_2024-01-12"
+
+
+def build_index():
+    patients = {ADA: {"name": "Ada Headache"}, GRACE: {"name": "Grace"}}
+    data = {
+        ADA: {OLD_WEEK: {"Notes": {"Monday": "headache after lunch"}, "Mood": {"Monday": 4.0}}},
+        GRACE: {NEW_WEEK: {"Notes": {"Friday": "mild headache, slept well"}}},
+    }
+    index = emr_app.SearchIndex()
+    index.build(patients, data, QUESTIONS)
+    return index
+
+
+def test_words_must_all_match_and_the_last_one_as_prefix():
+    index = build_index()
+    assert {hit["patient_uuid"] for hit in index.search("headache")} == {ADA, GRACE}
+    assert [hit["patient_uuid"] for hit in index.search("headache sle")] == [GRACE]
+    assert index.search("sle headache") == []  # Only the last word is a prefix
+    assert index.search("4") == []  # Quantitative answers are not indexed
+
+
+def test_name_matches_rank_first():
+    hits = build_index().search("headache")
+    assert (hits[0]["kind"], hits[0]["patient_uuid"]) == ("name", ADA)
+
+
+def test_updates_and_removals_apply_in_place():
+    index = build_index()
+    index.update_answer(GRACE, NEW_WEEK, "Notes", "Friday", "feeling fine")
+    index.update_answer(GRACE, NEW_WEEK, "Mood", "Friday", "headache")  # Ignored: quantitative
+    assert [hit["kind"] for hit in index.search("headache")] == ["name", "answer"]
+    assert index.search("fine")[0]["day"] == "Friday"
+
+    index.update_patient_name(GRACE, "Grace Hopper")
+    assert index.search("hop")[0]["patient_uuid"] == GRACE
+    index.remove_patient(GRACE)
+    assert index.search("fine") == [] and index.search("hop") == []
+    assert "hopper" not in index.vocabulary
+
+
+def test_only_the_newest_candidates_are_ranked(monkeypatch):
+    monkeypatch.setattr(emr_app.SearchIndex, "MAX_CANDIDATES", 3)
+    data = {ADA: {}}
+    for week in range(1, 6):
+        week_key = f"2024-0{week}-01_to_2024-0{week}-05"
+        data[ADA][week_key] = {"Notes": {"Monday": "cough " * week}}
+    index = emr_app.SearchIndex()
+    index.build({ADA: {"name": "Ada"}}, data, QUESTIONS)
+    index.update_answer(ADA, "2024-01-01_to_2024-01-05", "Notes", "Tuesday", "cough")
+
+    hits = index.search("cough")
+    assert [hit["week_key"][:7] for hit in hits] == ["2024-05", "2024-04", "2024-03"]  # Most coughs first
@@ -0,0 +1,91 @@
+"""Storage backends: round trips, the JSON to SQLite migration and sharded files."""
+import os
+
+import emr_app
+
+QUESTIONS = [{"text": "Mood", "type": "Quantitative"}, {"text": "Notes", "type": "Qualitative"}]
+ADA = "11111111-1111-1111-1111-111111111111"
+GRACE = "22222222-2222-2222-2222-222222222222"
+WEEK_KEY = "2024-01-08_to_2024-01-12"
+
+
+def test_sqlite_round_trip(data_dir):
+    storage = emr_app.SqliteStorage()
+    assert storage.load_questions() == emr_app.DEFAULT_QUESTIONS  # Seeded on first use
+    storage.save_questions(QUESTIONS)
+    storage.save_patients({GRACE: {"name": "Grace", "age": 50}, ADA: {"name": "Ada", "age": 40}})
+    storage.save_patient_changes({
+        GRACE: None, "33333333": {"name": "Alan", "age": 41}, ADA: {"name": "Ada", "age": 41},
+    })
+    storage.save_answers({(ADA, WEEK_KEY, "Mood", "Monday"): 4.0, (ADA, WEEK_KEY, "Notes", "Monday"): "fine"})
+    storage.save_answer(ADA, WEEK_KEY, "Mood", "Monday", 5.0)
+
+    reopened = emr_app.SqliteStorage()
+    assert reopened.load_questions() == QUESTIONS
+    assert reopened.load_patients() == {ADA: {"name": "Ada", "age": 41}, "33333333": {"name": "Alan", "age": 41}}
+    assert list(reopened.load_patients()) == [ADA, "33333333"]  # New patients go last
+    assert reopened.load_patient_data(ADA) == {WEEK_KEY: {"Mood": {"Monday": 5.0}, "Notes": {"Monday": "fine"}}}
+    assert reopened.load_patient_data(GRACE) == {}
+    assert reopened.load_all_patient_data() == {ADA: reopened.load_patient_data(ADA)}
+
+
+def test_json_files_are_migrated_into_sqlite_once(data_dir):
+    json_storage = emr_app.JsonStorage()
+    json_storage.save_patients({ADA: {"name": "Ada", "age": 40}})
+    json_storage.save_questions(QUESTIONS)
+    json_storage.save_answers({(ADA, WEEK_KEY, "Mood", "Monday"): 4.0})
+
+    storage = emr_app.create_storage_backend({"storage_backend": "sqlite"})
+    assert storage.load_patients() == {ADA: {"name": "Ada", "age": 40}}
+    assert storage.load_questions() == QUESTIONS
+    assert storage.load_patient_data(ADA) == {WEEK_KEY: {"Mood": {"Monday": 4.0}}}
+
+    json_storage.save_patients({})  # Later JSON changes are not copied again
+    storage.save_answer(ADA, WEEK_KEY, "Mood", "Tuesday", 2.0)
+    storage = emr_app.create_storage_backend({"storage_backend": "sqlite"})
+    assert storage.load_patients() == {ADA: {"name": "Ada", "age": 40}}
+    assert storage.load_patient_data(ADA)[WEEK_KEY]["Mood"] == {"Monday": 4.0, "Tuesday": 2.0}
+
+
+def test_sharded_storage_writes_one_file_per_patient_and_year(data_dir):
+    storage = emr_app.ShardedJsonStorage(split_by_year=True)
+    storage.save_answers({
+        (ADA, "2023-12-25_to_2023-12-29", "Mood", "Monday"): 2.0,
+        (ADA, WEEK_KEY, "Mood", "Monday"): 4.0,
+        (GRACE, WEEK_KEY, "Notes", "Friday"): "fine",
+    })
+    assert sorted(os.listdir(os.path.join(storage.data_dir, ADA))) == ["2023.json", "2024.json"]
+
+    storage.save_answer(ADA, WEEK_KEY, "Mood", "Tuesday", 5.0)  # Rewrites only the 2024 shard
+    assert os.path.exists(storage.shard_path(ADA, "2024") + ".bak")
+    assert not os.path.exists(storage.shard_path(ADA, "2023") + ".bak")
+
+    reopened = emr_app.ShardedJsonStorage()
+    assert reopened.manifest["split_by_year"]
+    assert reopened.load_patient_data(ADA) == {
+        "2023-12-25_to_2023-12-29": {"Mood": {"Monday": 2.0}},
+        WEEK_KEY: {"Mood": {"Monday": 4.0, "Tuesday": 5.0}},
+    }
+    assert reopened.load_patient_data("unknown") == {}
+
+
+def test_sharded_patient_data_is_a_copy(data_dir):
+    storage = emr_app.ShardedJsonStorage()
+    storage.save_answer(ADA, WEEK_KEY, "Notes", "Monday", "fine")
+    patient_data = storage.load_patient_data(ADA)
+    patient_data[WEEK_KEY]["Notes"]["Monday"] = "changed in the window"
+    storage.save_answer(ADA, WEEK_KEY, "Notes", "Tuesday", "tired")
+    assert emr_app.ShardedJsonStorage().load_patient_data(ADA) == {
+        WEEK_KEY: {"Notes": {"Monday": "fine", "Tuesday": "tired"}}
+    }
+
+
+def test_monolithic_file_is_split_into_shards_once(data_dir):
+    json_storage = emr_app.JsonStorage()
+    json_storage.save_answers({(ADA, WEEK_KEY, "Mood", "Monday"): 4.0, (GRACE, WEEK_KEY, "Mood", "Friday"): 1.0})
+
+    storage = emr_app.create_storage_backend({"storage_backend": "sharded"})
+    assert storage.load_all_patient_data() == {
+        ADA: {WEEK_KEY: {"Mood": {"Monday": 4.0}}}, GRACE: {WEEK_KEY: {"Mood": {"Friday": 1.0}}},
+    }
+    assert os.path.exists(os.path.join(data_dir, "patient_data.journal.migrated"))
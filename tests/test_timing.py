@@ -0,0 +1,64 @@
+"""Timing hooks and the queued, rotating log files."""
+import atexit
+import json
+import logging
+import os
+
+import pytest
+
+import emr_app
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monitor = emr_app.PerformanceMonitor(samples=3)
+    monkeypatch.setattr(emr_app, "performance_monitor", monitor)
+    return monitor
+
+
+def test_timed_records_blocks_and_decorated_calls(monitor):
+    @emr_app.timed("decorated")
+    def work():
+        pass
+
+    work()
+    work()
+    with pytest.raises(KeyError):
+        with emr_app.timed("failing"):
+            raise KeyError("boom")
+
+    assert monitor.calls == {"decorated": 2, "failing": 1}
+    assert {row[0] for row in monitor.summary()} == {"decorated", "failing"}
+
+
+def test_summary_keeps_recent_samples_and_reports_percentiles(monitor):
+    for seconds in (0.5, 0.001, 0.002, 0.004):  # The oldest sample falls out of the window of 3
+        monitor.record("save", seconds)
+    ((operation, calls, p50, p95, slowest),) = monitor.summary()
+    assert (operation, calls) == ("save", 4)
+    assert (p50, p95, slowest) == (pytest.approx(2), pytest.approx(4), pytest.approx(4))
+
+
+def test_log_records_and_timing_events_go_to_separate_files(home, monitor):
+    root_level = logging.getLogger().level
+    listener = emr_app.setup_logging()
+    queue_handler = emr_app.timing_logger.handlers[-1]
+    try:
+        logging.info("plain message")
+        with emr_app.timed("load", patients=3):
+            pass
+    finally:
+        listener.stop()
+        atexit.unregister(listener.stop)
+        logging.getLogger().removeHandler(queue_handler)
+        logging.getLogger().setLevel(root_level)
+        emr_app.timing_logger.removeHandler(queue_handler)
+
+    log_dir = emr_app.get_user_data_path("")
+    with open(os.path.join(log_dir, "app.log"), encoding="utf-8") as file:
+        app_log = file.read()
+    with open(os.path.join(log_dir, "timings.jsonl"), encoding="utf-8") as file:
+        events = [json.loads(line) for line in file]
+    assert "plain message" in app_log and '"operation"' not in app_log
+    assert [(event["operation"], event["ok"], event["patients"]) for event in events] == [("load", True, 3)]
+    assert events[0]["thread"] == "MainThread"
@@ -0,0 +1,152 @@
+"""Update check and download against a local stub HTTP server."""
+import hashlib
+import http.server
+import io
+import json
+import os
+import tarfile
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+
+import emr_app  # noqa: E402
+
+
+class StubRelease:
+    """The release and asset a stub server currently publishes, plus a record of the requests it saw."""
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.tag_name = "v9.0.0"
+        self.requests = []  # (Range, If-Range) headers of every asset GET
+        self.release_requests = []  # If-None-Match header of every release GET
+        self.fail_after = None  # Close the connection after this many bytes of the next response
+
+
+@pytest.fixture
+def stub_server():
+    release = StubRelease(b"version one " * 5000, '"v1"')
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.endswith("/releases/latest"):
+                self.send_release()
+                return
+            byte_range = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            release.requests.append((byte_range, if_range))
+            if self.path.endswith(".sha256"):
+                self.send_body(200, f"{hashlib.sha256(release.body).hexdigest()}  update.tar.gz\n".encode())
+                return
+            start = 0
+            if byte_range and (if_range is None or if_range == release.etag):
+                start = int(byte_range.split("=")[1].rstrip("-"))
+            body = release.body[start:]
+            headers = {"ETag": release.etag}
+            if start:
+                headers["Content-Range"] = f"bytes {start}-{len(release.body) - 1}/{len(release.body)}"
+            self.send_body(206 if start else 200, body, headers)
+
+        def send_release(self):
+            if_none_match = self.headers.get("If-None-Match")
+            release.release_requests.append(if_none_match)
+            etag = f'"{release.tag_name}"'
+            if if_none_match == etag:
+                self.send_body(304, b"", {"ETag": etag})
+                return
+            self.send_body(200, json.dumps({"tag_name": release.tag_name, "assets": []}).encode(), {"ETag": etag})
+
+        def send_body(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if release.fail_after is not None:
+                body, release.fail_after = body[:release.fail_after], None
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    release.url = f"{base_url}/update.tar.gz"
+    release.release_url = f"{base_url}/repos/example/app/releases/latest"
+    yield release
+    server.shutdown()
+
+
+def download(release, part_path):
+    return emr_app.download_with_resume(release.url, str(part_path), chunk_size=1024, timeout=5)
+
+
+def test_release_check_revalidates_its_cache_with_the_etag(stub_server, tmp_path):
+    cache_path = str(tmp_path / "update_cache.json")
+    first = emr_app.fetch_latest_release(stub_server.release_url, cache_path, timeout=5)
+    second = emr_app.fetch_latest_release(stub_server.release_url, cache_path, timeout=5)
+
+    assert first == second == {"tag_name": "v9.0.0", "assets": []}
+    assert stub_server.release_requests == [None, '"v9.0.0"']  # The second answer was a bodiless 304
+
+    stub_server.tag_name = "v9.1.0"
+    assert emr_app.fetch_latest_release(stub_server.release_url, cache_path, timeout=5)["tag_name"] == "v9.1.0"
+
+
+def test_versions_compare_numerically_with_pre_releases_first():
+    assert emr_app.parse_version("v1.0.10") > emr_app.parse_version("v1.0.9")
+    assert emr_app.parse_version("1.1") == emr_app.parse_version("v1.1.0")
+    assert emr_app.parse_version("v1.1.0-beta") < emr_app.parse_version("v1.1.0")
+    assert emr_app.parse_version("v1.1.0-beta") > emr_app.parse_version("v1.0.25")
+
+
+def test_download_matches_published_checksum(stub_server, tmp_path):
+    digest = download(stub_server, tmp_path / "update.part")
+    assert digest == emr_app.fetch_expected_sha256(stub_server.url + ".sha256", "update.tar.gz")
+    assert (tmp_path / "update.part").read_bytes() == stub_server.body
+
+
+def test_interrupted_download_resumes_with_if_range(stub_server, tmp_path):
+    stub_server.fail_after = 10240
+    with pytest.raises(Exception):
+        download(stub_server, tmp_path / "update.part")
+    assert (tmp_path / "update.part").stat().st_size == 10240
+
+    digest = download(stub_server, tmp_path / "update.part")
+    assert stub_server.requests[-1] == ("bytes=10240-", '"v1"')
+    assert digest == hashlib.sha256(stub_server.body).hexdigest()
+    assert (tmp_path / "update.part").read_bytes() == stub_server.body
+
+
+def test_changed_asset_restarts_instead_of_concatenating(stub_server, tmp_path):
+    stub_server.fail_after = 10240
+    with pytest.raises(Exception):
+        download(stub_server, tmp_path / "update.part")
+
+    stub_server.body, stub_server.etag = b"version two " * 6000, '"v2"'
+    digest = download(stub_server, tmp_path / "update.part")
+    assert digest == hashlib.sha256(stub_server.body).hexdigest()
+    assert (tmp_path / "update.part").read_bytes() == stub_server.body
+
+
+def test_partial_file_without_validator_starts_over(stub_server, tmp_path):
+    (tmp_path / "update.part").write_bytes(b"left over from an older version")
+    download(stub_server, tmp_path / "update.part")
+    assert stub_server.requests[-1] == (None, None)
+    assert (tmp_path / "update.part").read_bytes() == stub_server.body
+
+
+def test_extract_archive_refuses_paths_outside_target(tmp_path):
+    archive_path = tmp_path / "update.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as tar:
+        member = tarfile.TarInfo("../escaped.txt")
+        member.size = 4
+        tar.addfile(member, io.BytesIO(b"oops"))
+    with pytest.raises(Exception):
+        emr_app.extract_archive(str(archive_path), str(tmp_path / "out"))
+    assert not os.path.exists(tmp_path / "escaped.txt")